@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  benchmarks/benchmark.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+"""Times and memory profiles the test-*.py scripts against synthetic fonts.
+
+Synthetic fonts with an increasing number of glyphs, plus one font with many
+name records, are built locally with the fontTools FontBuilder and cached in
+benchmarks/fonts.  Every script is run against every font in a subprocess and
+the wall time and peak resident memory of each run are written to a JSON file.
+"""
+
+import sys
+import os
+import os.path
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPOSITORY_DIR)
+
+from fonttests.baseline import baseline_text
+from fonttests.fontfile import FontFile
+from fonttests.profile import stage_durations
+
+
+FONT_DIR = os.path.join(BENCHMARK_DIR, "fonts")
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+
+UNITS_PER_EM = 1000
+ADVANCE_WIDTH = 600
+VERSION = "1.000"
+
+# (font name, number of glyphs, number of extra localized name records)
+SYNTHETIC_FONTS = (
+    ("Synthetic-500", 500, 0),
+    ("Synthetic-5k", 5000, 0),
+    ("Synthetic-65k", 65000, 0),
+    ("Synthetic-Names", 500, 2000),
+)
+
+# (script, argument list builder) - fontpath, expected metrics path and glyph number are filled in per font
+SCRIPTS = (
+    ("test-metrics.py", lambda fontpath, yamlpath, glyphs: ["--no-cache", "-j", "1", fontpath + ":" + yamlpath]),
+    ("test-monospace.py", lambda fontpath, yamlpath, glyphs: [fontpath, str(ADVANCE_WIDTH)]),
+    ("test-glyphnumber.py", lambda fontpath, yamlpath, glyphs: [fontpath, str(glyphs)]),
+    ("test-version.py", lambda fontpath, yamlpath, glyphs: [fontpath, VERSION]),
+    ("test-runner.py", lambda fontpath, yamlpath, glyphs: ["--no-cache", "-j", "1", "--width", str(ADVANCE_WIDTH),
+                                                           "--glyphs", str(glyphs), "--version", VERSION,
+                                                           fontpath + ":" + yamlpath]),
+)
+
+
+# test-runner.py arguments that run every check against the Hack test fonts, to measure the runner.CHECK_COSTS
+COST_ARGUMENTS = ["--no-cache", "--metrics", os.path.join(REPOSITORY_DIR, "tests", "expected",
+                                                          "Hack-Regular-ttf-metrics.yaml"),
+                  "--width", "1233", "--glyphs", "1561", "--version", "2.018", "--clipping", "--derived",
+                  os.path.join(REPOSITORY_DIR, "tests", "fonts")]
+
+
+def build_font(fontpath, num_glyphs, num_names):
+    """Builds a monospaced TrueType font with num_glyphs square glyphs and num_names extra name records"""
+    glyph_order = [".notdef"] + ["g%05d" % i for i in range(1, num_glyphs)]
+
+    pen = TTGlyphPen(None)
+    pen.moveTo((100, 0))
+    pen.lineTo((100, 700))
+    pen.lineTo((500, 700))
+    pen.lineTo((500, 0))
+    pen.closePath()
+    square = pen.glyph()
+
+    # map glyphs to the BMP, skipping the control characters and surrogates
+    codepoints = [c for c in range(0x20, 0x10000) if not 0xD800 <= c <= 0xDFFF]
+    cmap = dict(zip(codepoints, glyph_order[1:]))
+
+    fb = FontBuilder(UNITS_PER_EM, isTTF=True)
+    fb.setupGlyphOrder(glyph_order)
+    fb.setupCharacterMap(cmap)
+    fb.setupGlyf(dict((name, square) for name in glyph_order))
+    fb.setupHorizontalMetrics(dict((name, (ADVANCE_WIDTH, 100)) for name in glyph_order))
+    fb.setupHorizontalHeader(ascent=800, descent=-200)
+    fb.setupNameTable({"familyName": os.path.splitext(os.path.basename(fontpath))[0], "styleName": "Regular",
+                       "version": "Version " + VERSION})
+    fb.setupOS2(sTypoAscender=800, sTypoDescender=-200, usWinAscent=800, usWinDescent=200, sxHeight=500,
+                sCapHeight=700, xAvgCharWidth=ADVANCE_WIDTH)
+    fb.setupPost(isFixedPitch=1)
+
+    name_table = fb.font["name"]
+    for i in range(num_names):
+        name_table.setName("Name %d" % i, 256 + i % 1000, 3, 1, 0x0401 + i // 1000)
+    fb.save(fontpath)
+
+
+def synthetic_fonts(rebuild=False):
+    """Builds the missing synthetic fonts and their expected metrics files, returns [(fontpath, yamlpath, glyphs)]"""
+    if not os.path.isdir(FONT_DIR):
+        os.makedirs(FONT_DIR)
+    fonts = []
+    for name, num_glyphs, num_names in SYNTHETIC_FONTS:
+        fontpath = os.path.join(FONT_DIR, name + ".ttf")
+        yamlpath = os.path.join(FONT_DIR, name + "-ttf-metrics.yaml")
+        if rebuild or not os.path.isfile(fontpath):
+            print("[benchmark.py] Building '" + fontpath + "'")
+            build_font(fontpath, num_glyphs, num_names)
+            with FontFile(fontpath) as font, open(yamlpath, "wt") as writer:
+                writer.write(baseline_text(font))
+        fonts.append((fontpath, yamlpath, num_glyphs))
+    return fonts
+
+
+def time_script(script, arguments):
+    """Runs a script in a subprocess and returns (exit code, wall seconds, peak resident memory in kilobytes)"""
+    with open(os.devnull, "w") as devnull:
+        start = time.time()
+        process = subprocess.Popen([sys.executable, os.path.join(REPOSITORY_DIR, script)] + arguments,
+                                   stdout=devnull, stderr=devnull)
+        pid, status, rusage = os.wait4(process.pid, 0)
+        wall_seconds = time.time() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, wall_seconds, rusage.ru_maxrss
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPOSITORY_DIR).decode("ascii").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(args):
+    fonts = synthetic_fonts(args.rebuild)
+    commit = git_commit()
+    benchmarks = []
+    for fontpath, yamlpath, num_glyphs in fonts:
+        for script, build_arguments in SCRIPTS:
+            runs = [time_script(script, build_arguments(fontpath, yamlpath, num_glyphs)) for i in range(args.repeat)]
+            wall_seconds = sorted(run[1] for run in runs)
+            benchmark = {
+                "script": script,
+                "font": os.path.basename(fontpath),
+                "glyphs": num_glyphs,
+                "exit_codes": sorted(set(run[0] for run in runs)),
+                "wall_seconds": wall_seconds,
+                "median_seconds": wall_seconds[len(wall_seconds) // 2],
+                "max_rss_kb": max(run[2] for run in runs),
+            }
+            benchmarks.append(benchmark)
+            print("[benchmark.py] %-20s %-22s %8.3f s %10d KB" % (script, benchmark["font"], benchmark["median_seconds"],
+                                                                  benchmark["max_rss_kb"]))
+
+    output = args.output or os.path.join(RESULTS_DIR, (commit or "unknown")[:12] + ".json")
+    output_dir = os.path.dirname(output)
+    if output_dir and not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    with open(output, "wt") as writer:
+        json.dump({"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+                   "repeat": args.repeat, "benchmarks": benchmarks}, writer, indent=2)
+    print("[benchmark.py] Results were written to '" + output + "'")
+
+
+def measure_check_costs(args):
+    """Prints the runner.CHECK_COSTS, the median 'check <name>' stage time of --profile runs of every check"""
+    durations = {}   # check name : median stage time of each run in microseconds
+    with tempfile.TemporaryDirectory() as trace_dir, open(os.devnull, "w") as devnull:
+        for i in range(args.repeat):
+            tracepath = os.path.join(trace_dir, "trace-%d.json" % i)
+            subprocess.call([sys.executable, os.path.join(REPOSITORY_DIR, "test-runner.py"), "--profile",
+                             "--profile-trace", tracepath] + COST_ARGUMENTS, stdout=devnull, stderr=devnull)
+            for name, duration in stage_durations(tracepath).items():
+                if name.startswith("check "):
+                    durations.setdefault(name[6:], []).append(duration)
+    print("CHECK_COSTS = {")
+    for name, duration in sorted(((name, statistics.median(values)) for name, values in durations.items()),
+                                 key=lambda cost: cost[1]):
+        print('    "%s": %d,' % (name, round(duration, -1)))
+    print("}")
+
+
+def compare_results(args):
+    """Prints the median time and memory ratios of a new results file against an old one"""
+    with open(args.old) as old_stream, open(args.new) as new_stream:
+        old_benchmarks = dict(((b["script"], b["font"]), b) for b in json.load(old_stream)["benchmarks"])
+        new_benchmarks = json.load(new_stream)["benchmarks"]
+    for benchmark in new_benchmarks:
+        old_benchmark = old_benchmarks.get((benchmark["script"], benchmark["font"]))
+        if old_benchmark is None:
+            continue
+        time_ratio = benchmark["median_seconds"] / max(old_benchmark["median_seconds"], 1e-9)
+        memory_ratio = float(benchmark["max_rss_kb"]) / max(old_benchmark["max_rss_kb"], 1)
+        print("%-20s %-22s time x%.2f  memory x%.2f" % (benchmark["script"], benchmark["font"], time_ratio, memory_ratio))
+
+
+def main(arguments):
+    parser = argparse.ArgumentParser(prog="benchmark.py", description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command")
+    run_parser = subparsers.add_parser("run", help="run the benchmarks (default)")
+    run_parser.add_argument("--repeat", type=int, default=3, help="runs per script and font (default: %(default)s)")
+    run_parser.add_argument("--rebuild", action="store_true", help="rebuild the synthetic fonts")
+    run_parser.add_argument("--output", metavar="JSON", help="results file (default: benchmarks/results/<commit>.json)")
+    costs_parser = subparsers.add_parser("costs", help="measure the check costs that order the checks of a font")
+    costs_parser.add_argument("--repeat", type=int, default=5, help="profiled runs (default: %(default)s)")
+    compare_parser = subparsers.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("old", metavar="OLD_JSON")
+    compare_parser.add_argument("new", metavar="NEW_JSON")
+
+    if not arguments or arguments[0] not in ("run", "costs", "compare", "-h", "--help"):
+        arguments = ["run"] + list(arguments)
+    args = parser.parse_args(arguments)
+    if args.command == "compare":
+        compare_results(args)
+    elif args.command == "costs":
+        measure_check_costs(args)
+    else:
+        run_benchmarks(args)
+
+
+if __name__ == '__main__':
+    # call with python benchmarks/benchmark.py [run] [--repeat N] [--rebuild] [--output JSON]
+    #        or python benchmarks/benchmark.py costs [--repeat N]
+    #        or python benchmarks/benchmark.py compare [old results JSON] [new results JSON]
+    main(sys.argv[1:])
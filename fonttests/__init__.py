@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+"""Font checks that can be run in-process or through the test-*.py scripts.
+
+    >>> import fonttests
+    >>> for fontpath, results in fonttests.check_fonts("fonts/", glyph_number=1561, version="2.018"):
+    ...     failures = [result for result in results if not result.passed]
+
+Every check returns a list of CheckResult records with the check name, table,
+field, expected value, observed value, pass/fail flag and message.  Library
+functions never write to the terminal or exit the process.
+
+The public names below are imported from their modules on first access, and
+fontTools, PyYAML and NumPy are only imported when a check needs them.
+"""
+
+import importlib
+
+__version__ = "0.1.0"
+
+# public name : module that defines it
+_EXPORTS = {
+    "CheckResult": "fonttests.checks",
+    "METRICS_TESTS": "fonttests.checks",
+    "check_clipping": "fonttests.checks",
+    "check_derived": "fonttests.checks",
+    "check_glyph_number": "fonttests.checks",
+    "check_metrics": "fonttests.checks",
+    "check_monospace": "fonttests.checks",
+    "check_version": "fonttests.checks",
+    "compile_metrics_plan": "fonttests.checks",
+    "compile_width_policy": "fonttests.checks",
+    "check_family": "fonttests.family",
+    "diff_fonts": "fonttests.diff",
+    "load_expected_metrics": "fonttests.expected",
+    "load_width_policy": "fonttests.expected",
+    "FontFile": "fonttests.fontfile",
+    "font_faces": "fonttests.fontfile",
+    "open_font": "fonttests.fontfile",
+    "Manifest": "fonttests.manifest",
+    "MetricsObject": "fonttests.metrics",
+    "Expectations": "fonttests.runner",
+    "check_font": "fonttests.runner",
+    "check_fonts": "fonttests.runner",
+    "find_fonts": "fonttests.runner",
+    "run": "fonttests.runner",
+    "merge_results": "fonttests.shard",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module 'fonttests' has no attribute '" + name + "'")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
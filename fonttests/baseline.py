@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests/baseline.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+"""Generates fully populated expected metrics YAML files from existing fonts.
+
+A baseline file holds every field that MetricsObject extracts plus the glyph
+number, the most common advance width and the version of the font.  The SHA-256
+hash of the font contents is stored with it, so baselines that already match
+their font are not regenerated.
+"""
+
+import os
+import os.path
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from fonttests import profile
+from fonttests.checks import METRICS_TESTS, parse_version, version_strings
+from fonttests.expected import load_yaml
+from fonttests.fontfile import open_font
+from fonttests.metrics import MetricsObject
+from fonttests.runner import pool_size
+
+
+# expected values written to a baseline file in addition to the METRICS_TESTS keys
+BASELINE_KEYS = ("sha256", "glyphNumber", "advanceWidth", "version")
+
+
+def baseline_path(fontpath, outdir):
+    """Returns the baseline file path for a font, e.g. Hack-Regular.ttf -> Hack-Regular-ttf-metrics.yaml"""
+    return os.path.join(outdir, os.path.basename(fontpath).replace(".", "-").replace("#", "-") + "-metrics.yaml")
+
+
+def is_current(font, baselinepath):
+    """Tests whether a baseline file exists, holds every baseline key and matches the font contents"""
+    if not os.path.isfile(baselinepath):
+        return False
+    try:
+        with open(baselinepath, "r") as baseline_stream:
+            baseline = load_yaml(baseline_stream)
+    except Exception:
+        return False
+    if not isinstance(baseline, dict):
+        return False
+    for key in BASELINE_KEYS + tuple(test[1] for test in METRICS_TESTS):
+        if key not in baseline:
+            return False
+    return baseline["sha256"] == font.content_hash()
+
+
+def _yaml_value(value):
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+
+def baseline_text(font):
+    """Returns the text of a fully populated expected metrics YAML file for a font"""
+    import numpy
+    observed_metrics = MetricsObject(font.filepath, font)
+    lines = ["# " + os.path.basename(font.filepath), "sha256: " + font.content_hash()]
+
+    table = None
+    for attribute, key, test_table, label, error_label in METRICS_TESTS:
+        if test_table != table:
+            table = test_table
+            lines.extend(["", "# [" + table + "] table"])
+        lines.append(key + ": " + _yaml_value(getattr(observed_metrics, attribute)))
+
+    advance_widths = font.advance_widths()
+    nonzero_widths = advance_widths[advance_widths > 0]
+    advance_width = int(numpy.bincount(nonzero_widths).argmax()) if len(nonzero_widths) > 0 else 0
+    osx_version_string, win_version_string = version_strings(font)
+    version = parse_version(win_version_string) or parse_version(osx_version_string) or ""
+
+    lines.extend(["", "# [maxp] table", "glyphNumber: " + str(font.fields('maxp')['numGlyphs'])])
+    lines.extend(["", "# [hmtx] table (most common advance width)", "advanceWidth: " + str(advance_width)])
+    lines.extend(["", "# [name] table", "version: " + _yaml_value(version)])
+    return "\n".join(lines) + "\n"
+
+
+def write_baseline(fontpath, outdir):
+    """Writes the baseline file of a font unless it is already current.
+
+    Returns a (fontpath, baselinepath, status) tuple where status is 'written',
+    'current' or an error message.
+    """
+    baselinepath = baseline_path(fontpath, outdir)
+    try:
+        with profile.font(fontpath), open_font(fontpath) as font:
+            if is_current(font, baselinepath):
+                return fontpath, baselinepath, "current"
+            with profile.stage("baseline"):
+                text = baseline_text(font)
+        with open(baselinepath, "wt") as writer:
+            writer.write(text)
+    except Exception as e:
+        return fontpath, baselinepath, "ERROR: " + str(e)
+    return fontpath, baselinepath, "written"
+
+
+def write_baselines(fontpaths, outdir, jobs=1):
+    """Writes the baseline files for a list of fonts, in parallel when jobs > 1, and yields the write_baseline() tuples.
+
+    Fonts of different directories with the same file name would write the same
+    baseline file, so no baseline is written for them and an error is yielded
+    for each of them first.
+    """
+    fontpaths = list(fontpaths)
+    baseline_fonts = {}   # baseline path : list of the distinct font paths that map to it
+    for fontpath in fontpaths:
+        same_baseline_fonts = baseline_fonts.setdefault(baseline_path(fontpath, outdir), [])
+        if os.path.abspath(fontpath) not in [os.path.abspath(path) for path in same_baseline_fonts]:
+            same_baseline_fonts.append(fontpath)
+    written_fontpaths = []
+    for fontpath in fontpaths:
+        baselinepath = baseline_path(fontpath, outdir)
+        other_fontpaths = [path for path in baseline_fonts[baselinepath] if path != fontpath]
+        if other_fontpaths:
+            yield fontpath, baselinepath, ("ERROR: The baseline file '" + baselinepath + "' is also the baseline "
+                                           "file of '" + "', '".join(other_fontpaths) + "'. Write the baselines of "
+                                           "fonts with the same file name to separate directories.")
+        else:
+            written_fontpaths.append(fontpath)
+
+    jobs = pool_size(jobs, len(written_fontpaths))
+    write_font_baseline = partial(write_baseline, outdir=outdir)
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for baseline_result in executor.map(write_font_baseline, written_fontpaths):
+                yield baseline_result
+    else:
+        for fontpath in written_fontpaths:
+            yield write_font_baseline(fontpath)
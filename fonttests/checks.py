@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests/checks.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+"""Font checks shared by the test-*.py scripts and test-runner.py.
+
+Every check takes a FontFile plus its expected value(s) and returns a list of
+CheckResult records.  Checks do not write to the terminal or exit; rendering
+the results is left to the calling script.
+"""
+
+import math
+import re
+from collections import namedtuple
+
+from fonttests.metrics import MetricsObject
+
+
+CheckResult = namedtuple("CheckResult", ["check", "table", "field", "expected", "observed", "passed", "message"])
+
+# (MetricsObject attribute, expected YAML key, table, pass label, error label)
+METRICS_TESTS = (
+    ("unitsPerEm", "unitsPerEm", "head", "Units per Em", "unitsPerEm"),
+    ("ascent", "ascent", "hhea", "Ascent", "hhea table Ascent"),
+    ("descent", "descent", "hhea", "Descent", "hhea table Descent"),
+    ("lineGap", "lineGap", "hhea", "Linegap", "hhea table lineGap"),
+    ("capheight", "capHeight", "OS/2", "Cap Height", "Cap Height"),
+    ("xheight", "xHeight", "OS/2", "X Height", "X Height"),
+    ("typoAscender", "typoAscender", "OS/2", "Typo Ascender", "Typo Ascender"),
+    ("typoDescender", "typoDescender", "OS/2", "Typo Descender", "Typo Descender"),
+    ("typoLineGap", "typoLineGap", "OS/2", "Typo Linegap", "Typo Linegap"),
+    ("winAscent", "winAscent", "OS/2", "winAscent", "winAscent"),
+    ("winDescent", "winDescent", "OS/2", "winDescent", "winDescent"),
+    ("strikeoutPosition", "strikeoutPosition", "OS/2", "Strikeout Position", "Strikeout Position"),
+    ("strikeoutSize", "strikeoutSize", "OS/2", "Strikeout Size", "Strikeout Size"),
+    ("averageWidth", "averageWidth", "OS/2", "Average Character Width", "Average Character Width"),
+    ("superscriptXSize", "superscriptXSize", "OS/2", "Superscript X Size", "Superscript X Size"),
+    ("superscriptXOffset", "superscriptXOffset", "OS/2", "Superscript X Offset", "Superscript X Offset"),
+    ("superscriptYSize", "superscriptYSize", "OS/2", "Superscript Y Size", "Superscript Y Size"),
+    ("superscriptYOffset", "superscriptYOffset", "OS/2", "Superscript Y Offset", "Superscript Y Offset"),
+    ("subscriptXSize", "subscriptXSize", "OS/2", "Subscript X Size", "Subscript X Size"),
+    ("subscriptXOffset", "subscriptXOffset", "OS/2", "Subscript X Offset", "Subscript X Offset"),
+    ("subscriptYSize", "subscriptYSize", "OS/2", "Subscript Y Size", "Subscript Y Size"),
+    ("subscriptYOffset", "subscriptYOffset", "OS/2", "Subscript Y Offset", "Subscript Y Offset"),
+    ("underlinePosition", "underlinePosition", "post", "Underline Position", "Underline Position"),
+    ("underlineThickness", "underlineThickness", "post", "Underline Thickness", "Underline Thickness"),
+    ("italicAngle", "italicAngle", "post", "Italic Angle", "Italic Angle"),
+)
+
+# (table, field, label, glyph extent, sign of the field value as a y coordinate)
+CLIPPING_TESTS = (
+    ("OS/2", "usWinAscent", "winAscent", "yMax", 1),
+    ("OS/2", "usWinDescent", "winDescent", "yMin", -1),
+    ("hhea", "ascent", "Ascent", "yMax", 1),
+    ("hhea", "descent", "Descent", "yMin", 1),
+)
+
+# [OS/2] version 0 to 2 xAvgCharWidth weights per 1000 of the lowercase Latin letters and the space
+AVERAGE_WIDTH_WEIGHTS = (
+    ("a", 64), ("b", 14), ("c", 27), ("d", 35), ("e", 100), ("f", 20), ("g", 14), ("h", 42), ("i", 63),
+    ("j", 3), ("k", 6), ("l", 35), ("m", 20), ("n", 56), ("o", 56), ("p", 17), ("q", 4), ("r", 49),
+    ("s", 56), ("t", 71), ("u", 31), ("v", 10), ("w", 18), ("x", 3), ("y", 18), ("z", 2), (" ", 166),
+)
+
+# (field, label, character whose glyph yMax is the height) of the [OS/2] version 2+ height fields
+HEIGHT_FIELDS = (
+    ("sxHeight", "X Height", "x"),
+    ("sCapHeight", "Cap Height", "H"),
+)
+
+# glyph classes of an advance width policy: every glyph, East Asian wide and fullwidth characters,
+# [GDEF] marks and combining marks, and glyphs that [cmap] does not map
+WIDTH_CLASSES = ("default", "wide", "mark", "unmapped")
+
+# regular expression match pattern for a Unicode range key of an advance width policy, 'U+3000-U+303F' or 'U+00A0'
+WIDTH_RANGE_PATTERN = re.compile(r"U\+(?P<first>[0-9A-F]{4,6})(-U\+(?P<last>[0-9A-F]{4,6}))?$", re.IGNORECASE)
+
+# regular expression match pattern for version string in fonts
+VERSION_PATTERN = re.compile(r"Version\s(?P<version>\d\.\d{3})")
+
+# platformID : preferred (platformID, encodingID, languageID, nameID) version record, Mac Roman and Windows US English
+VERSION_RECORDS = {
+    1: (1, 0, 0, 5),
+    3: (3, 1, 0x409, 5),
+}
+
+
+def compile_metrics_plan(expected_metrics):
+    """Compiles an expected metrics mapping into the comparison plan that check_metrics() runs.
+
+    The plan is a tuple of (attribute, key, table, label, error_label, expected)
+    comparisons for the METRICS_TESTS keys that are defined in expected_metrics.
+    Other keys are ignored.
+    """
+    return tuple(test + (expected_metrics[test[1]],) for test in METRICS_TESTS if test[1] in expected_metrics)
+
+
+def check_metrics(font, metrics_plan):
+    """Compares the [head], [hhea], [OS/2] and [post] metrics of a font against a compiled metrics plan"""
+    observed_metrics = MetricsObject(font.filepath, font)
+    results = []
+    for attribute, key, table, label, error_label, expected in metrics_plan:
+        observed = getattr(observed_metrics, attribute)
+        if observed == expected:
+            message = "[" + table + "] " + label
+        else:
+            message = "[" + table + "] ERROR: " + error_label + " values do not match"
+        results.append(CheckResult("metrics", table, key, expected, observed, observed == expected, message))
+    return results
+
+
+def check_glyph_number(font, expected_glyph_no):
+    """Compares the [maxp] table glyph number against an expected integer value"""
+    observed_glyph_no = font.fields('maxp')['numGlyphs']
+    if observed_glyph_no == expected_glyph_no:
+        message = font.filepath + " glyph number is " + str(expected_glyph_no)
+    else:
+        message = font.filepath + " glyph number is " + str(observed_glyph_no) + " NOT " + str(expected_glyph_no)
+    return [CheckResult("glyphnumber", "maxp", "numGlyphs", expected_glyph_no, observed_glyph_no,
+                        observed_glyph_no == expected_glyph_no, message)]
+
+
+def compile_width_policy(advance_width):
+    """Compiles an expected advance width or advance width policy into the value that check_monospace() tests.
+
+    An integer is the width of every glyph and is returned unchanged.  A policy is
+    a mapping of WIDTH_CLASSES and Unicode ranges to a width, a list of widths or
+    'any', where later keys override earlier ones for the glyphs they share:
+
+        default: 1200
+        wide: 2400
+        mark: 0
+        unmapped: any
+        U+E000-U+F8FF, U+F0000-U+FFFFD: [1200, 2400]
+
+    A policy is compiled into a tuple of (key, class name or (first, last)
+    codepoint range, tuple of widths or None for any width) rules.  Raises
+    ValueError for an unknown key or a width that is not an integer.
+    """
+    if not isinstance(advance_width, dict):
+        return advance_width
+    rules = []
+    for key, widths in advance_width.items():
+        if widths == "any":
+            widths = None
+        else:
+            widths = tuple(widths) if isinstance(widths, (list, tuple)) else (widths,)
+            if len(widths) == 0 or not all(isinstance(width, int) and not isinstance(width, bool) for width in widths):
+                raise ValueError("the advance width policy value of '" + str(key) +
+                                 "' is not a width, a list of widths or 'any'")
+        for selector_key in str(key).split(","):
+            selector_key = selector_key.strip()
+            m = WIDTH_RANGE_PATTERN.match(selector_key)
+            if m is not None:
+                first = int(m.group('first'), 16)
+                last = int(m.group('last') or m.group('first'), 16)
+                if last < first:
+                    raise ValueError("the advance width policy range '" + selector_key + "' ends before it starts")
+                rules.append((selector_key.upper(), (first, last), widths))
+            elif selector_key in WIDTH_CLASSES:
+                rules.append((selector_key, selector_key, widths))
+            else:
+                raise ValueError("the advance width policy key '" + selector_key + "' is not one of " +
+                                 ", ".join(WIDTH_CLASSES) + " or a U+XXXX-U+YYYY range")
+    return tuple(rules)
+
+
+def width_policy_rules(font, rules):
+    """Returns the index of the last width policy rule that selects each glyph ID as a NumPy int array, -1 for none.
+
+    Unicode ranges are resolved through [cmap] with a binary search and glyph
+    classes with FontFile.glyph_class_ids(), which resolves each class once per font.
+    """
+    import numpy
+    glyph_count = len(font.advance_widths())
+    rule_indexes = numpy.full(glyph_count, -1, dtype=numpy.int64)
+    codepoints, glyph_ids = font.character_map()
+    for index, (key, selector, widths) in enumerate(rules):
+        if selector == "default":
+            rule_indexes[:] = index
+        elif isinstance(selector, tuple):
+            first_index, end_index = numpy.searchsorted(codepoints, [selector[0], selector[1] + 1])
+            rule_indexes[glyph_ids[first_index:end_index]] = index
+        else:
+            rule_indexes[font.glyph_class_ids(selector)] = index
+    return rule_indexes
+
+
+def describe_width_policy(rules):
+    """Returns the 'key width, key width or width, key any' description of the rules of a width policy"""
+    return ", ".join(key + " " + ("any" if widths is None else " or ".join(str(width) for width in widths))
+                     for key, selector, widths in rules)
+
+
+def check_monospace(font, expected_advance_width):
+    """Tests the [post] isFixedPitch flag and that every [hmtx] advance width equals the expected width.
+
+    The advance widths are compared as a single NumPy array.  Glyph names are only
+    looked up for the glyphs that fail, and are reported in glyph ID order.  With a
+    compiled width policy (see compile_width_policy()) each glyph is compared
+    against the widths of the last rule that selects it, and glyphs that no rule
+    selects are not tested.
+    """
+    import numpy
+    results = []
+
+    # test for [post] table fixed pitch setting
+    is_fixed_pitch = font.fields('post')['isFixedPitch']
+    if is_fixed_pitch == 0:
+        message = "ERROR: [post] table isFixedPitch setting is not defined as 1."
+    else:
+        message = "[post] table isFixedPitch setting is defined as " + str(is_fixed_pitch) + "."
+    results.append(CheckResult("monospace", "post", "isFixedPitch", 1, is_fixed_pitch, is_fixed_pitch != 0, message))
+
+    # test for advance width settings in [hmtx] table
+    if isinstance(expected_advance_width, tuple):
+        results.append(_check_width_policy(font, expected_advance_width))
+        return results
+    advance_widths = font.advance_widths()
+    incorrect_glyph_ids = numpy.flatnonzero(advance_widths != expected_advance_width)
+    incorrect_width_dict = {}
+    if len(incorrect_glyph_ids) > 0:
+        glyph_order = font.glyph_order()
+        for glyph_id in incorrect_glyph_ids:
+            incorrect_width_dict[glyph_order[glyph_id]] = str(advance_widths[glyph_id])
+        message = ("ERROR: The following " + str(len(incorrect_glyph_ids)) + " of " + str(len(advance_widths)) +
+                   " glyphs in the font '" + font.filepath + "' have an advance width that failed to match your "
+                   "expected metric of " + str(expected_advance_width) + " units:")
+    else:
+        message = ("All " + str(len(advance_widths)) + " glyphs in the font '" + font.filepath +
+                   "' have an advance width of " + str(expected_advance_width) + " units.")
+    results.append(CheckResult("monospace", "hmtx", "advanceWidth", expected_advance_width, incorrect_width_dict,
+                               len(incorrect_width_dict) == 0, message))
+    return results
+
+
+def _check_width_policy(font, rules):
+    import numpy
+    advance_widths = font.advance_widths()
+    rule_indexes = width_policy_rules(font, rules)
+    passed = numpy.ones(len(advance_widths), dtype=bool)
+    for index, (key, selector, widths) in enumerate(rules):
+        if widths is not None:
+            selected = rule_indexes == index
+            passed[selected] = numpy.isin(advance_widths[selected], widths)
+    incorrect_glyph_ids = numpy.flatnonzero(~passed)
+    tested_count = int(numpy.count_nonzero(rule_indexes >= 0))
+    policy = describe_width_policy(rules)
+
+    incorrect_width_dict = {}
+    if len(incorrect_glyph_ids) > 0:
+        glyph_order = font.glyph_order()
+        for glyph_id in incorrect_glyph_ids:
+            incorrect_width_dict[glyph_order[glyph_id]] = str(advance_widths[glyph_id])
+        message = ("ERROR: The following " + str(len(incorrect_glyph_ids)) + " of " + str(len(advance_widths)) +
+                   " glyphs in the font '" + font.filepath + "' have an advance width that failed to match your "
+                   "advance width policy (" + policy + "):")
+    else:
+        message = ("All " + str(tested_count) + " glyphs in the font '" + font.filepath + "' that the advance "
+                   "width policy selects match its widths (" + policy + ").")
+        if tested_count < len(advance_widths):
+            message += " " + str(len(advance_widths) - tested_count) + " glyphs are not selected and were not tested."
+    expected = dict((key, "any" if widths is None else list(widths)) for key, selector, widths in rules)
+    return CheckResult("monospace", "hmtx", "advanceWidth", expected, incorrect_width_dict,
+                       len(incorrect_width_dict) == 0, message)
+
+
+def check_clipping(font):
+    """Tests that every glyph bounding box fits within the [OS/2] winAscent/winDescent and [hhea] ascent/descent.
+
+    The yMax and yMin values of all glyphs are compared against the four metrics
+    as a single (metrics x glyphs) NumPy array.  The expected value of each result
+    is the minimum metric value that fits every glyph, and the observed value is
+    a {glyph name: yMax or yMin} dictionary of the glyphs that are clipped.
+    """
+    import numpy
+    bounds = font.glyph_bounds()
+    columns = {"yMin": 1, "yMax": 3}
+    # +1 for a limit above the baseline that yMax must not exceed, -1 for a limit below that yMin must not exceed
+    directions = numpy.array([1 if extent == "yMax" else -1 for table, field, label, extent, sign in CLIPPING_TESTS])
+    limits = numpy.array([sign * font.fields(table)[field] for table, field, label, extent, sign in CLIPPING_TESTS])
+    extents = bounds[:, [columns[test[3]] for test in CLIPPING_TESTS]].T * directions[:, numpy.newaxis]
+    clipped = extents > (limits * directions)[:, numpy.newaxis]
+    required = extents.max(axis=1, initial=0) * directions
+
+    results = []
+    glyph_order = None
+    for index, (table, field, label, extent, sign) in enumerate(CLIPPING_TESTS):
+        value = sign * int(limits[index])
+        required_value = sign * int(required[index])
+        clipped_glyph_ids = numpy.flatnonzero(clipped[index])
+        clipped_glyphs = {}
+        if len(clipped_glyph_ids) > 0:
+            if glyph_order is None:
+                glyph_order = font.glyph_order()
+            for glyph_id in clipped_glyph_ids:
+                clipped_glyphs[glyph_order[glyph_id]] = int(bounds[glyph_id, columns[extent]])
+            message = ("[" + table + "] ERROR: " + str(len(clipped_glyph_ids)) + " of " + str(len(bounds)) +
+                       " glyphs have a " + extent + " outside of the " + label + " value " + str(value) +
+                       ", every glyph fits when " + label + " is " + str(required_value) + ":")
+        else:
+            message = ("[" + table + "] All " + str(len(bounds)) + " glyphs fit within the " + label + " value " +
+                       str(value))
+        results.append(CheckResult("clipping", table, field, required_value, clipped_glyphs,
+                                   len(clipped_glyphs) == 0, message))
+    return results
+
+
+def average_width(font, os2_version):
+    """Recomputes the [OS/2] xAvgCharWidth of a font and returns (value, description of the computation).
+
+    Version 3 and later fonts use the mean of the nonzero [hmtx] advance widths.
+    Earlier versions use the weighted mean of the lowercase Latin letters and the
+    space if the font maps all of them, and the nonzero mean otherwise.
+    """
+    import numpy
+    advance_widths = font.advance_widths()
+    if os2_version < 3:
+        glyph_ids = font.glyph_ids([ord(character) for character, weight in AVERAGE_WIDTH_WEIGHTS])
+        if numpy.all(glyph_ids != 0):
+            weights = numpy.array([weight for character, weight in AVERAGE_WIDTH_WEIGHTS])
+            weighted_width = float((advance_widths[glyph_ids].astype(numpy.int64) * weights).sum()) / 1000
+            return int(math.floor(weighted_width + 0.5)), "the weighted mean of the a-z and space advance widths"
+    nonzero_widths = advance_widths[advance_widths > 0]
+    if len(nonzero_widths) == 0:
+        return 0, "the mean of the nonzero advance widths"
+    mean_width = float(nonzero_widths.sum(dtype=numpy.int64)) / len(nonzero_widths)
+    return (int(math.floor(mean_width + 0.5)),
+            "the mean of the " + str(len(nonzero_widths)) + " nonzero advance widths")
+
+
+def check_derived(font):
+    """Recomputes the [OS/2] xAvgCharWidth, sxHeight and sCapHeight values from the glyphs and compares them.
+
+    xAvgCharWidth is recomputed from the [hmtx] advance widths (see
+    average_width()), and sxHeight and sCapHeight are the yMax of the glyphs
+    that [cmap] maps to 'x' and 'H'.  The expected value of each result is the
+    recomputed value and the observed value is the value stored in [OS/2].
+    Heights are not checked in fonts that do not map the character.
+    """
+    os2 = font.fields('OS/2')
+    results = []
+
+    observed_width = os2['xAvgCharWidth']
+    expected_width, computation = average_width(font, os2['version'])
+    if observed_width == expected_width:
+        message = "[OS/2] Average Character Width " + str(observed_width) + " matches " + computation
+    else:
+        message = ("[OS/2] ERROR: Average Character Width is " + str(observed_width) + ", " + computation + " is " +
+                   str(expected_width))
+    results.append(CheckResult("derived", "OS/2", "xAvgCharWidth", expected_width, observed_width,
+                               observed_width == expected_width, message))
+
+    if os2['version'] < 2:
+        return results
+    glyph_ids = font.glyph_ids([ord(character) for field, label, character in HEIGHT_FIELDS])
+    bounds = font.glyph_bounds() if glyph_ids.any() else None
+    for (field, label, character), glyph_id in zip(HEIGHT_FIELDS, glyph_ids):
+        observed_height = os2[field]
+        if glyph_id == 0:
+            message = "[OS/2] " + label + " was not recomputed, the font does not map the '" + character + "' character"
+            results.append(CheckResult("derived", "OS/2", field, None, observed_height, True, message))
+            continue
+        expected_height = int(bounds[glyph_id, 3])
+        if observed_height == expected_height:
+            message = "[OS/2] " + label + " " + str(observed_height) + " matches the '" + character + "' glyph yMax"
+        else:
+            message = ("[OS/2] ERROR: " + label + " is " + str(observed_height) + ", the '" + character +
+                       "' glyph yMax is " + str(expected_height))
+        results.append(CheckResult("derived", "OS/2", field, expected_height, observed_height,
+                                   observed_height == expected_height, message))
+    return results
+
+
+def version_string(font, platform_id):
+    """Returns the decoded nameID=5 version string of a platform, or "" if the font has no record for it.
+
+    The English record in VERSION_RECORDS is preferred, otherwise the first
+    record of the platform is used.  Only the selected record is decoded.
+    """
+    keys = [key for key in font.name_records(5) if key[0] == platform_id]
+    if len(keys) == 0:
+        return ""
+    key = VERSION_RECORDS[platform_id] if VERSION_RECORDS[platform_id] in keys else keys[0]
+    return font.name_string(key) or ""
+
+
+def version_strings(font):
+    """Returns the decoded nameID=5 version strings for platformID=1 (OS X) and platformID=3 (Windows)"""
+    return version_string(font, 1), version_string(font, 3)
+
+
+def parse_version(version_string):
+    """Returns the X.XXX version from a 'Version X.XXX' string, or None if the string does not use that syntax"""
+    if version_string.startswith("Version"):
+        m = VERSION_PATTERN.search(version_string)
+        if m is not None:
+            return m.group('version')
+    return None
+
+
+def check_version(font, expected_version):
+    """Tests the 'Version X.XXX' string in the nameID=5 records for platformID=1 (OS X) and platformID=3 (Windows)"""
+    osx_version_string, win_version_string = version_strings(font)
+    return [_check_version_string(font.filepath, osx_version_string, expected_version, 1),
+            _check_version_string(font.filepath, win_version_string, expected_version, 3)]
+
+
+def _check_version_string(fontpath, version_string, expected_version, platform_id):
+    record = "nameID=5, platformID=" + str(platform_id)
+    observed_version = None
+    if len(version_string) > 0:
+        observed_version = parse_version(version_string)
+        if observed_version is not None:
+            if observed_version == expected_version:
+                message = "Expected version string '" + expected_version + "' was detected in the name tables for " + record + "."
+            else:
+                message = "ERROR: Expected version '" + expected_version + "' does not equal observed version '" + observed_version + "' for " + record
+        else:
+            message = "ERROR: Did not detect 'Version X.XXX' syntax at the beginning of the version string in " + record + " name table."
+    else:
+        message = "ERROR: unable to parse the version string from the nameID = 5, platformID=" + str(platform_id) + " table for '" + fontpath + "'."
+    return CheckResult("version", "name", record, expected_version, observed_version,
+                       observed_version == expected_version, message)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests/client.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+"""A thin client for the check server in fonttests.server.
+
+The client only uses the standard library, so it starts without importing
+fontTools, PyYAML or NumPy.  It sends the script name, the arguments and the
+working directory to the server and writes the script output, with the
+standard output and error text in the order the script wrote it, and returns
+the script exit code unchanged.
+"""
+
+import sys
+import os
+import os.path
+import json
+import socket
+import tempfile
+
+
+# scripts that the server runs
+SCRIPTS = ("test-metrics.py", "test-glyphnumber.py", "test-monospace.py", "test-version.py", "test-runner.py")
+
+
+def default_socket_path():
+    """The default server socket path, in $XDG_RUNTIME_DIR or else the temporary directory"""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(runtime_dir, "fonttests-" + str(os.getuid()) + ".sock")
+
+
+def request(message, socketpath=None):
+    """Sends a request dictionary to the server and returns the response dictionary.
+
+    Raises OSError (socket.error) if the server is not running.
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socketpath or default_socket_path())
+        connection.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        response = b""
+        while not response.endswith(b"\n"):
+            data = connection.recv(65536)
+            if not data:
+                break
+            response += data
+    finally:
+        connection.close()
+    return json.loads(response.decode("utf-8"))
+
+
+def run_script(script, arguments, socketpath=None):
+    """Runs a test-*.py script in the server and returns its (output, exit code), see write_output()"""
+    response = request({"script": script, "arguments": list(arguments), "cwd": os.getcwd()}, socketpath)
+    return response["output"], response["exit"]
+
+
+def write_output(output):
+    """Writes a list of ("stdout" or "stderr", text) chunks to the standard streams in list order"""
+    for channel, text in output:
+        stream = sys.stdout if channel == "stdout" else sys.stderr
+        stream.write(text)
+        # the other stream must not overtake the text that is still buffered
+        stream.flush()
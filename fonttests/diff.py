@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests/diff.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+"""Glyph level regression diff between two builds of a font.
+
+The [hmtx] metrics and [glyf] bounding boxes of both fonts are read into
+(glyphs x fields) NumPy arrays, aligned by glyph name and compared in a single
+vectorized pass.  Only the glyphs that changed are reported.
+"""
+
+from collections import namedtuple
+
+import numpy
+
+from fonttests import profile
+from fonttests.fontfile import open_font
+
+
+# columns of a glyph metrics array
+GLYPH_FIELDS = ("advanceWidth", "lsb", "xMin", "yMin", "xMax", "yMax")
+
+# a glyph that is in both fonts with at least one changed field.  old and new are {field: value} dictionaries.
+GlyphChange = namedtuple("GlyphChange", ["glyph", "old", "new"])
+
+# changed is a list of GlyphChange records in the glyph order of the new font,
+# added and removed are lists of glyph names
+FontDiff = namedtuple("FontDiff", ["changed", "added", "removed"])
+
+
+def glyph_metrics(font):
+    """Returns the glyph names and a (glyphs x GLYPH_FIELDS) int32 array of the metrics of a FontFile"""
+    with profile.stage("glyph metrics"):
+        glyph_names = numpy.array(font.glyph_order(), dtype=str)
+        metrics = numpy.empty((len(glyph_names), len(GLYPH_FIELDS)), dtype=numpy.int32)
+        metrics[:, 0] = font.advance_widths()
+        metrics[:, 1] = font.left_side_bearings()
+        metrics[:, 2:6] = font.glyph_bounds()
+    return glyph_names, metrics
+
+
+def diff_metrics(old_names, old_metrics, new_names, new_metrics):
+    """Compares two glyph metrics arrays by glyph name and returns a FontDiff"""
+    common_names, old_indexes, new_indexes = numpy.intersect1d(old_names, new_names, assume_unique=True,
+                                                               return_indices=True)
+    # keep the glyph order of the new font
+    order = numpy.argsort(new_indexes)
+    old_indexes = old_indexes[order]
+    new_indexes = new_indexes[order]
+
+    changed_fields = old_metrics[old_indexes] != new_metrics[new_indexes]
+    changed_rows = numpy.flatnonzero(changed_fields.any(axis=1))
+
+    changed = []
+    for row in changed_rows:
+        fields = numpy.flatnonzero(changed_fields[row])
+        old_row = old_metrics[old_indexes[row]]
+        new_row = new_metrics[new_indexes[row]]
+        changed.append(GlyphChange(str(new_names[new_indexes[row]]),
+                                   dict((GLYPH_FIELDS[field], int(old_row[field])) for field in fields),
+                                   dict((GLYPH_FIELDS[field], int(new_row[field])) for field in fields)))
+
+    added_mask = numpy.ones(len(new_names), dtype=bool)
+    added_mask[new_indexes] = False
+    removed_mask = numpy.ones(len(old_names), dtype=bool)
+    removed_mask[old_indexes] = False
+    return FontDiff(changed, new_names[added_mask].tolist(), old_names[removed_mask].tolist())
+
+
+def diff_fonts(old_fontpath, new_fontpath):
+    """Returns the FontDiff of the glyph metrics of two font files ('path#N' for a collection face)"""
+    with open_font(old_fontpath) as old_font:
+        old_names, old_metrics = glyph_metrics(old_font)
+    with open_font(new_fontpath) as new_font:
+        new_names, new_metrics = glyph_metrics(new_font)
+    with profile.stage("diff"):
+        return diff_metrics(old_names, old_metrics, new_names, new_metrics)
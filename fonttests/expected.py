@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests/expected.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+"""Reads expected value YAML files.  PyYAML is only imported when a file is read."""
+
+from fonttests import profile
+
+
+def load_yaml(stream):
+    """Parses a YAML stream, with the PyYAML C loader if PyYAML was built with LibYAML"""
+    import yaml
+    return yaml.load(stream, Loader=getattr(yaml, "CLoader", yaml.Loader))
+
+
+def load_expected_metrics(expectedpath):
+    """Returns the mapping of expected values in an expected metrics YAML file"""
+    with profile.stage("yaml"), open(expectedpath, "r") as expected_stream:
+        return load_yaml(expected_stream)
+
+
+def load_width_policy(policypath):
+    """Returns the advance width policy mapping of a YAML or JSON file, see checks.compile_width_policy()"""
+    with profile.stage("yaml"), open(policypath, "r") as policy_stream:
+        policy = load_yaml(policy_stream)
+    if not isinstance(policy, dict):
+        raise ValueError("the advance width policy file '" + policypath + "' is not a mapping of widths")
+    return policy
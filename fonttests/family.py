@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests/family.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+"""Tests that the fonts of a family share their metrics.
+
+The MetricsObject fields of every font in a family are extracted into a single
+(fonts x fields) NumPy array.  The family norm of each field is its most common
+value, and every field is grouped and compared against its norm in one
+vectorized pass, so no per-font expected metrics YAML file is needed.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy
+
+from fonttests import profile
+from fonttests.checks import METRICS_TESTS, CheckResult
+from fonttests.fontfile import open_font
+from fonttests.metrics import MetricsObject
+from fonttests.runner import pool_size
+
+
+# expected YAML keys of the vertical metrics that every font of a family is expected to share
+FAMILY_KEYS = ("unitsPerEm", "ascent", "descent", "lineGap", "typoAscender", "typoDescender", "typoLineGap",
+               "winAscent", "winDescent")
+
+
+def family_tests(keys=FAMILY_KEYS):
+    """Returns the METRICS_TESTS records of a list of expected YAML keys, in METRICS_TESTS order"""
+    unknown_keys = set(keys) - set(test[1] for test in METRICS_TESTS)
+    if unknown_keys:
+        raise ValueError("unknown metrics field(s) " + ", ".join(sorted(unknown_keys)))
+    return tuple(test for test in METRICS_TESTS if test[1] in keys)
+
+
+def font_metrics_row(fontpath, attributes):
+    """Returns (values of a list of MetricsObject attributes, None) for a single font, or (None, error message)"""
+    try:
+        with profile.font(fontpath), open_font(fontpath) as font:
+            observed_metrics = MetricsObject(fontpath, font)
+            return [getattr(observed_metrics, attribute) for attribute in attributes], None
+    except Exception as e:
+        return None, str(e)
+
+
+def metrics_matrix(fontpaths, attributes, jobs=1):
+    """Extracts the MetricsObject values of a list of fonts, in parallel when jobs > 1.
+
+    Returns a (fonts x attributes) float64 array of the fonts that were read,
+    the list of their paths, and a list of (fontpath, error message) pairs of
+    the fonts that could not be read.
+    """
+    fontpaths = list(fontpaths)
+    jobs = pool_size(jobs, len(fontpaths))
+    font_row = partial(font_metrics_row, attributes=attributes)
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            rows = list(executor.map(font_row, fontpaths))
+    else:
+        rows = [font_row(fontpath) for fontpath in fontpaths]
+    read_fontpaths = [fontpath for fontpath, (row, error) in zip(fontpaths, rows) if error is None]
+    errors = [(fontpath, error) for fontpath, (row, error) in zip(fontpaths, rows) if error is not None]
+    matrix = numpy.array([row for row, error in rows if error is None], dtype=numpy.float64)
+    return matrix.reshape(len(read_fontpaths), len(attributes)), read_fontpaths, errors
+
+
+def family_norms(matrix):
+    """Computes the family norm of every column of a (fonts x fields) metrics array.
+
+    Returns a (norms, deviations, group_counts) tuple: the most common value of
+    each field (the smallest one on a tie), a (fonts x fields) boolean array that
+    marks the values that differ from the norm, and the number of distinct
+    values of each field.
+    """
+    num_fonts, num_fields = matrix.shape
+    if num_fonts == 0:
+        return numpy.zeros(num_fields), numpy.zeros(matrix.shape, dtype=bool), numpy.zeros(num_fields, dtype=int)
+
+    # sort every field, then number the runs of equal values across all fields at once
+    columns = numpy.sort(matrix.T, axis=1)
+    run_starts = numpy.ones(columns.shape, dtype=bool)
+    run_starts[:, 1:] = columns[:, 1:] != columns[:, :-1]
+    run_ids = numpy.cumsum(run_starts.ravel()) - 1
+    run_sizes = numpy.bincount(run_ids)[run_ids].reshape(columns.shape)
+
+    norms = columns[numpy.arange(num_fields), run_sizes.argmax(axis=1)]
+    deviations = matrix != norms
+    group_counts = run_starts.sum(axis=1)
+    return norms, deviations, group_counts
+
+
+def _metric_value(value):
+    """Converts an array value back to the int or float value of the font table field"""
+    return int(value) if value == int(value) else float(value)
+
+
+def check_family(fontpaths, keys=FAMILY_KEYS, jobs=1):
+    """Compares the metrics of every font in a family against the family norm of each field.
+
+    Returns an error CheckResult for each font that cannot be read, followed by
+    one CheckResult per field of the fonts that were read.  The expected value
+    is the family norm and the observed value is a {fontpath: value} dictionary
+    of the fonts that deviate from it.
+    """
+    tests = family_tests(keys)
+    with profile.stage("family metrics"):
+        matrix, fontpaths, errors = metrics_matrix(fontpaths, [test[0] for test in tests], jobs)
+    with profile.stage("family norms"):
+        norms, deviations, group_counts = family_norms(matrix)
+
+    results = [CheckResult("family", None, None, None, None, False,
+                           "ERROR: Unable to read the metrics of the font '" + fontpath + "'. " + error)
+               for fontpath, error in errors]
+    if len(fontpaths) == 0:
+        return results
+    for field_index, (attribute, key, table, label, error_label) in enumerate(tests):
+        norm = _metric_value(norms[field_index])
+        outlier_indexes = numpy.flatnonzero(deviations[:, field_index])
+        outliers = dict((fontpaths[i], _metric_value(matrix[i, field_index])) for i in outlier_indexes)
+        if len(outliers) == 0:
+            message = "[" + table + "] " + label + " is " + str(norm) + " in all " + str(len(fontpaths)) + " fonts"
+        else:
+            message = ("[" + table + "] ERROR: " + error_label + " has " + str(group_counts[field_index]) +
+                       " different values, " + str(len(outliers)) + " of " + str(len(fontpaths)) +
+                       " fonts deviate from the family value " + str(norm) + ":")
+        results.append(CheckResult("family", table, key, norm, outliers, len(outliers) == 0, message))
+    return results
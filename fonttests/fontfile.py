@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests/fontfile.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+import hashlib
+import io
+import os.path
+import struct
+
+from fonttests import profile
+from fonttests.sfnt import HEADER_TABLES, SfntReader, collection_size
+from fonttests.unicoderanges import COMBINING_MARK_RANGES, WIDE_RANGES
+
+
+def split_font_number(fontpath):
+    """Splits a 'path#N' TTC/OTC collection face path into (path, N).  Other paths return (path, None)."""
+    if "#" in fontpath and not os.path.exists(fontpath):
+        filepath, separator, font_number = fontpath.rpartition("#")
+        if font_number.isdigit():
+            return filepath, int(font_number)
+    return fontpath, None
+
+
+def font_faces(filepath):
+    """Returns the font paths of every face in a font file.
+
+    Each face of a TTC/OTC collection is returned as 'path#N'.  Any other font
+    file is returned as its own path.
+    """
+    num_fonts = collection_size(filepath)
+    if num_fonts > 0:
+        return [filepath + "#" + str(font_number) for font_number in range(num_fonts)]
+    return [filepath]
+
+
+# the font cache that open_font() shares FontFile objects from, installed by the check server
+_font_cache = None
+
+
+def set_font_cache(font_cache):
+    """Installs a font cache with a get(fontpath, table_cache) method in open_font(), None to remove it"""
+    global _font_cache
+    _font_cache = font_cache
+
+
+def font_cache_active():
+    """Tests whether open_font() shares FontFile objects from a font cache"""
+    return _font_cache is not None
+
+
+def open_font(fontpath, table_cache=None, data=None):
+    """Returns the FontFile of a font path.
+
+    While a font cache is installed the FontFile is shared from the cache, and
+    closing it, e.g. at the end of a with block, leaves it open for later use.
+    """
+    if _font_cache is not None:
+        return _font_cache.get(fontpath, table_cache)
+    return FontFile(fontpath, table_cache, data)
+
+
+class FontFile(object):
+    """A font file that is opened once and shared by every check that runs against it.
+
+    The sfnt table directory is read when the first table is requested and each
+    table is decompiled at most once, on first access.  Decompiled tables are
+    cached on the underlying fontTools TTFont for the lifetime of the object.
+
+    Checks that only need the fixed-layout header tables should use fields(),
+    which reads them from a memory map of the file and only builds a TTFont
+    when it is unavoidable.
+
+    TTC/OTC collection faces are opened with a 'path#N' filepath.  Faces of the
+    same collection that are given the same table_cache dictionary share the
+    decompiled tables that the collection stores once for several faces.
+    WOFF and WOFF2 files are opened directly.
+
+    If the bytes of the font file were already read, e.g. by a prefetch stage,
+    they are passed as data and every table is read from them instead of the file.
+    """
+    def __init__(self, filepath, table_cache=None, data=None):
+        self.filepath = filepath         # path to the font, 'path#N' for a collection face
+        self.path, self.font_number = split_font_number(filepath)
+        self.table_cache = table_cache   # fontTools (tag, data) : table dictionary shared by collection faces
+        self.data = data                 # font file bytes, None to read the tables from the file
+        self._ttfont = None              # fontTools TTFont object, opened on demand
+        self._sfnt = None                # SfntReader object, opened on demand (False if unsupported)
+        self._advance_widths = None      # [hmtx] advance widths NumPy array, read on demand
+        self._glyph_bounds = None        # (glyphs x 4) bounding box NumPy array, read on demand
+        self._character_map = None       # (codepoints, glyph IDs) NumPy arrays of the best [cmap] subtable
+        self._glyph_classes = {}         # glyph class : glyph IDs NumPy array, see glyph_class_ids()
+        self._content_hash = None        # SHA-256 hex digest of the file contents, read on demand
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getitem__(self, tag):
+        ttfont = self.ttfont
+        if ttfont.isLoaded(tag):
+            return ttfont[tag]
+        with profile.stage("decompile " + tag):
+            return ttfont[tag]
+
+    def __contains__(self, tag):
+        return tag in self.ttfont
+
+    @property
+    def ttfont(self):
+        """The fontTools TTFont for this file, opened on first use"""
+        if self._ttfont is None:
+            font_number = -1 if self.font_number is None else self.font_number
+            from fontTools import ttLib
+            with profile.stage("TTFont"):
+                source = self.path if self.data is None else io.BytesIO(self.data)
+                self._ttfont = ttLib.TTFont(source, fontNumber=font_number, _tableCache=self.table_cache)
+        return self._ttfont
+
+    @property
+    def sfnt(self):
+        """The SfntReader for this file, or None if the file is not a format that SfntReader supports"""
+        if self._sfnt is None:
+            try:
+                self._sfnt = SfntReader(self.path, self.font_number or 0, self.data)
+            except (ValueError, struct.error):
+                self._sfnt = False
+        return self._sfnt or None
+
+    def fields(self, tag):
+        """Returns the fields of a table as a dictionary keyed by the fontTools attribute names.
+
+        The fixed-layout [head], [hhea], [maxp], [OS/2] and [post] tables are unpacked
+        directly from the file.  Other tables, and files that SfntReader does not
+        support (WOFF2), fall back to the decompiled fontTools table.
+        """
+        if tag in HEADER_TABLES and self._ttfont is None:
+            reader = self.sfnt
+            if reader is not None and tag in reader:
+                return reader.fields(tag)
+        return self[tag].__dict__
+
+    def advance_widths(self):
+        """Returns the [hmtx] advance width of every glyph as a NumPy array indexed by glyph ID.
+
+        The widths are read straight from the raw [hmtx] table bytes unless the file is
+        a WOFF2, where fontTools has to reconstruct the table.
+        Glyphs beyond hhea.numberOfHMetrics repeat the last advance width, as
+        defined in the OpenType specification.
+        """
+        import numpy
+        if self._advance_widths is None:
+            reader = self.sfnt
+            if reader is not None and "hmtx" in reader and "hhea" in reader and "maxp" in reader:
+                num_glyphs = reader.fields('maxp')['numGlyphs']
+                num_hmetrics = min(reader.fields('hhea')['numberOfHMetrics'], num_glyphs)
+                if num_hmetrics == 0 and num_glyphs > 0:
+                    raise ValueError("the [hhea] numberOfHMetrics of '" + self.filepath + "' is 0, the font defines "
+                                     "no advance widths")
+                hmetrics = numpy.frombuffer(reader.table_data('hmtx'), dtype=">u2", count=num_hmetrics * 2)
+                advance_widths = numpy.empty(num_glyphs, dtype=numpy.uint16)
+                advance_widths[:num_hmetrics] = hmetrics[0::2]
+                if num_hmetrics > 0:
+                    advance_widths[num_hmetrics:] = hmetrics[-2]
+            else:
+                hmtx_metrics = self['hmtx'].metrics
+                advance_widths = numpy.array([hmtx_metrics[glyph][0] for glyph in self.glyph_order()],
+                                             dtype=numpy.uint16)
+            self._advance_widths = advance_widths
+        return self._advance_widths
+
+    def left_side_bearings(self):
+        """Returns the [hmtx] left side bearing of every glyph as a NumPy int16 array indexed by glyph ID.
+
+        Glyphs beyond hhea.numberOfHMetrics take their side bearing from the
+        leftSideBearings array that follows the long horizontal metrics.
+        """
+        import numpy
+        reader = self.sfnt
+        if reader is not None and "hmtx" in reader and "hhea" in reader and "maxp" in reader:
+            num_glyphs = reader.fields('maxp')['numGlyphs']
+            num_hmetrics = min(reader.fields('hhea')['numberOfHMetrics'], num_glyphs)
+            hmtx_data = reader.table_data('hmtx')
+            num_bearings = min(num_glyphs - num_hmetrics, max(len(hmtx_data) - num_hmetrics * 4, 0) // 2)
+            left_side_bearings = numpy.zeros(num_glyphs, dtype=numpy.int16)
+            left_side_bearings[:num_hmetrics] = numpy.frombuffer(hmtx_data, dtype=">i2", count=num_hmetrics * 2)[1::2]
+            left_side_bearings[num_hmetrics:num_hmetrics + num_bearings] = numpy.frombuffer(
+                hmtx_data, dtype=">i2", count=num_bearings, offset=num_hmetrics * 4)
+            return left_side_bearings
+        hmtx_metrics = self['hmtx'].metrics
+        return numpy.array([hmtx_metrics[glyph][1] for glyph in self.glyph_order()], dtype=numpy.int16)
+
+    def glyph_bounds(self):
+        """Returns the (xMin, yMin, xMax, yMax) bounding box of every glyph as a NumPy int array indexed by glyph ID.
+
+        TrueType bounding boxes are gathered from the [glyf] glyph headers that
+        [loca] points to, in a single vectorized read.  Empty glyphs are (0, 0, 0, 0).
+        WOFF2 and CFF fonts fall back to fontTools.
+        """
+        if self._glyph_bounds is None:
+            self._glyph_bounds = self._read_glyph_bounds()
+        return self._glyph_bounds
+
+    def _read_glyph_bounds(self):
+        import numpy
+        reader = self.sfnt
+        if reader is not None and "glyf" in reader and "loca" in reader and "head" in reader and "maxp" in reader:
+            num_glyphs = reader.fields('maxp')['numGlyphs']
+            if reader.fields('head')['indexToLocFormat'] == 0:
+                loca = numpy.frombuffer(reader.table_data('loca'), dtype=">u2", count=num_glyphs + 1).astype(numpy.int64) * 2
+            else:
+                loca = numpy.frombuffer(reader.table_data('loca'), dtype=">u4", count=num_glyphs + 1).astype(numpy.int64)
+            glyf = numpy.frombuffer(reader.table_data('glyf'), dtype=numpy.uint8)
+            glyph_ids = numpy.flatnonzero((loca[1:] > loca[:-1]) & (loca[:-1] + 10 <= len(glyf)))
+            # bytes 2-9 of a glyph header hold xMin, yMin, xMax and yMax as big endian int16 values
+            header_bytes = glyf[loca[glyph_ids, numpy.newaxis] + numpy.arange(2, 10)]
+            bounds = numpy.zeros((num_glyphs, 4), dtype=numpy.int32)
+            bounds[glyph_ids] = header_bytes.view(">i2")
+            return bounds
+
+        glyph_order = self.glyph_order()
+        bounds = numpy.zeros((len(glyph_order), 4), dtype=numpy.int32)
+        if "glyf" in self:
+            glyf_table = self['glyf']
+            for glyph_id, glyph_name in enumerate(glyph_order):
+                glyph = glyf_table[glyph_name]
+                if hasattr(glyph, "xMin"):
+                    bounds[glyph_id] = (glyph.xMin, glyph.yMin, glyph.xMax, glyph.yMax)
+        else:
+            from fontTools.pens.boundsPen import BoundsPen
+            glyph_set = self.ttfont.getGlyphSet()
+            for glyph_id, glyph_name in enumerate(glyph_order):
+                pen = BoundsPen(glyph_set)
+                glyph_set[glyph_name].draw(pen)
+                if pen.bounds is not None:
+                    bounds[glyph_id] = [int(round(value)) for value in pen.bounds]
+        return bounds
+
+    def character_map(self):
+        """Returns the (codepoints, glyph IDs) NumPy int arrays of the best Unicode [cmap] subtable, in codepoint order.
+
+        Format 4 and 12 subtables are expanded from the raw [cmap] bytes.  WOFF2
+        files and other subtable formats fall back to fontTools getBestCmap().
+        """
+        if self._character_map is None:
+            self._character_map = self._read_character_map()
+        return self._character_map
+
+    def _read_character_map(self):
+        import numpy
+        reader = self.sfnt if self._ttfont is None else None
+        if reader is not None and "cmap" in reader:
+            character_map = reader.character_map()
+            if character_map is not None:
+                return character_map
+        best_cmap = self['cmap'].getBestCmap() or {}
+        glyph_ids = self.ttfont.getReverseGlyphMap()
+        codepoints = numpy.array(sorted(best_cmap), dtype=numpy.int64)
+        return codepoints, numpy.array([glyph_ids[best_cmap[codepoint]] for codepoint in codepoints],
+                                       dtype=numpy.int64)
+
+    def glyph_ids(self, codepoints):
+        """Returns the glyph ID of each of a sequence of codepoints as a NumPy int array, 0 for unmapped codepoints"""
+        import numpy
+        mapped_codepoints, mapped_glyph_ids = self.character_map()
+        codepoints = numpy.asarray(codepoints, dtype=numpy.int64)
+        if len(mapped_codepoints) == 0:
+            return numpy.zeros(len(codepoints), dtype=numpy.int64)
+        indexes = numpy.minimum(numpy.searchsorted(mapped_codepoints, codepoints), len(mapped_codepoints) - 1)
+        return numpy.where(mapped_codepoints[indexes] == codepoints, mapped_glyph_ids[indexes], 0)
+
+    def glyph_class_ids(self, glyph_class):
+        """Returns the sorted glyph IDs of a glyph class as a NumPy int array.
+
+          - wide      glyphs that [cmap] maps to East Asian wide and fullwidth characters
+          - mark      [GDEF] mark class glyphs and glyphs that [cmap] maps to combining marks
+          - unmapped  glyphs that [cmap] does not map
+
+        Each class is resolved once and kept until the font is closed.
+        """
+        if glyph_class not in self._glyph_classes:
+            self._glyph_classes[glyph_class] = self._read_glyph_class_ids(glyph_class)
+        return self._glyph_classes[glyph_class]
+
+    def _read_glyph_class_ids(self, glyph_class):
+        import numpy
+        codepoints, glyph_ids = self.character_map()
+        in_class = numpy.zeros(len(self.advance_widths()), dtype=bool)
+        if glyph_class == "unmapped":
+            in_class[:] = True
+            in_class[glyph_ids] = False
+        elif glyph_class in CLASS_RANGES:
+            in_class[glyph_ids[_in_class_ranges(codepoints, glyph_class)]] = True
+            if glyph_class == "mark":
+                in_class[self._gdef_mark_glyph_ids()] = True
+        else:
+            raise ValueError("unknown glyph class '" + glyph_class + "'")
+        return numpy.flatnonzero(in_class)
+
+    def _gdef_mark_glyph_ids(self):
+        import numpy
+        reader = self.sfnt if self._ttfont is None else None
+        has_gdef = "GDEF" in reader if reader is not None else "GDEF" in self
+        if not has_gdef or self['GDEF'].table.GlyphClassDef is None:
+            return numpy.zeros(0, dtype=numpy.int64)
+        glyph_ids = self.ttfont.getReverseGlyphMap()
+        return numpy.array([glyph_ids[glyph_name] for glyph_name, glyph_class
+                            in self['GDEF'].table.GlyphClassDef.classDefs.items() if glyph_class == 3],
+                           dtype=numpy.int64)
+
+    def name_records(self, name_id):
+        """Returns the (platformID, encodingID, languageID, nameID) keys of the [name] records with a nameID.
+
+        The records are indexed from the raw [name] table bytes without decoding
+        any strings, unless the file is a WOFF2 or a TTFont is already open.
+        """
+        reader = self.sfnt if self._ttfont is None else None
+        if reader is not None and "name" in reader:
+            return reader.name_records(name_id)
+        return [(record.platformID, record.platEncID, record.langID, record.nameID)
+                for record in self['name'].names if record.nameID == name_id]
+
+    def name_string(self, key):
+        """Decodes the [name] record string with a (platformID, encodingID, languageID, nameID) key, None if missing"""
+        reader = self.sfnt if self._ttfont is None else None
+        if reader is not None and "name" in reader:
+            return reader.name_string(key)
+        platform_id, encoding_id, language_id, name_id = key
+        record = self['name'].getName(name_id, platform_id, encoding_id, language_id)
+        if record is None:
+            return None
+        return record.toUnicode("replace")
+
+    def content_hash(self):
+        """Returns the SHA-256 hex digest of the font file contents (of the whole file for a collection face)"""
+        if self._content_hash is None and self.data is not None:
+            self._content_hash = hashlib.sha256(self.data).hexdigest()
+        elif self._content_hash is None:
+            digest = hashlib.sha256()
+            with open(self.path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            self._content_hash = digest.hexdigest()
+        return self._content_hash
+
+    def glyph_order(self):
+        """Returns the list of glyph names indexed by glyph ID"""
+        with profile.stage("glyph order"):
+            return self.ttfont.getGlyphOrder()
+
+    def close(self):
+        """Releases the font file handles and all cached tables"""
+        if self._ttfont is not None:
+            self._ttfont.close()
+            self._ttfont = None
+        if self._sfnt:
+            self._sfnt.close()
+        self._sfnt = None
+        self._advance_widths = None
+        self._glyph_bounds = None
+        self._character_map = None
+        self._glyph_classes = {}
+        self.data = None
+
+
+# glyph class : sorted (first, last) Unicode ranges of the characters of the class
+CLASS_RANGES = {
+    "wide": WIDE_RANGES,
+    "mark": COMBINING_MARK_RANGES,
+}
+
+# glyph class : (first codepoints, last codepoints) NumPy arrays of CLASS_RANGES, built once per process
+_class_range_arrays = {}
+
+
+def _in_class_ranges(codepoints, glyph_class):
+    """Returns the NumPy bool mask of the codepoints that are within the Unicode ranges of a glyph class"""
+    import numpy
+    if glyph_class not in _class_range_arrays:
+        ranges = CLASS_RANGES[glyph_class]
+        _class_range_arrays[glyph_class] = (numpy.array([first for first, last in ranges], dtype=numpy.int64),
+                                            numpy.array([last for first, last in ranges], dtype=numpy.int64))
+    firsts, lasts = _class_range_arrays[glyph_class]
+    # index of the last range that starts at or before each codepoint
+    indexes = numpy.searchsorted(firsts, codepoints, side="right") - 1
+    return (indexes >= 0) & (codepoints <= lasts[numpy.maximum(indexes, 0)])
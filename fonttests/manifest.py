@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests/manifest.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+"""A single expectations manifest for a whole font corpus.
+
+A manifest is a YAML or JSON mapping of font glob patterns to expected values.
+Patterns are relative to the manifest directory.  Each entry may define any of
+the metrics YAML keys plus glyphNumber, advanceWidth, version, clipping and derived, so baseline
+files can be pasted in as entries.  advanceWidth is a width or an advance width
+policy mapping (see checks.compile_width_policy()), and version a quoted string.
+When several patterns match a font, the later entries override the keys of the
+earlier ones:
+
+    "fonts/Hack-*.ttf":
+      glyphNumber: 1561
+      unitsPerEm: 2048
+    "fonts/Hack-Bold*.ttf":
+      glyphNumber: 1636
+
+The manifest is parsed once, and the expectations of every distinct combination
+of matching entries are compiled once and shared by all fonts that use them.
+"""
+
+import fnmatch
+import glob
+import json
+import os.path
+
+from fonttests import profile
+from fonttests.checks import METRICS_TESTS, compile_metrics_plan, compile_width_policy
+from fonttests.expected import load_yaml
+from fonttests.fontfile import split_font_number
+
+
+# manifest key : Expectations field
+EXPECTATION_KEYS = {
+    "glyphNumber": "glyph_number",
+    "advanceWidth": "advance_width",
+    "version": "version",
+    "clipping": "clipping",
+    "derived": "derived",
+}
+
+# keys written to baseline files that are not expectations
+IGNORED_KEYS = ("sha256",)
+
+MANIFEST_KEYS = frozenset(tuple(EXPECTATION_KEYS) + IGNORED_KEYS + tuple(test[1] for test in METRICS_TESTS))
+
+
+class Manifest(object):
+    """Font glob patterns mapped to expected values, parsed once and compiled into per-font Expectations"""
+    def __init__(self, manifestpath):
+        self.manifestpath = manifestpath
+        self.basedir = os.path.dirname(manifestpath)
+        self.entries = []                # (pattern, expected values mapping) in manifest order
+        self._compiled = {}              # tuple of matching entry indexes : Expectations
+
+        with profile.stage("manifest"), open(manifestpath, "r") as manifest_stream:
+            if manifestpath.lower().endswith(".json"):
+                manifest = json.load(manifest_stream)
+            else:
+                manifest = load_yaml(manifest_stream)
+        if not isinstance(manifest, dict):
+            raise ValueError("the manifest '" + manifestpath + "' is not a mapping of font glob patterns")
+        for pattern, entry in manifest.items():
+            if not isinstance(entry, dict):
+                raise ValueError("the manifest entry '" + pattern + "' is not a mapping of expected values")
+            for key in entry:
+                if key not in MANIFEST_KEYS:
+                    raise ValueError("unknown expected value '" + str(key) + "' in the manifest entry '" + pattern + "'")
+            if "version" in entry and not isinstance(entry["version"], str):
+                # an unquoted 2.010 is read as the number 2.01, which no font version string matches
+                raise ValueError("the version " + repr(entry["version"]) + " in the manifest entry '" + pattern +
+                                 "' is not a string, quote it")
+            self.entries.append((os.path.abspath(os.path.join(self.basedir, pattern)), entry))
+
+    def fontpaths(self):
+        """Returns the sorted font paths matched by the manifest patterns"""
+        fontpaths = set()
+        for pattern, entry in self.entries:
+            fontpaths.update(path for path in glob.glob(pattern) if os.path.isfile(path))
+        return sorted(fontpaths)
+
+    def expectations(self, fontpath, defaults):
+        """Returns the Expectations of a font or collection face, with the manifest values overriding the defaults"""
+        absolute_path = os.path.abspath(split_font_number(fontpath)[0])
+        matches = tuple(index for index, (pattern, entry) in enumerate(self.entries)
+                        if fnmatch.fnmatch(absolute_path, pattern))
+        compile_key = (matches, defaults)
+        if compile_key not in self._compiled:
+            expected_values = {}
+            for index in matches:
+                expected_values.update(self.entries[index][1])
+            overrides = dict((field, expected_values[key]) for key, field in EXPECTATION_KEYS.items()
+                             if key in expected_values)
+            if "advance_width" in overrides:
+                overrides["advance_width"] = compile_width_policy(overrides["advance_width"])
+            for field in ("clipping", "derived"):
+                if field in overrides:
+                    overrides[field] = True if overrides[field] else None
+            metrics_plan = compile_metrics_plan(expected_values)
+            if metrics_plan:
+                overrides["metrics"] = metrics_plan
+            self._compiled[compile_key] = defaults._replace(**overrides)
+        return self._compiled[compile_key]
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests/metrics.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+from fonttests.fontfile import FontFile
+
+
+# table : ((MetricsObject attribute, fontTools table field), ...)
+METRICS_FIELDS = (
+    ("head", (("unitsPerEm", "unitsPerEm"),)),
+    ("hhea", (("ascent", "ascent"),
+              ("descent", "descent"),
+              ("lineGap", "lineGap"))),
+    ("OS/2", (("capheight", "sCapHeight"),
+              ("xheight", "sxHeight"),
+              ("typoAscender", "sTypoAscender"),
+              ("typoDescender", "sTypoDescender"),
+              ("typoLineGap", "sTypoLineGap"),
+              ("winAscent", "usWinAscent"),
+              ("winDescent", "usWinDescent"),
+              ("strikeoutPosition", "yStrikeoutPosition"),
+              ("strikeoutSize", "yStrikeoutSize"),
+              ("averageWidth", "xAvgCharWidth"),
+              ("superscriptXSize", "ySuperscriptXSize"),
+              ("superscriptXOffset", "ySuperscriptXOffset"),
+              ("superscriptYSize", "ySuperscriptYSize"),
+              ("superscriptYOffset", "ySuperscriptYOffset"),
+              ("subscriptXSize", "ySubscriptXSize"),
+              ("subscriptXOffset", "ySubscriptXOffset"),
+              ("subscriptYSize", "ySubscriptYSize"),
+              ("subscriptYOffset", "ySubscriptYOffset"))),
+    ("post", (("underlinePosition", "underlinePosition"),
+              ("underlineThickness", "underlineThickness"),
+              ("italicAngle", "italicAngle"))),
+)
+
+METRICS_TABLES = tuple(table for table, fields in METRICS_FIELDS)
+TABLE_FIELDS = dict(METRICS_FIELDS)
+
+# MetricsObject attribute : table
+ATTRIBUTE_TABLES = dict((attribute, table) for table, fields in METRICS_FIELDS for attribute, field in fields)
+
+
+class MetricsObject(object):
+    """A font metrics object that maintains metrics properties during testing.
+
+    The metrics of a table are read from the font the first time that one of
+    them is accessed, so a check that only compares [hhea] values never reads
+    the [OS/2] table.  The font is released as soon as every table has been
+    read, or when extract() is called.  The exception of a table that fails to
+    read is raised to the caller, after the font is released.
+    """
+    __slots__ = ("filepath", "font_object", "_owns_font", "_pending_tables") + tuple(ATTRIBUTE_TABLES.keys())
+
+    def __init__(self, filepath, font_object=None):
+        self.filepath = filepath                 # path to the font
+        self.font_object = font_object           # shared FontFile object, None once released
+        self._owns_font = font_object is None    # True if the FontFile is opened (and closed) by this object
+        self._pending_tables = METRICS_TABLES    # tables that have not been read yet
+
+    def __getattr__(self, name):
+        # only called for metrics slots that have not been assigned yet
+        table = ATTRIBUTE_TABLES.get(name)
+        if table is None:
+            raise AttributeError("'MetricsObject' object has no attribute '" + name + "'")
+        self.define_table(table)
+        return object.__getattribute__(self, name)
+
+    def define_table(self, table):
+        """Reads the metrics of a table from the font and releases the font once every table is read"""
+        if table not in self._pending_tables:
+            return
+        fields = TABLE_FIELDS[table]
+        try:
+            if self.font_object is None:
+                self.font_object = FontFile(self.filepath)
+                self._owns_font = True
+            table_dict = self.font_object.fields(table)
+            values = [table_dict[field] for attribute, field in fields]
+        except Exception:
+            self.release()
+            raise
+        for (attribute, field), value in zip(fields, values):
+            setattr(self, attribute, value)
+        self._pending_tables = tuple(pending_table for pending_table in self._pending_tables if pending_table != table)
+        if len(self._pending_tables) == 0:
+            self.release()
+
+    def extract(self):
+        """Reads every remaining table and releases the font"""
+        for table in self._pending_tables:
+            self.define_table(table)
+        return self
+
+    def release(self):
+        """Drops the reference to the font, closing it if it was opened by this object"""
+        if self._owns_font and self.font_object is not None:
+            self.font_object.close()
+        self.font_object = None
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests/profile.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+"""Per-stage timing and memory instrumentation for the --profile option.
+
+While a Profiler is active, stage() records the wall time of the code that it
+wraps (imports, YAML loading, TTFont construction, each table decompile, each
+check and the terminal report) and font() records the wall time and the
+tracemalloc peak memory of each font.  Stages nest, so the time of a table
+decompile that is triggered by a check is also part of the time of the check.
+
+When no Profiler is active, stage() and font() return a shared no-op context
+manager and add no measurable overhead.
+
+The trace is written in the Chrome trace event JSON format, which can be opened
+in chrome://tracing or https://ui.perfetto.dev, with an additional 'fonts'
+list that holds the per-font totals.
+"""
+
+import sys
+import os
+import json
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+# time at which fonttests.profile was first imported.  Scripts import it before
+# yaml and fontTools so that the 'import' stage covers the heavy imports.
+IMPORT_START = time.perf_counter()
+
+# the Profiler that stage() and font() record to, if any
+_active_profiler = None
+
+# the first Profiler of a process also records the 'import' stage
+_imports_profiled = False
+
+_null_context = nullcontext()
+
+
+def stage(name):
+    """Returns a context manager that records the wall time of a named stage in the active Profiler"""
+    if _active_profiler is None:
+        return _null_context
+    return _active_profiler.stage(name)
+
+
+def font(fontpath):
+    """Returns a context manager that records the wall time and peak memory of a font in the active Profiler"""
+    if _active_profiler is None:
+        return _null_context
+    return _active_profiler.font(fontpath)
+
+
+def is_active():
+    """Tests whether a Profiler is recording"""
+    return _active_profiler is not None
+
+
+def stage_durations(tracepath):
+    """Returns the median duration in microseconds of each stage name in a JSON trace written by a Profiler.
+
+    The median is used so that a one-off cost, such as the import that the first
+    font triggers, does not skew the duration of a stage that runs once per font.
+    """
+    with open(tracepath, "r") as trace_stream:
+        trace = json.load(trace_stream)
+    durations = {}
+    for trace_event in trace.get("traceEvents", []):
+        durations.setdefault(trace_event["name"], []).append(trace_event["dur"])
+    return dict((name, statistics.median(values)) for name, values in durations.items())
+
+
+def profile_options(arguments, script):
+    """Removes the '--profile' and '--profile-trace PATH' options from a script argument list.
+
+    Returns the remaining arguments and a Profiler, which only records when
+    --profile is defined.  The JSON trace is written to '<script>-profile.json'
+    unless --profile-trace defines another path.
+    """
+    enabled = False
+    tracepath = os.path.splitext(script)[0] + "-profile.json"
+    remaining_arguments = []
+    argument_iter = iter(arguments)
+    for argument in argument_iter:
+        if argument == "--profile":
+            enabled = True
+        elif argument == "--profile-trace" or argument.startswith("--profile-trace="):
+            enabled = True
+            tracepath = argument.split("=", 1)[1] if "=" in argument else next(argument_iter, tracepath)
+        else:
+            remaining_arguments.append(argument)
+    return remaining_arguments, Profiler(script, tracepath, enabled)
+
+
+class Profiler(object):
+    """Records stage wall times and per-font peak memory while it is active.
+
+    Use a Profiler as a context manager around the main function of a script.
+    On exit, including a sys.exit(), the summary table is written to the
+    standard error stream and the JSON trace is written to tracepath.
+    """
+    def __init__(self, script, tracepath=None, enabled=True):
+        self.script = script             # script name used as the prefix of the summary lines
+        self.tracepath = tracepath       # JSON trace file path, None to skip the trace
+        self.enabled = enabled           # False makes the Profiler a no-op context manager
+        self.events = []                 # (stage name, font path, start seconds, duration seconds) records
+        self.fonts = []                  # (font path, duration seconds, peak memory bytes) records
+        self._font = None                # path of the font that is currently being profiled
+        self._start = None               # perf_counter() value at the start of the profile
+
+    def __enter__(self):
+        if self.enabled:
+            self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.enabled:
+            self.stop()
+            sys.stderr.write(self.summary())
+            if self.tracepath:
+                try:
+                    self.write_trace(self.tracepath)
+                    sys.stderr.write("[" + self.script + "] Profile trace was written to '" + self.tracepath + "'\n")
+                except (IOError, OSError) as e:
+                    sys.stderr.write("[" + self.script + "] ERROR: Unable to write the profile trace. " + str(e) + "\n")
+
+    def start(self):
+        """Makes this Profiler the active one and starts tracing memory allocations"""
+        global _active_profiler, _imports_profiled
+        if _imports_profiled:
+            self._start = time.perf_counter()
+        else:
+            self._start = IMPORT_START
+            self.events.append(("import", None, 0.0, time.perf_counter() - IMPORT_START))
+            _imports_profiled = True
+        _active_profiler = self
+        tracemalloc.start()
+
+    def stop(self):
+        """Stops recording"""
+        global _active_profiler
+        if _active_profiler is self:
+            _active_profiler = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.events.append((name, self._font, start - self._start, time.perf_counter() - start))
+
+    @contextmanager
+    def font(self, fontpath):
+        previous_font = self._font
+        self._font = fontpath
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.fonts.append((fontpath, duration, tracemalloc.get_traced_memory()[1]))
+            self._font = previous_font
+
+    def summary(self):
+        """Returns the text of the stage and font summary tables"""
+        stage_totals = {}
+        for name, fontpath, start, duration in self.events:
+            count, total = stage_totals.get(name, (0, 0.0))
+            stage_totals[name] = (count + 1, total + duration)
+        wall_seconds = time.perf_counter() - self._start if self._start is not None else 0.0
+
+        lines = ["", "[" + self.script + "] Profile (wall time " + "%.3f" % wall_seconds + " s, nested stages are "
+                 "included in their parent stages)", "",
+                 "  %-32s %8s %12s %7s" % ("stage", "count", "seconds", "%")]
+        for name in sorted(stage_totals, key=lambda name: -stage_totals[name][1]):
+            count, total = stage_totals[name]
+            percent = 100.0 * total / wall_seconds if wall_seconds > 0 else 0.0
+            lines.append("  %-32s %8d %12.4f %6.1f%%" % (name, count, total, percent))
+        if self.fonts:
+            lines.extend(["", "  %-52s %12s %12s" % ("font", "seconds", "peak KB")])
+            for fontpath, duration, peak_memory in self.fonts:
+                lines.append("  %-52s %12.4f %12d" % (fontpath, duration, peak_memory // 1024))
+        return "\n".join(lines) + "\n\n"
+
+    def trace(self):
+        """Returns the profile as a Chrome trace event dictionary"""
+        pid = os.getpid()
+        trace_events = []
+        for name, fontpath, start, duration in self.events:
+            trace_event = {"name": name, "cat": name.split(" ")[0], "ph": "X", "pid": pid, "tid": 0,
+                           "ts": int(start * 1e6), "dur": int(duration * 1e6)}
+            if fontpath is not None:
+                trace_event["args"] = {"font": fontpath}
+            trace_events.append(trace_event)
+        fonts = [{"font": fontpath, "seconds": duration, "peak_memory_bytes": peak_memory}
+                 for fontpath, duration, peak_memory in self.fonts]
+        return {"script": self.script, "traceEvents": trace_events, "fonts": fonts}
+
+    def write_trace(self, tracepath):
+        with open(tracepath, "wt") as writer:
+            json.dump(self.trace(), writer, indent=1)
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests/report.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+"""Console, JSON Lines and JUnit XML reports of check results.
+
+The test-*.py scripts write their console text and their CheckResult records
+to a Report.  '--report FORMAT[:PATH]' selects the outputs, and can be
+repeated.  The default is the console format:
+
+  - console  the human-oriented text of each script, on stdout and stderr
+  - jsonl    one JSON object per check result, streamed as each font is checked
+  - junit    JUnit XML with a <testsuite> per font and a <testcase> per result
+
+PATH is a file path, or '-' or nothing for the standard output.  Writes are
+buffered: consecutive writes to the same stream are joined and written in one
+call when the report switches to another stream, when BUFFER_SIZE characters
+are pending, and at the end of each font.
+"""
+
+import sys
+import json
+import re
+from xml.sax.saxutils import escape, quoteattr
+
+
+REPORT_FORMATS = ("console", "jsonl", "junit")
+
+# number of pending characters that are written at once
+BUFFER_SIZE = 64 * 1024
+
+# characters that XML 1.0 does not allow
+XML_INVALID_CHARACTERS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def parse_report(value):
+    """Returns the (format, path) of a 'FORMAT[:PATH]' report definition, raising ValueError if it is invalid.
+
+    path is None for the standard output.
+    """
+    report_format, separator, path = value.partition(":")
+    if report_format not in REPORT_FORMATS:
+        raise ValueError("the report format '" + report_format + "' is not one of " + ", ".join(REPORT_FORMATS))
+    if path in ("", "-"):
+        path = None
+    if report_format == "console" and path is not None:
+        raise ValueError("the console report is always written to the standard output and error streams")
+    return report_format, path
+
+
+def report_options(arguments, script):
+    """Removes the '--report FORMAT[:PATH]' options from a script argument list.
+
+    Returns the remaining arguments and a Report.  Raises ValueError for an
+    invalid --report value.
+    """
+    reports = []
+    remaining_arguments = []
+    argument_iter = iter(arguments)
+    for argument in argument_iter:
+        if argument == "--report" or argument.startswith("--report="):
+            reports.append(parse_report(argument.split("=", 1)[1] if "=" in argument else next(argument_iter, "")))
+        else:
+            remaining_arguments.append(argument)
+    return remaining_arguments, Report(script, reports or [("console", None)])
+
+
+class OutputBuffer(object):
+    """Joins consecutive writes to the same stream and writes them in a single call.
+
+    A stream is "stdout", "stderr" or an open file object.  The standard streams
+    are looked up when the text is written, so a redirected sys.stdout is used.
+    """
+    def __init__(self, size=BUFFER_SIZE):
+        self.size = size                 # number of pending characters that are written at once
+        self._stream = None              # stream of the pending text
+        self._pending = []               # text fragments not written yet
+        self._pending_size = 0
+
+    def write(self, stream, text):
+        if stream != self._stream:
+            self.flush()
+            self._stream = stream
+        self._pending.append(text)
+        self._pending_size += len(text)
+        if self._pending_size >= self.size:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            stream = getattr(sys, self._stream) if isinstance(self._stream, str) else self._stream
+            stream.write("".join(self._pending))
+            stream.flush()
+            self._pending = []
+            self._pending_size = 0
+
+
+def result_record(script, fontpath, result):
+    """Returns the JSON Lines dictionary of a CheckResult"""
+    record = {"script": script, "font": fontpath}
+    record.update(result._asdict())
+    return record
+
+
+class JsonLinesWriter(object):
+    """Streams one JSON object per check result"""
+    def __init__(self, script, output, stream):
+        self.script = script
+        self.output = output             # OutputBuffer of the report
+        self.stream = stream             # "stdout" or an open file object
+
+    def font(self, fontpath, results, script):
+        for result in results:
+            self.output.write(self.stream, json.dumps(result_record(script, fontpath, result), default=str) + "\n")
+
+    def close(self):
+        pass
+
+
+class JUnitWriter(object):
+    """Streams a JUnit XML document with a <testsuite> per font and a <testcase> per check result"""
+    def __init__(self, script, output, stream):
+        self.script = script
+        self.output = output             # OutputBuffer of the report
+        self.stream = stream             # "stdout" or an open file object
+        self.output.write(self.stream, '<?xml version="1.0" encoding="utf-8"?>\n<testsuites name=' +
+                          xml_attribute(script) + '>\n')
+
+    def font(self, fontpath, results, script):
+        failures = [result for result in results if not result.passed]
+        testsuite = ['  <testsuite name=' + xml_attribute(fontpath) + ' tests="' + str(len(results)) +
+                     '" failures="' + str(len(failures)) + '">\n']
+        for result in results:
+            name = " ".join(str(value) for value in (result.table, result.field) if value is not None) or result.check
+            testsuite.append('    <testcase classname=' + xml_attribute(script + "." + result.check) +
+                             ' name=' + xml_attribute(name))
+            if result.passed:
+                testsuite.append('/>\n')
+            else:
+                details = ("expected: " + json.dumps(result.expected, default=str) + "\nobserved: " +
+                           json.dumps(result.observed, default=str))
+                testsuite.append('>\n      <failure message=' + xml_attribute(result.message) + '>' +
+                                 xml_text(details) + '</failure>\n    </testcase>\n')
+        testsuite.append('  </testsuite>\n')
+        self.output.write(self.stream, "".join(testsuite))
+
+    def close(self):
+        self.output.write(self.stream, '</testsuites>\n')
+
+
+def xml_attribute(value):
+    return quoteattr(XML_INVALID_CHARACTERS.sub("", str(value)))
+
+
+def xml_text(value):
+    return escape(XML_INVALID_CHARACTERS.sub("", str(value)))
+
+
+class Report(object):
+    """Writes the console text and the check results of a script to the selected report formats.
+
+    Use a Report as a context manager around the main function of a script.  On
+    exit, including a sys.exit(), the pending output is written and the report
+    files are closed.
+    """
+    def __init__(self, script, reports=(("console", None),)):
+        self.script = script             # script name written to the JSON Lines and JUnit reports
+        self.console = False             # True if the console text is written
+        self.writers = []                # JsonLinesWriter and JUnitWriter objects
+        self.output = OutputBuffer()
+        self._files = []                 # report files opened by this Report
+        stdout_reports = [report_format for report_format, path in reports if path is None]
+        if len(stdout_reports) > 1:
+            raise ValueError("only one report can be written to the standard output, not " +
+                             " and ".join(stdout_reports))
+        for report_format, path in reports:
+            if report_format == "console":
+                self.console = True
+                continue
+            if path is None:
+                stream = "stdout"
+            else:
+                stream = open(path, "w", encoding="utf-8")
+                self._files.append(stream)
+            writer_class = JsonLinesWriter if report_format == "jsonl" else JUnitWriter
+            self.writers.append(writer_class(script, self.output, stream))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def out(self, text):
+        """Writes console text to the standard output stream"""
+        if self.console:
+            self.output.write("stdout", text)
+
+    def err(self, text):
+        """Writes console text to the standard error stream"""
+        if self.console:
+            self.output.write("stderr", text)
+
+    def error(self, text):
+        """Writes an error that is not a check result to the standard error stream, in every report format"""
+        self.output.write("stderr", text)
+
+    def results(self, fontpath, results, script=None):
+        """Writes the CheckResult records of a font to the JSON Lines and JUnit reports.
+
+        script is the script that checked the font, by default the script of the report.
+        """
+        for writer in self.writers:
+            writer.font(fontpath, results, script or self.script)
+        self.output.flush()
+
+    def close(self):
+        """Ends the reports and writes the pending output"""
+        for writer in self.writers:
+            writer.close()
+        self.writers = []
+        self.output.flush()
+        for report_file in self._files:
+            report_file.close()
+        self._files = []
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests/resultcache.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+"""A persistent SQLite cache of check results.
+
+Results are keyed on the SHA-256 hash of the font file contents, the font path,
+the check name, its expected value(s) and a fingerprint of the fonttests
+sources, so a font is only re-tested when the font, its expectations or the
+code that checks it change.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import os.path
+import sqlite3
+import time
+
+from fonttests import __version__
+
+
+# default maximum total size of the cached results in bytes
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+# seconds before the last used time of a cache hit is written again, so re-runs read the cache without writing it
+LAST_USED_RESOLUTION = 60 * 60
+
+# number of stored results between two recounts of the total cached size, which other processes also change
+EVICT_INTERVAL = 256
+
+# fraction of max_size that an eviction shrinks the cached results to, so the following stores do not evict
+EVICT_TARGET = 0.9
+
+
+# SHA-256 hex digest of the fonttests version and sources, computed once per process
+_code_fingerprint = None
+
+
+def code_fingerprint():
+    """Returns a hash of the fonttests version and the source of every fonttests module"""
+    global _code_fingerprint
+    if _code_fingerprint is None:
+        digest = hashlib.sha256(__version__.encode("utf-8"))
+        for sourcepath in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+            digest.update(os.path.basename(sourcepath).encode("utf-8") + b"\0")
+            with open(sourcepath, "rb") as source_stream:
+                digest.update(source_stream.read() + b"\0")
+        _code_fingerprint = digest.hexdigest()
+    return _code_fingerprint
+
+
+def default_cache_path():
+    """The default cache file path in the user cache directory"""
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_dir, "fonttests", "results.sqlite")
+
+
+def add_cache_arguments(parser):
+    """Adds the '--cache PATH' and '--no-cache' options of the result cache to an argparse parser"""
+    parser.add_argument("--cache", metavar="PATH", default=default_cache_path(),
+                        help="result cache file path (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="re-run every check and do not use the result cache")
+
+
+class ResultCache(object):
+    """An on-disk cache of check results with least recently used eviction by total size"""
+    def __init__(self, cachepath=None, max_size=DEFAULT_MAX_SIZE):
+        self.cachepath = cachepath or default_cache_path()
+        self.max_size = max_size         # maximum total size of the cached results in bytes
+        cache_dir = os.path.dirname(self.cachepath)
+        if cache_dir and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self._connection = sqlite3.connect(self.cachepath, timeout=30)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS results ("
+                                 "key TEXT PRIMARY KEY, results TEXT NOT NULL, "
+                                 "size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self._connection.commit()
+        self._touched = []               # (last used time, key) of the cache hits that are not written yet
+        self._stored = 0                 # number of results stored since the total size was counted
+        self._total_size = self._count_size()   # total size of the cached results, as counted plus stored since
+
+    def key(self, font_hash, fontpath, check, expected):
+        """Returns the cache key of a check run against a font with an expected value"""
+        key_data = json.dumps([code_fingerprint(), font_hash, fontpath, check, expected], sort_keys=True)
+        return hashlib.sha256(key_data.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the cached list of result dictionaries for a key, or None.
+
+        The last used time of an entry is only updated when it is older than
+        LAST_USED_RESOLUTION, and the updates are written together by flush().
+        """
+        row = self._connection.execute("SELECT results, last_used FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > LAST_USED_RESOLUTION:
+            self._touched.append((now, key))
+        return json.loads(row[0])
+
+    def put(self, key, results):
+        """Stores a list of JSON serializable result dictionaries and evicts old entries above max_size"""
+        results_json = json.dumps(results)
+        self._connection.execute("INSERT OR REPLACE INTO results (key, results, size, last_used) VALUES (?, ?, ?, ?)",
+                                 (key, results_json, len(results_json), time.time()))
+        self._connection.commit()
+        self._stored += 1
+        self._total_size += len(results_json)
+        if self._total_size > self.max_size or self._stored >= EVICT_INTERVAL:
+            self.evict()
+
+    def flush(self):
+        """Writes the pending last used times of the cache hits in one transaction"""
+        if self._touched:
+            self._connection.executemany("UPDATE results SET last_used = ? WHERE key = ?", self._touched)
+            self._connection.commit()
+            self._touched = []
+
+    def _count_size(self):
+        self._stored = 0
+        return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def evict(self):
+        """Removes the least recently used entries when the cached results exceed max_size, down to EVICT_TARGET"""
+        self._total_size = self._count_size()
+        if self._total_size <= self.max_size:
+            return
+        target_size = self.max_size * EVICT_TARGET
+        expired_keys = []
+        for key, size in self._connection.execute("SELECT key, size FROM results ORDER BY last_used"):
+            if self._total_size <= target_size:
+                break
+            expired_keys.append((key,))
+            self._total_size -= size
+        self._connection.executemany("DELETE FROM results WHERE key = ?", expired_keys)
+        self._connection.commit()
+
+    def close(self):
+        if self._connection is not None:
+            self.flush()
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests/runner.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+"""Runs every requested check against a font set, opening each font only once"""
+
+import os
+import os.path
+from collections import deque, namedtuple
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from fonttests import profile
+from fonttests.checks import (CheckResult, check_clipping, check_derived, check_glyph_number, check_metrics,
+                              check_monospace, check_version, compile_metrics_plan, compile_width_policy)
+from fonttests.expected import load_expected_metrics
+from fonttests.fontfile import font_cache_active, font_faces, open_font, split_font_number
+from fonttests.resultcache import DEFAULT_MAX_SIZE, ResultCache
+
+
+FONT_EXTENSIONS = (".ttf", ".otf", ".ttc", ".otc", ".woff", ".woff2")
+
+# number of fonts that are read ahead of the fonts that are being checked in this process
+DEFAULT_PREFETCH = 4
+
+# number of threads that read the prefetched font files
+PREFETCH_THREADS = 2
+
+# (check name, check function, Expectations field) in report order
+CHECKS = (
+    ("metrics", check_metrics, "metrics"),
+    ("glyphnumber", check_glyph_number, "glyph_number"),
+    ("monospace", check_monospace, "advance_width"),
+    ("version", check_version, "version"),
+    ("clipping", check_clipping, "clipping"),
+    ("derived", check_derived, "derived"),
+)
+
+# checks that take no expected value, their Expectations field is only True to run them
+EXPECTATION_FREE_CHECKS = frozenset(("clipping", "derived"))
+
+# check name : estimated cost in microseconds per font, the median 'check <name>' stage time of --profile runs of
+# every check on the Hack fonts in tests/fonts, as printed by 'python benchmarks/benchmark.py costs'.  Measure them
+# again after changing a check; the --check-costs option of test-runner.py uses the times of a profile trace instead.
+CHECK_COSTS = {
+    "glyphnumber": 330,       # [maxp] numGlyphs
+    "metrics": 470,           # fixed-layout [head], [hhea], [OS/2] and [post] fields
+    "version": 640,           # [name] record index and two decoded strings
+    "monospace": 810,         # every [hmtx] advance width, and the glyph order on a failure
+    "derived": 1640,          # [hmtx] advance widths, [cmap] and the [glyf] header of every glyph
+    "clipping": 27460,        # [loca] and the [glyf] header of every glyph
+}
+
+# Expected values for a single font.  A None value skips the associated check.
+# metrics is a plan compiled by fonttests.checks.compile_metrics_plan(), clipping and derived are True to run the
+# expectation-free checks.
+Expectations = namedtuple("Expectations", ["metrics", "advance_width", "glyph_number", "version", "clipping",
+                                           "derived"])
+
+
+def find_fonts(paths):
+    """Expands a list of font file and directory paths into a sorted list of font paths.
+
+    TTC/OTC collections are expanded into a 'path#N' font path for each face.
+    """
+    fontpaths = []
+    for path in paths:
+        if os.path.isdir(path):
+            filepaths = [os.path.join(path, filename) for filename in sorted(os.listdir(path))
+                         if filename.lower().endswith(FONT_EXTENSIONS)]
+        else:
+            filepaths = [path]
+        for filepath in filepaths:
+            if os.path.isfile(filepath):
+                fontpaths.extend(font_faces(filepath))
+            else:
+                fontpaths.append(filepath)
+    return fontpaths
+
+
+# ResultCache objects opened in this process, by cache path
+_result_caches = {}
+
+# the decompiled table cache of the last TTC/OTC collection file tested in this process
+_collection_table_cache = {"path": None, "tables": None}
+
+
+def open_result_cache(cachepath, max_size=DEFAULT_MAX_SIZE):
+    """Returns the ResultCache for a cache path, opening it once per process"""
+    if cachepath not in _result_caches:
+        _result_caches[cachepath] = ResultCache(cachepath, max_size)
+    return _result_caches[cachepath]
+
+
+def check_costs(tracepath=None):
+    """Returns the estimated cost of each check, with the measured costs of a profile trace file overriding CHECK_COSTS"""
+    costs = dict(CHECK_COSTS)
+    if tracepath is not None:
+        for name, duration in profile.stage_durations(tracepath).items():
+            if name.startswith("check ") and name[6:] in costs:
+                costs[name[6:]] = duration
+    return costs
+
+
+def check_font(font, expectations, cache=None, fail_fast=False, costs=None):
+    """Runs each check that has an expected value against a single shared FontFile.
+
+    The checks run from the cheapest to the most expensive estimated cost (see
+    check_costs()), and the results are returned in the CHECKS order.  With
+    fail_fast, the checks that follow the first failed check are skipped, so
+    their tables are never read.
+
+    If a ResultCache is defined, cached results are returned for checks that were
+    already run against identical font contents and expected values.
+    """
+    costs = costs or CHECK_COSTS
+    scheduled_checks = sorted(CHECKS, key=lambda check: costs.get(check[0], 0))
+    check_results = {}   # check name : list of CheckResult
+    for name, check, field in scheduled_checks:
+        expected = getattr(expectations, field)
+        if expected is None:
+            continue
+        check_results[name] = run_check(font, name, check, expected, cache)
+        if fail_fast and not all(result.passed for result in check_results[name]):
+            break
+    return [result for name, check, field in CHECKS for result in check_results.get(name, ())]
+
+
+def run_check(font, name, check, expected, cache=None):
+    """Runs a single check, or returns its cached results, and returns a list of CheckResult"""
+    if cache is not None:
+        with profile.stage("cache lookup"):
+            key = cache.key(font.content_hash(), font.filepath, name, expected)
+            cached_results = cache.get(key)
+        if cached_results is not None:
+            return [CheckResult(*result) for result in cached_results]
+    try:
+        with profile.stage("check " + name):
+            results = check(font) if name in EXPECTATION_FREE_CHECKS else check(font, expected)
+    except Exception as e:
+        return [CheckResult(name, None, None, expected, None, False, "ERROR: " + str(e))]
+    if cache is not None:
+        with profile.stage("cache store"):
+            cache.put(key, [list(result) for result in results])
+    return results
+
+
+def default_jobs():
+    """The default number of worker processes, one per available CPU"""
+    return os.cpu_count() or 1
+
+
+def pool_size(jobs, num_fonts):
+    """Returns the number of worker processes to use for num_fonts fonts.
+
+    Fonts are checked in this process while a fonttests.profile Profiler is
+    active, so that every stage is recorded, and while a server font cache is
+    installed, so that the cached fonts are reused.
+    """
+    if profile.is_active() or font_cache_active():
+        return 1
+    return max(min(jobs, num_fonts), 1)
+
+
+def collection_table_cache(fontpath):
+    """Returns the table cache shared by consecutive faces of the same TTC/OTC collection, or None for other fonts"""
+    filepath, font_number = split_font_number(fontpath)
+    if font_number is None:
+        return None
+    if _collection_table_cache["path"] != filepath:
+        _collection_table_cache["path"] = filepath
+        _collection_table_cache["tables"] = {}
+    return _collection_table_cache["tables"]
+
+
+def read_font_data(filepath):
+    """Returns the bytes of a font file, or None if the file cannot be read"""
+    try:
+        with open(filepath, "rb") as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def run_font(font_expectation, cachepath=None, cache_size=DEFAULT_MAX_SIZE, data=None, fail_fast=False, costs=None):
+    """Checks a single (fontpath, Expectations) pair and returns (fontpath, results).
+
+    data holds the prefetched bytes of the font file, if any.  See check_font()
+    for fail_fast and costs.
+    """
+    fontpath, expectations = font_expectation
+    if data is None and not os.path.isfile(split_font_number(fontpath)[0]):
+        message = "ERROR: The path '" + fontpath + "' is not a path to a font file."
+        return fontpath, [CheckResult("font", None, None, None, None, False, message)]
+    cache = open_result_cache(cachepath, cache_size) if cachepath else None
+    with profile.font(fontpath), open_font(fontpath, collection_table_cache(fontpath), data) as font:
+        results = check_font(font, expectations, cache, fail_fast, costs)
+    if cache is not None:
+        cache.flush()
+    return fontpath, results
+
+
+def failed(font_result):
+    """True if any check of a (fontpath, results) pair failed"""
+    return not all(result.passed for result in font_result[1])
+
+
+def run(font_expectations, jobs=1, cachepath=None, cache_size=DEFAULT_MAX_SIZE, prefetch=DEFAULT_PREFETCH,
+        fail_fast=None, costs=None, executor=None):
+    """Checks a sequence of (fontpath, Expectations) pairs and yields (fontpath, results) for each font.
+
+    With jobs > 1 the fonts are checked in a pool of jobs worker processes,
+    which read their own font files, and the results are yielded in the order
+    of font_expectations.  With jobs == 1 the fonts are checked in this process
+    by a pipeline of two stages that overlap: up to prefetch font files are
+    read ahead by a pool of threads while the read fonts are checked, so at
+    most prefetch + 2 font files are held in memory at any time, whatever the
+    number of fonts.  With prefetch=0 every check reads its font file itself.
+
+    If cachepath is defined, results are read from and stored in the ResultCache
+    at that path.  See pool_size() for when the fonts are always checked in
+    this process.  Fonts are not prefetched while a server font cache is
+    installed, nor for the worker processes, where sending the bytes of a font
+    to a worker costs more than reading the file in the worker.
+
+    The checks of each font run in the order of their estimated costs, a
+    {check name: cost} dictionary that defaults to CHECK_COSTS.  fail_fast is
+    None to run every check, "font" to skip the remaining checks of a font
+    after its first failure, or "run" to also stop the run after the first font
+    that fails.  Fonts that are being read or checked when the run stops are
+    cancelled or discarded.
+
+    executor is a ProcessPoolExecutor of at least jobs workers that the fonts
+    are checked in when jobs > 1.  It stays open after the run, so a caller that
+    runs the checks again, like the watch mode, keeps its warm worker processes.
+    By default a new pool is created and shut down for each run.
+    """
+    font_expectations = list(font_expectations)
+    jobs = pool_size(jobs, len(font_expectations))
+    if font_cache_active() or jobs > 1:
+        prefetch = 0
+    pending_fonts = iter(font_expectations)
+    reads = deque()    # (font_expectation, file path, read future) in font order
+
+    def read_ahead(reader):
+        # faces of the same collection file share a single read
+        while len(reads) < prefetch + 2:
+            font_expectation = next(pending_fonts, None)
+            if font_expectation is None:
+                return
+            filepath = split_font_number(font_expectation[0])[0]
+            if reads and reads[-1][1] == filepath:
+                future = reads[-1][2]
+            else:
+                future = reader.submit(read_font_data, filepath)
+            reads.append((font_expectation, filepath, future))
+
+    def next_read():
+        font_expectation, filepath, future = reads.popleft()
+        with profile.stage("prefetch wait"):
+            return font_expectation, future.result()
+
+    def stops(font_result):
+        return fail_fast == "run" and failed(font_result)
+
+    def cancel_reads():
+        for font_expectation, filepath, future in reads:
+            future.cancel()
+
+    def process_pool():
+        # a pool that is passed in is not shut down at the end of the run
+        return nullcontext(executor) if executor is not None else ProcessPoolExecutor(max_workers=jobs)
+
+    def cancel_checks(checker):
+        if executor is None:
+            checker.shutdown(cancel_futures=True)
+
+    run_checked_font = partial(run_font, cachepath=cachepath, cache_size=cache_size,
+                               fail_fast=fail_fast is not None, costs=costs)
+    if prefetch <= 0:
+        if jobs > 1:
+            with process_pool() as checker:
+                font_results = checker.map(run_checked_font, font_expectations)
+                for font_result in font_results:
+                    yield font_result
+                    if stops(font_result):
+                        # closing the map iterator cancels the checks that have not started
+                        font_results.close()
+                        cancel_checks(checker)
+                        return
+        else:
+            for font_expectation in font_expectations:
+                font_result = run_checked_font(font_expectation)
+                yield font_result
+                if stops(font_result):
+                    return
+        return
+
+    with ThreadPoolExecutor(max_workers=PREFETCH_THREADS) as reader:
+        read_ahead(reader)
+        while reads:
+            font_expectation, data = next_read()
+            read_ahead(reader)
+            font_result = run_checked_font(font_expectation, data=data)
+            yield font_result
+            if stops(font_result):
+                cancel_reads()
+                return
+
+
+def check_fonts(paths, metrics=None, advance_width=None, glyph_number=None, version=None, clipping=False,
+                derived=False, jobs=1, cachepath=None, fail_fast=None):
+    """Checks font files, collections and directories of fonts and returns a list of (fontpath, results) pairs.
+
+    This is the in-process entry point for build tools.  metrics is a mapping of
+    expected metrics or the path to an expected metrics YAML file.
+    advance_width is a width or an advance width policy mapping (see
+    compile_width_policy()).  Checks without an expected value are skipped.
+    results is a list of CheckResult records.  clipping=True runs the glyph
+    bounding box clipping check and derived=True the recomputed [OS/2] fields
+    check.  See run() for fail_fast.  Nothing is written to the terminal and
+    the process is not exited.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    if isinstance(metrics, str):
+        metrics = load_expected_metrics(metrics)
+    metrics_plan = compile_metrics_plan(metrics) if metrics is not None else None
+    expectations = Expectations(metrics_plan, compile_width_policy(advance_width), glyph_number, version, True if clipping else None,
+                                True if derived else None)
+    return list(run([(fontpath, expectations) for fontpath in find_fonts(paths)], jobs=jobs, cachepath=cachepath,
+                    fail_fast=fail_fast))
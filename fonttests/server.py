@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests/server.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+"""A long-running check server that listens on a Unix domain socket.
+
+The server keeps fontTools, PyYAML and NumPy imported and holds an LRU cache
+of opened FontFile objects, so a request does not pay the interpreter start,
+the imports or the font parsing again.  Cached fonts are re-opened when the
+modification time or size of their file changes.
+
+Each request runs one of the test-*.py scripts in the server process with the
+client arguments and working directory.  Its output, as a list of (channel,
+text) chunks in the order the script wrote them, and its exit code are sent
+back to the client (fonttests.client), which writes and returns them exactly
+as the script would.  Requests are handled one at a time.
+"""
+
+import sys
+import os
+import os.path
+import io
+import json
+import socketserver
+import traceback
+from collections import OrderedDict
+from contextlib import redirect_stderr, redirect_stdout
+
+from fonttests.client import SCRIPTS, default_socket_path
+from fonttests.fontfile import FontFile, set_font_cache, split_font_number
+
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MAX_FONTS = 64
+
+
+class CachedFontFile(FontFile):
+    """A FontFile that stays open when a script closes it, until it is evicted from the FontCache"""
+    def close(self):
+        pass
+
+    def release(self):
+        FontFile.close(self)
+
+
+class FontCache(object):
+    """An LRU cache of opened fonts keyed by font path and invalidated on a change of file modification time or size"""
+    def __init__(self, max_fonts=DEFAULT_MAX_FONTS):
+        self.max_fonts = max_fonts       # maximum number of cached fonts
+        self.fonts = OrderedDict()       # absolute font path : ((mtime, size), CachedFontFile), least recently used first
+        self.hits = 0                    # number of requests served from the cache
+        self.misses = 0                  # number of fonts opened
+
+    def get(self, fontpath, table_cache=None):
+        """Returns the cached font of a path, opening it if it is not cached or its file changed"""
+        key = os.path.abspath(fontpath)
+        stat_result = os.stat(split_font_number(fontpath)[0])
+        state = (stat_result.st_mtime_ns, stat_result.st_size)
+        cached = self.fonts.pop(key, None)
+        if cached is not None and cached[0] == state:
+            self.hits += 1
+            self.fonts[key] = cached
+            # the script reports the path it was given
+            cached[1].filepath = fontpath
+            return cached[1]
+        if cached is not None:
+            cached[1].release()
+        self.misses += 1
+        font = CachedFontFile(fontpath, table_cache)
+        self.fonts[key] = (state, font)
+        while len(self.fonts) > self.max_fonts:
+            evicted_key, (evicted_state, evicted_font) = self.fonts.popitem(last=False)
+            evicted_font.release()
+        return font
+
+    def clear(self):
+        for state, font in self.fonts.values():
+            font.release()
+        self.fonts.clear()
+
+
+class ChannelWriter(io.TextIOBase):
+    """A text stream that appends its writes to a list of [channel, list of texts] chunks shared by both channels"""
+    def __init__(self, chunks, channel):
+        self.chunks = chunks             # [channel, list of texts] in write order, consecutive writes joined
+        self.channel = channel           # "stdout" or "stderr"
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if self.chunks and self.chunks[-1][0] == self.channel:
+            self.chunks[-1][1].append(text)
+        else:
+            self.chunks.append([self.channel, [text]])
+        return len(text)
+
+
+# script path : (modification time, compiled code)
+_script_code = {}
+
+
+def script_code(scriptpath):
+    """Returns the compiled code of a script, compiled again only when the script changes"""
+    mtime = os.stat(scriptpath).st_mtime_ns
+    if scriptpath not in _script_code or _script_code[scriptpath][0] != mtime:
+        with open(scriptpath, "r") as script_stream:
+            _script_code[scriptpath] = (mtime, compile(script_stream.read(), scriptpath, "exec"))
+    return _script_code[scriptpath][1]
+
+
+def run_script(script, arguments, cwd):
+    """Runs a test-*.py script as __main__ in this process and returns its (output, exit code).
+
+    output is the list of (channel, text) chunks that the script wrote to the
+    "stdout" and "stderr" channels, in write order.
+    """
+    if script not in SCRIPTS:
+        return [("stderr", "[fonttests server] ERROR: '" + script + "' is not one of " + ", ".join(SCRIPTS) + "\n")], 2
+    if script == "test-runner.py" and len(arguments) > 0 and arguments[0].lower() == "watch":
+        return [("stderr", "[fonttests server] ERROR: the watch mode of test-runner.py cannot run in the server\n")], 2
+
+    scriptpath = os.path.join(REPOSITORY_DIR, script)
+    chunks = []
+    stdout = ChannelWriter(chunks, "stdout")
+    stderr = ChannelWriter(chunks, "stderr")
+    previous_argv = sys.argv
+    previous_cwd = os.getcwd()
+    exit_code = 0
+    try:
+        os.chdir(cwd)
+        sys.argv = [scriptpath] + list(arguments)
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                exec(script_code(scriptpath), {"__name__": "__main__", "__file__": scriptpath})
+            except SystemExit as e:
+                if e.code is None:
+                    exit_code = 0
+                elif isinstance(e.code, int):
+                    exit_code = e.code
+                else:
+                    sys.stderr.write(str(e.code) + "\n")
+                    exit_code = 1
+            except Exception:
+                traceback.print_exc()
+                exit_code = 1
+    finally:
+        sys.argv = previous_argv
+        os.chdir(previous_cwd)
+    return [(channel, "".join(texts)) for channel, texts in chunks], exit_code
+
+
+class CheckRequestHandler(socketserver.StreamRequestHandler):
+    """Handles a single JSON request line and writes a single JSON response line"""
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode("utf-8"))
+        except ValueError as e:
+            response = {"output": [("stderr", "[fonttests server] ERROR: invalid request. " + str(e) + "\n")],
+                        "exit": 2}
+        else:
+            if request.get("command") == "stop":
+                response = {"output": [("stdout", "[fonttests server] Stopped\n")], "exit": 0}
+                self.server.stopping = True
+            elif request.get("command") == "status":
+                font_cache = self.server.font_cache
+                status = ("[fonttests server] " + str(len(font_cache.fonts)) + " font(s) cached, " +
+                          str(font_cache.hits) + " hit(s), " + str(font_cache.misses) + " miss(es)\n")
+                response = {"output": [("stdout", status)], "exit": 0}
+            else:
+                output, exit_code = run_script(request.get("script", ""), request.get("arguments", []),
+                                               request.get("cwd", os.getcwd()))
+                response = {"output": output, "exit": exit_code}
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class CheckServer(socketserver.UnixStreamServer):
+    """A Unix domain socket server that runs check requests against a shared FontCache"""
+    def __init__(self, socketpath, max_fonts=DEFAULT_MAX_FONTS):
+        self.font_cache = FontCache(max_fonts)
+        self.stopping = False
+        socketserver.UnixStreamServer.__init__(self, socketpath, CheckRequestHandler)
+
+
+def serve(socketpath=None, max_fonts=DEFAULT_MAX_FONTS):
+    """Serves check requests on a Unix domain socket until a stop request or an interrupt"""
+    socketpath = socketpath or default_socket_path()
+    if os.path.exists(socketpath):
+        os.remove(socketpath)
+    server = CheckServer(socketpath, max_fonts)
+    set_font_cache(server.font_cache)
+    try:
+        while not server.stopping:
+            server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        set_font_cache(None)
+        server.font_cache.clear()
+        server.server_close()
+        if os.path.exists(socketpath):
+            os.remove(socketpath)
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests/sfnt.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+"""A lightweight reader for the fixed-layout sfnt header tables.
+
+SfntReader memory maps a font file, reads the sfnt table directory and unpacks
+the [head], [hhea], [maxp], [OS/2] and [post] tables with struct, without
+building a fontTools TTFont.  Field names match the attribute names that
+fontTools uses for the same tables.
+
+The [name] table records are indexed with a NumPy structured array so that
+single records can be looked up and decoded without decoding the whole table.
+The format 4 and format 12 Unicode [cmap] subtables are expanded into
+codepoint and glyph ID arrays without a loop over the characters.
+
+Single fonts, faces of TTC/OTC collections and WOFF 1.0 files are supported.
+WOFF tables are zlib compressed one by one, so only the requested tables are
+decompressed.  WOFF2 files compress all tables as one stream and are left to
+fontTools.
+"""
+
+import mmap
+import struct
+import zlib
+
+from fonttests import profile
+
+
+# sfnt versions of single, uncompressed TrueType and CFF fonts
+SFNT_VERSIONS = (b"\x00\x01\x00\x00", b"OTTO", b"true")
+COLLECTION_TAG = b"ttcf"
+WOFF_SIGNATURE = b"wOFF"
+
+# tag : [(struct format, field names), ...] - each part is only unpacked if the table is long enough to hold it.
+# [head] created and modified are left as raw seconds since 1904-01-01.
+HEADER_TABLE_FORMATS = {
+    "head": [(">llLLHHqqhhhhHHhhh", ("tableVersion", "fontRevision", "checkSumAdjustment", "magicNumber", "flags",
+                                     "unitsPerEm", "created", "modified", "xMin", "yMin", "xMax", "yMax", "macStyle",
+                                     "lowestRecPPEM", "fontDirectionHint", "indexToLocFormat", "glyphDataFormat"))],
+    "hhea": [(">lhhhHhhhhhhhhhhhH", ("tableVersion", "ascent", "descent", "lineGap", "advanceWidthMax",
+                                     "minLeftSideBearing", "minRightSideBearing", "xMaxExtent", "caretSlopeRise",
+                                     "caretSlopeRun", "caretOffset", "reserved0", "reserved1", "reserved2",
+                                     "reserved3", "metricDataFormat", "numberOfHMetrics"))],
+    "maxp": [(">lH", ("tableVersion", "numGlyphs")),
+             (">HHHHHHHHHHHHH", ("maxPoints", "maxContours", "maxCompositePoints", "maxCompositeContours",
+                                 "maxZones", "maxTwilightPoints", "maxStorage", "maxFunctionDefs",
+                                 "maxInstructionDefs", "maxStackElements", "maxSizeOfInstructions",
+                                 "maxComponentElements", "maxComponentDepth"))],
+    "OS/2": [(">HhHHHhhhhhhhhhhh10sLLLL4sHHHhhhHH", ("version", "xAvgCharWidth", "usWeightClass", "usWidthClass",
+                                                  "fsType", "ySubscriptXSize", "ySubscriptYSize",
+                                                  "ySubscriptXOffset", "ySubscriptYOffset", "ySuperscriptXSize",
+                                                  "ySuperscriptYSize", "ySuperscriptXOffset", "ySuperscriptYOffset",
+                                                  "yStrikeoutSize", "yStrikeoutPosition", "sFamilyClass", "panose",
+                                                  "ulUnicodeRange1", "ulUnicodeRange2", "ulUnicodeRange3",
+                                                  "ulUnicodeRange4", "achVendID", "fsSelection", "usFirstCharIndex",
+                                                  "usLastCharIndex", "sTypoAscender", "sTypoDescender",
+                                                  "sTypoLineGap", "usWinAscent", "usWinDescent")),
+             (">LL", ("ulCodePageRange1", "ulCodePageRange2")),
+             (">hhHHH", ("sxHeight", "sCapHeight", "usDefaultChar", "usBreakChar", "usMaxContext")),
+             (">HH", ("usLowerOpticalPointSize", "usUpperOpticalPointSize"))],
+    "post": [(">llhhLLLLL", ("formatType", "italicAngle", "underlinePosition", "underlineThickness", "isFixedPitch",
+                             "minMemType42", "maxMemType42", "minMemType1", "maxMemType1"))],
+}
+
+# 16.16 fixed point fields, converted to float like fontTools does
+FIXED_FIELDS = {
+    "head": ("tableVersion", "fontRevision"),
+    "post": ("formatType", "italicAngle"),
+}
+
+HEADER_TABLES = tuple(HEADER_TABLE_FORMATS.keys())
+
+# [name] table name record layout, a NumPy structured dtype description
+NAME_RECORD_FIELDS = [("platformID", ">u2"), ("encodingID", ">u2"), ("languageID", ">u2"), ("nameID", ">u2"),
+                      ("length", ">u2"), ("offset", ">u2")]
+NAME_RECORD_SIZE = 12
+
+# Unicode [cmap] subtable (platformID, encodingID) keys in order of preference, the order of fontTools getBestCmap()
+CMAP_SUBTABLES = ((3, 10), (0, 6), (0, 4), (3, 1), (0, 3), (0, 2), (0, 1), (0, 0))
+
+
+def name_codec(platform_id, encoding_id, language_id):
+    """Returns the Python codec of a [name] record string, latin-1 for encodings that are not defined"""
+    from fontTools.misc.encodingTools import getEncoding
+    return getEncoding(platform_id, encoding_id, language_id) or "latin-1"
+
+
+def collection_size(filepath):
+    """Returns the number of faces in a TTC/OTC font collection file, or 0 if the file is not a collection"""
+    with open(filepath, "rb") as f:
+        header = f.read(12)
+    if len(header) == 12 and header[0:4] == COLLECTION_TAG:
+        return struct.unpack(">L", header[8:12])[0]
+    return 0
+
+
+class SfntReader(object):
+    """Reads the table directory and fixed-layout header tables of a memory mapped sfnt font file.
+
+    If the font file bytes were already read, they are passed as data and the
+    file is not opened again.
+    """
+    def __init__(self, filepath, font_number=0, data=None):
+        self.filepath = filepath         # path to the font
+        self.font_number = font_number   # face index in a TTC/OTC font collection
+        self.tables = {}                 # table tag : (offset, stored length, decompressed length)
+        self._fields = {}                # table tag : unpacked field dictionary
+        self._name_records = None        # [name] table NAME_RECORD_FIELDS array, read on demand
+        self._name_data = None           # [name] table bytes, read on demand
+        self._string_offset = 0          # offset of the [name] table string storage
+        self._data = None                # font file bytes or memory map that the tables are read from
+        self._file = None
+        self._map = None
+        try:
+            if data is not None:
+                self._data = data
+            else:
+                self._file = open(filepath, "rb")
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._data = self._map
+            self._read_table_directory()
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __contains__(self, tag):
+        return tag in self.tables
+
+    def _read_table_directory(self):
+        directory_offset = 0
+        signature = self._data[0:4]
+        if signature == COLLECTION_TAG:
+            num_fonts = struct.unpack_from(">L", self._data, 8)[0]
+            if not 0 <= self.font_number < num_fonts:
+                raise ValueError("'" + self.filepath + "' does not contain a font number " + str(self.font_number))
+            directory_offset = struct.unpack_from(">L", self._data, 12 + self.font_number * 4)[0]
+            signature = self._data[directory_offset:directory_offset + 4]
+
+        if signature == WOFF_SIGNATURE:
+            num_tables = struct.unpack_from(">H", self._data, 12)[0]
+            for i in range(num_tables):
+                tag, offset, stored_length, length, checksum = struct.unpack_from(">4sLLLL", self._data, 44 + i * 20)
+                self.tables[tag.decode("latin-1")] = (offset, stored_length, length)
+        elif signature in SFNT_VERSIONS:
+            num_tables = struct.unpack_from(">H", self._data, directory_offset + 4)[0]
+            for i in range(num_tables):
+                tag, checksum, offset, length = struct.unpack_from(">4sLLL", self._data, directory_offset + 12 + i * 16)
+                self.tables[tag.decode("latin-1")] = (offset, length, length)
+        else:
+            raise ValueError("'" + self.filepath + "' is not an sfnt, TTC/OTC or WOFF font file")
+
+    def table_data(self, tag):
+        """Returns the raw, decompressed bytes of a table"""
+        offset, stored_length, length = self.tables[tag]
+        with profile.stage("read " + tag):
+            data = self._data[offset:offset + stored_length]
+            if stored_length < length:
+                data = zlib.decompress(data)
+        return data
+
+    def fields(self, tag):
+        """Returns the fixed-layout fields of a [head], [hhea], [maxp], [OS/2] or [post] table as a dictionary"""
+        if tag not in self._fields:
+            data = self.table_data(tag)
+            offset = 0
+            table_fields = {}
+            for table_format, names in HEADER_TABLE_FORMATS[tag]:
+                size = struct.calcsize(table_format)
+                if offset + size > len(data):
+                    break
+                table_fields.update(zip(names, struct.unpack_from(table_format, data, offset)))
+                offset += size
+            for name in FIXED_FIELDS.get(tag, ()):
+                if name in table_fields:
+                    table_fields[name] = table_fields[name] / 65536.0
+            if "achVendID" in table_fields:
+                table_fields["achVendID"] = table_fields["achVendID"].decode("latin-1")
+            self._fields[tag] = table_fields
+        return self._fields[tag]
+
+    def name_records(self, name_id):
+        """Returns the (platformID, encodingID, languageID, nameID) keys of the [name] records with a nameID.
+
+        Only the fixed-size record array is read, none of the strings are decoded.
+        """
+        import numpy
+        if self._name_records is None:
+            self._name_data = self.table_data("name")
+            name_format, count, string_offset = struct.unpack_from(">HHH", self._name_data, 0)
+            count = min(count, (len(self._name_data) - 6) // NAME_RECORD_SIZE)
+            self._name_records = numpy.frombuffer(self._name_data, dtype=numpy.dtype(NAME_RECORD_FIELDS), count=count,
+                                                  offset=6)
+            self._string_offset = string_offset
+        matches = self._name_records[self._name_records["nameID"] == name_id]
+        return [(int(record["platformID"]), int(record["encodingID"]), int(record["languageID"]), name_id)
+                for record in matches]
+
+    def name_string(self, key):
+        """Decodes the string of the first [name] record with a (platformID, encodingID, languageID, nameID) key.
+
+        Returns None if the font does not hold a record with that key.
+        """
+        import numpy
+        platform_id, encoding_id, language_id, name_id = key
+        self.name_records(name_id)
+        records = self._name_records
+        indexes = numpy.flatnonzero((records["nameID"] == name_id) & (records["platformID"] == platform_id) &
+                                    (records["encodingID"] == encoding_id) & (records["languageID"] == language_id))
+        if len(indexes) == 0:
+            return None
+        record = records[indexes[0]]
+        start = self._string_offset + int(record["offset"])
+        data = self._name_data[start:start + int(record["length"])]
+        return data.decode(name_codec(platform_id, encoding_id, language_id), "replace")
+
+    def character_map(self):
+        """Returns the (codepoints, glyph IDs) NumPy arrays of the preferred Unicode [cmap] subtable, in codepoint order.
+
+        Characters that map to glyph 0 are left out.  Returns None if the
+        preferred subtable is not in format 4 or 12.
+        """
+        import numpy
+        data = self.table_data("cmap")
+        num_subtables = struct.unpack_from(">H", data, 2)[0]
+        subtable_offsets = {}
+        for i in range(num_subtables):
+            platform_id, encoding_id, offset = struct.unpack_from(">HHL", data, 4 + i * 8)
+            subtable_offsets.setdefault((platform_id, encoding_id), offset)
+        keys = [key for key in CMAP_SUBTABLES if key in subtable_offsets]
+        if len(keys) == 0:
+            return numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64)
+        offset = subtable_offsets[keys[0]]
+        subtable_format = struct.unpack_from(">H", data, offset)[0]
+        if subtable_format == 4:
+            codepoints, glyph_ids = _cmap_format_4(data, offset)
+        elif subtable_format == 12:
+            codepoints, glyph_ids = _cmap_format_12(data, offset)
+        else:
+            return None
+        mapped = glyph_ids != 0
+        codepoints, unique_indexes = numpy.unique(codepoints[mapped], return_index=True)
+        return codepoints, glyph_ids[mapped][unique_indexes]
+
+    def close(self):
+        """Releases the memory map and the file handle"""
+        self._name_records = None
+        self._name_data = None
+        self._data = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _segment_codepoints(start_codes, end_codes):
+    """Expands (start, end) character ranges into a codepoint array and the range index of each codepoint"""
+    import numpy
+    lengths = end_codes - start_codes + 1
+    segment_indexes = numpy.repeat(numpy.arange(len(lengths)), lengths)
+    first_positions = numpy.cumsum(lengths) - lengths
+    codepoints = start_codes[segment_indexes] + numpy.arange(lengths.sum()) - first_positions[segment_indexes]
+    return codepoints, segment_indexes
+
+
+def _cmap_format_4(data, offset):
+    """Returns the (codepoints, glyph IDs) arrays of a format 4 segment mapping [cmap] subtable"""
+    import numpy
+    seg_count = struct.unpack_from(">H", data, offset + 6)[0] // 2
+    table = numpy.frombuffer(data, dtype=numpy.uint8)
+
+    def segment_array(array_offset, dtype):
+        return numpy.frombuffer(data, dtype=dtype, count=seg_count, offset=array_offset).astype(numpy.int64)
+
+    end_codes = segment_array(offset + 14, ">u2")
+    start_codes = segment_array(offset + 16 + 2 * seg_count, ">u2")
+    id_deltas = segment_array(offset + 16 + 4 * seg_count, ">i2")
+    range_offsets = segment_array(offset + 16 + 6 * seg_count, ">u2")
+    valid = start_codes <= end_codes
+    segments = numpy.flatnonzero(valid)
+    codepoints, segment_indexes = _segment_codepoints(start_codes[valid], end_codes[valid])
+    segment_indexes = segments[segment_indexes]
+
+    deltas = id_deltas[segment_indexes]
+    glyph_ids = (codepoints + deltas) & 0xFFFF
+    # segments with an idRangeOffset read the glyph ID from the glyphIdArray, relative to the idRangeOffset value
+    indirect = numpy.flatnonzero(range_offsets[segment_indexes] != 0)
+    if len(indirect) > 0:
+        indirect_segments = segment_indexes[indirect]
+        addresses = (offset + 16 + 6 * seg_count + 2 * indirect_segments + range_offsets[indirect_segments] +
+                     2 * (codepoints[indirect] - start_codes[indirect_segments]))
+        in_table = addresses + 1 < len(table)
+        indirect_ids = numpy.zeros(len(indirect), dtype=numpy.int64)
+        indirect_ids[in_table] = (table[addresses[in_table]].astype(numpy.int64) << 8) | table[addresses[in_table] + 1]
+        glyph_ids[indirect] = numpy.where(indirect_ids != 0, (indirect_ids + deltas[indirect]) & 0xFFFF, 0)
+    return codepoints, glyph_ids
+
+
+def _cmap_format_12(data, offset):
+    """Returns the (codepoints, glyph IDs) arrays of a format 12 segmented coverage [cmap] subtable"""
+    import numpy
+    num_groups = struct.unpack_from(">L", data, offset + 12)[0]
+    groups = numpy.frombuffer(data, dtype=">u4", count=num_groups * 3, offset=offset + 16).astype(numpy.int64)
+    start_codes, end_codes, start_glyph_ids = groups[0::3], groups[1::3], groups[2::3]
+    valid = (start_codes <= end_codes) & (end_codes <= 0x10FFFF)
+    codepoints, group_indexes = _segment_codepoints(start_codes[valid], end_codes[valid])
+    glyph_ids = start_glyph_ids[valid][group_indexes] + codepoints - start_codes[valid][group_indexes]
+    return codepoints, glyph_ids
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests/shard.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+"""Deterministic sharding of a font set across CI nodes, and the merge of the shard results.
+
+'--shard i/N' checks shard i (1 to N) of the fonts.  Every node that is given
+the same font paths computes the same partition without any coordination:
+
+  - by default each font file goes to the shard of the SHA-256 hash of its path,
+    as given on the command line, so a font stays in its shard when other
+    fonts are added or removed
+  - with '--shard-balance' the font files are spread over the shards by file
+    size, largest first, onto the shard with the smallest total size
+
+The faces of a TTC/OTC collection always go to the same shard.  Each shard
+writes its results and exit code to a JSON file, and merge_results() combines
+the files of all shards into a single report in the original font order.
+"""
+
+import sys
+import hashlib
+import heapq
+import json
+import os
+import os.path
+
+from fonttests.checks import CheckResult
+from fonttests.fontfile import split_font_number
+
+
+def parse_shard(value):
+    """Returns the (index, count) of an 'i/N' shard definition, raising ValueError if it is invalid"""
+    try:
+        index, count = [int(number) for number in value.split("/")]
+    except ValueError:
+        raise ValueError("the shard '" + value + "' is not in i/N format")
+    if count < 1 or index < 1 or index > count:
+        raise ValueError("the shard '" + value + "' is not between 1/N and N/N")
+    return index, count
+
+
+def shard_number(filepath, count):
+    """Returns the shard number (1 to count) of a font file path, from the SHA-256 hash of the normalized path"""
+    normalized_path = os.path.normpath(filepath).replace(os.sep, "/")
+    digest = hashlib.sha256(normalized_path.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def _file_size(filepath):
+    try:
+        return os.path.getsize(filepath)
+    except OSError:
+        return 0
+
+
+def partition(fontpaths, count, balance=False):
+    """Returns a {font file path: shard number} dictionary for the font files of a list of font paths"""
+    filepaths = []
+    seen_paths = set()
+    for fontpath in fontpaths:
+        filepath = split_font_number(fontpath)[0]
+        if filepath not in seen_paths:
+            seen_paths.add(filepath)
+            filepaths.append(filepath)
+    if not balance:
+        return dict((filepath, shard_number(filepath, count)) for filepath in filepaths)
+
+    # largest files first, ties broken by the path hash so that the order does not depend on the argument order
+    sized_paths = sorted(filepaths, key=lambda filepath: (-_file_size(filepath), shard_number(filepath, 2 ** 32),
+                                                          filepath))
+    shard_sizes = [(0, number) for number in range(1, count + 1)]
+    shards = {}
+    for filepath in sized_paths:
+        total_size, number = heapq.heappop(shard_sizes)
+        shards[filepath] = number
+        heapq.heappush(shard_sizes, (total_size + _file_size(filepath), number))
+    return shards
+
+
+def shard_options(arguments, script):
+    """Removes the '--shard i/N', '--shard-balance' and '--shard-results PATH' options from a script argument list.
+
+    Returns the remaining arguments and a Shard, which selects every font and
+    writes no results file unless --shard or --shard-results is defined.
+    Raises ValueError for an invalid --shard value.
+    """
+    index, count = 1, 1
+    balance = False
+    resultpath = None
+    remaining_arguments = []
+    argument_iter = iter(arguments)
+    for argument in argument_iter:
+        if argument == "--shard" or argument.startswith("--shard="):
+            value = argument.split("=", 1)[1] if "=" in argument else next(argument_iter, "")
+            index, count = parse_shard(value)
+            if resultpath is None:
+                resultpath = default_result_path(script, index, count)
+        elif argument == "--shard-balance":
+            balance = True
+        elif argument == "--shard-results" or argument.startswith("--shard-results="):
+            resultpath = argument.split("=", 1)[1] if "=" in argument else next(argument_iter, resultpath)
+        else:
+            remaining_arguments.append(argument)
+    return remaining_arguments, Shard(script, index, count, balance, resultpath)
+
+
+def default_result_path(script, index, count):
+    """The default shard results file path, '<script>-shard-<i>-of-<N>.json' in the working directory"""
+    return os.path.splitext(script)[0] + "-shard-" + str(index) + "-of-" + str(count) + ".json"
+
+
+class Shard(object):
+    """Selects the fonts of one shard and records their results.
+
+    Use a Shard as a context manager around the main function of a script.  On
+    exit, including a sys.exit(), the recorded results and the exit code are
+    written to resultpath.
+    """
+    def __init__(self, script, index=1, count=1, balance=False, resultpath=None):
+        self.script = script             # script name written to the results file
+        self.index = index               # shard number, 1 to count
+        self.count = count               # number of shards
+        self.balance = balance           # True to balance the shards by file size instead of the path hash
+        self.resultpath = resultpath     # JSON results file path, None to write no results
+        self.fonts = []                  # (font path, list of CheckResult) records in the order they were checked
+        self.positions = {}              # font path : position in the whole font set, for the merged report order
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.resultpath is None:
+            return
+        if exc_type is None:
+            exit_code = 0
+        elif issubclass(exc_type, SystemExit):
+            exit_code = exc_value.code if isinstance(exc_value.code, int) else (0 if exc_value.code is None else 1)
+        else:
+            exit_code = 1
+        try:
+            self.write(self.resultpath, exit_code)
+            sys.stderr.write("[" + self.script + "] Shard " + str(self.index) + "/" + str(self.count) +
+                             " results were written to '" + self.resultpath + "'\n")
+        except (IOError, OSError) as e:
+            sys.stderr.write("[" + self.script + "] ERROR: Unable to write the shard results. " + str(e) + "\n")
+
+    def select(self, fontpaths):
+        """Returns the font paths of this shard, in their original order"""
+        fontpaths = list(fontpaths)
+        for position, fontpath in enumerate(fontpaths):
+            self.positions.setdefault(fontpath, position)
+        if self.count == 1:
+            return fontpaths
+        shards = partition(fontpaths, self.count, self.balance)
+        return [fontpath for fontpath in fontpaths if shards[split_font_number(fontpath)[0]] == self.index]
+
+    def record(self, fontpath, results):
+        """Records the CheckResult list of a font for the results file"""
+        if self.resultpath is not None:
+            self.fonts.append((fontpath, results))
+
+    def position(self, fontpath):
+        """Returns the position of a font, or of its collection file, in the font set that was sharded"""
+        if fontpath in self.positions:
+            return self.positions[fontpath]
+        return self.positions.get(split_font_number(fontpath)[0], -1)
+
+    def write(self, resultpath, exit_code):
+        """Writes the shard definition, the recorded results and the exit code to a JSON file"""
+        shard_results = {
+            "script": self.script,
+            "shard": {"index": self.index, "count": self.count, "balance": "size" if self.balance else "hash"},
+            "exit": exit_code,
+            "fonts": [{"fontpath": fontpath, "position": self.position(fontpath),
+                       "results": [result._asdict() for result in results]} for fontpath, results in self.fonts],
+        }
+        with open(resultpath, "w") as result_stream:
+            json.dump(shard_results, result_stream, indent=1)
+
+
+def merge_results(resultpaths):
+    """Combines the JSON results files of the shards of one or more scripts.
+
+    Returns a (fonts, errors, exit_code) tuple.  fonts is a list of (script,
+    font path, list of CheckResult) records in script and original font order,
+    errors lists the missing, duplicate and unreadable shards, and exit_code is
+    the highest shard exit code, or 1 if there are errors.
+    """
+    fonts = []
+    errors = []
+    exit_code = 0
+    shard_indexes = {}   # script : (shard count, list of shard indexes)
+    for resultpath in resultpaths:
+        try:
+            with open(resultpath, "r") as result_stream:
+                shard_results = json.load(result_stream)
+            script = shard_results["script"]
+            index = shard_results["shard"]["index"]
+            count = shard_results["shard"]["count"]
+            shard_fonts = [((script, font["position"], font["fontpath"]),
+                            [CheckResult(**result) for result in font["results"]]) for font in shard_results["fonts"]]
+        except (IOError, OSError, ValueError, KeyError, TypeError) as e:
+            errors.append("Unable to read the shard results file '" + resultpath + "'. " + str(e))
+            continue
+        exit_code = max(exit_code, shard_results["exit"])
+        if script in shard_indexes and shard_indexes[script][0] != count:
+            errors.append("'" + resultpath + "' is shard " + str(index) + "/" + str(count) + " of " + script +
+                          ", other results files have " + str(shard_indexes[script][0]) + " shards")
+            continue
+        indexes = shard_indexes.setdefault(script, (count, []))[1]
+        if index in indexes:
+            errors.append("'" + resultpath + "' is a duplicate of shard " + str(index) + "/" + str(count) + " of " +
+                          script)
+            continue
+        indexes.append(index)
+        fonts.extend(shard_fonts)
+
+    for script in sorted(shard_indexes):
+        count, indexes = shard_indexes[script]
+        missing_indexes = [str(index) + "/" + str(count) for index in range(1, count + 1) if index not in indexes]
+        if missing_indexes:
+            errors.append("the results of shard(s) " + ", ".join(missing_indexes) + " of " + script + " are missing")
+
+    fonts.sort(key=lambda font: font[0])
+    if errors:
+        exit_code = max(exit_code, 1)
+    return [(script, fontpath, results) for (script, position, fontpath), results in fonts], errors, exit_code
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  fonttests/watch.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+"""Polling file change detection for the test-runner.py watch mode"""
+
+import os
+import time
+
+
+def snapshot(paths):
+    """Returns a {path: (mtime, size)} dictionary for the paths that exist"""
+    file_states = {}
+    for path in paths:
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            continue
+        file_states[path] = (stat_result.st_mtime_ns, stat_result.st_size)
+    return file_states
+
+
+def changed_paths(previous_states, current_states):
+    """Returns the set of paths that were added or modified between two snapshots"""
+    return set(path for path, state in current_states.items() if previous_states.get(path) != state)
+
+
+def wait_for_changes(list_paths, previous_states, interval=1.0):
+    """Polls the paths returned by list_paths() until at least one of them is added or modified.
+
+    A change is only reported once the file has stopped changing for one polling
+    interval, so fonts that are still being written by a build are not tested.
+    Returns the (changed paths, current snapshot) pair.
+    """
+    pending_states = None
+    while True:
+        current_states = snapshot(list_paths())
+        changed = changed_paths(previous_states, current_states)
+        if changed and current_states == pending_states:
+            return changed, current_states
+        pending_states = current_states if changed else None
+        time.sleep(interval)
@@ -10,36 +10,53 @@
 import sys
 import os
 import os.path
-from fontTools import ttLib
+import argparse
 
-def main(arguments):
+from fonttests import profile
+from fonttests.checks import check_glyph_number
+from fonttests.fontfile import font_faces, open_font
+from fonttests.report import report_options
+from fonttests.resultcache import add_cache_arguments
+from fonttests.runner import open_result_cache, run_check
+from fonttests.shard import shard_options
+
+def main(arguments, cachepath, shard, report):
     # Begin report
-    print("\nBegin test-glyphnumber.py glyph number tests...\n")
+    report.out("\nBegin test-glyphnumber.py glyph number tests...\n\n")
 
     ERROR_OCCURRED = False
 
     try:
         expected_glyph_no = int(arguments[-1])
     except Exception as e:
-        sys.stderr.write("[test-glyphnumber.py] ERROR: the last positional argument should be an integer to define the expected number of glyphs.\n")
+        report.error("[test-glyphnumber.py] ERROR: the last positional argument should be an integer to define the expected number of glyphs.\n")
         sys.exit(1)
 
     filepaths = arguments[0:-1]
+    cache = open_result_cache(cachepath) if cachepath else None
 
-    for fontpath in filepaths:
+    for fontpath in shard.select(filepaths):
         if os.path.isfile(fontpath):
-            print("\n>>> Testing '" + fontpath + "'\n")
-            tt = ttLib.TTFont(fontpath)
-
-            # test glyph number from [maxp] table
-            observed_glyph_no = tt['maxp'].__dict__['numGlyphs']
-            if observed_glyph_no == expected_glyph_no:
-                print("[test-glyphnumber.py]  ✓ " + fontpath + " glyph number is " + str(expected_glyph_no))
-            else:
-                sys.stderr.write("[test-glyphnumber.py]  X " + fontpath + " glyph number is " + str(observed_glyph_no) + " NOT " + str(expected_glyph_no))
-                ERROR_OCCURRED = True
+            report.out("\n>>> Testing '" + fontpath + "'\n\n")
+
+            # test glyph number from [maxp] table of every face in the file
+            table_cache = {}
+            for facepath in font_faces(fontpath):
+                with profile.font(facepath), open_font(facepath, table_cache) as font:
+                    results = run_check(font, "glyphnumber", check_glyph_number, expected_glyph_no, cache)
+                if cache is not None:
+                    cache.flush()
+                shard.record(facepath, results)
+                with profile.stage("report"):
+                    for result in results:
+                        if result.passed:
+                            report.out("[test-glyphnumber.py]  ✓ " + result.message + "\n")
+                        else:
+                            report.err("[test-glyphnumber.py]  X " + result.message + "\n")
+                            ERROR_OCCURRED = True
+                    report.results(facepath, results)
         else:
-            sys.stderr.write("[test-glyphnumber.py] ERROR: The path '" + fontpath + "' is not a path to a font file.\n")
+            report.error("[test-glyphnumber.py] ERROR: The path '" + fontpath + "' is not a path to a font file.\n")
             sys.exit(1)
 
 
@@ -49,6 +66,34 @@ def main(arguments):
         sys.exit(0)
 
 
+def parse_options(arguments):
+    """Parses the paths, expected glyph number and the '--cache PATH' and '--no-cache' options.
+
+    Returns the argparse namespace, with the result cache path in cachepath.
+    """
+    parser = argparse.ArgumentParser(prog="test-glyphnumber.py")
+    parser.add_argument("arguments", nargs="*", metavar="PATH",
+                        help="font file paths, followed by the expected number of glyphs")
+    add_cache_arguments(parser)
+    args = parser.parse_intermixed_args(arguments)
+    args.cachepath = None if args.no_cache else args.cache
+    return args
+
+
 if __name__ == '__main__':
-    # call with python test-glyphnumber.py [fontpath 1] <fontpath n...> [expected number]
-    main(sys.argv[1:])
+    # call with python test-glyphnumber.py [--cache PATH] [--no-cache] [--report console|jsonl|junit[:PATH]]... [--shard i/N] [--shard-balance] [--shard-results JSON] [--profile] [--profile-trace JSON] [fontpath 1] <fontpath n...> [expected number]
+    arguments, profiler = profile.profile_options(sys.argv[1:], "test-glyphnumber.py")
+    try:
+        arguments, report = report_options(arguments, "test-glyphnumber.py")
+    except (ValueError, IOError, OSError) as e:
+        sys.stderr.write("[test-glyphnumber.py] ERROR: " + str(e) + "\n")
+        sys.exit(1)
+    try:
+        arguments, shard = shard_options(arguments, "test-glyphnumber.py")
+    except ValueError as e:
+        with report:
+            report.error("[test-glyphnumber.py] ERROR: " + str(e) + "\n")
+            sys.exit(1)
+    with profiler, shard, report:
+        args = parse_options(arguments)
+        main(args.arguments, args.cachepath, shard, report)
@@ -10,327 +10,102 @@
 import sys
 import os
 import os.path
-from fontTools import ttLib
-
-from yaml import load, dump
-try:
-    from yaml import CLoader as Loader
-except ImportError:
-    from yaml import Loader
-
-
-class MetricsObject(object):
-    """A font metrics object that maintains metrics properties during testing"""
-    def __init__(self, filepath):
-        self.filepath = filepath         # path to the font
-        self.font_object = None          # fontTools TTFont object
-        self.unitsPerEm = 0              # [head] unitsPerEm
-        self.ascent = 0                  # [hhea] ascent
-        self.descent = 0                 # [hhea] descent
-        self.lineGap = 0                 # [hhea] lineGap
-        self.capheight = 0               # [OS/2] sCapHeight
-        self.xheight = 0                 # [OS/2] sxHeight
-        self.typoAscender = 0            # [OS/2] sTypoAscender
-        self.typoDescender = 0           # [OS/2] sTypoDescender
-        self.typoLineGap = 0             # [OS/2] sTypoLineGap
-        self.winAscent = 0               # [OS/2] usWinAscent
-        self.winDescent = 0              # [OS/2] usWinDescent
-        self.strikeoutPosition = 0       # [OS/2] yStrikeoutPosition
-        self.strikeoutSize = 0           # [OS/2] yStrikeoutSize
-        self.averageWidth = 0            # [OS/2] xAvgCharWidth
-        self.superscriptXSize = 0        # [OS/2] ySuperscriptXSize
-        self.superscriptXOffset = 0      # [OS/2] ySuperscriptXOffset
-        self.superscriptYSize = 0        # [OS/2] ySuperscriptYSize
-        self.superscriptYOffset = 0      # [OS/2] ySuperscriptYOffset
-        self.subscriptXSize = 0          # [OS/2] ySubscriptXSize
-        self.subscriptXOffset = 0        # [OS/2] ySubscriptXOffset
-        self.subscriptYSize = 0          # [OS/2] ySubscriptYSize
-        self.subscriptYOffset = 0        # [OS/2] ySubscriptYOffset
-        self.underlinePosition = 0       # [post] underlinePosition
-        self.underlineThickness = 0      # [post] underlineThickness
-        self.italicAngle = 0             # [post] italicAngle
-
-        # define metrics properties of the instance
-        self.create_metrics_object_from_font(self.filepath)
-
-    def create_metrics_object_from_font(self, fontpath):
-        self.font_object = ttLib.TTFont(fontpath)
-        self.define_head_table()
-        self.define_hhea_table()
-        self.define_os2_table()
-        self.define_post_table()
-
-    def define_head_table(self):
-        try:
-            self.unitsPerEm = self.font_object['head'].__dict__['unitsPerEm']
-        except Exception as e:
-            sys.stderr.write("Error: " + str(e))
+import argparse
 
-    def define_hhea_table(self):
-        try:
-            hhea_table_dict = self.font_object['hhea'].__dict__
-            self.ascent = hhea_table_dict['ascent']
-            self.descent = hhea_table_dict['descent']
-            self.lineGap = hhea_table_dict['lineGap']
-        except Exception as e:
-            sys.stderr.write("Error: " + str(e))
+from fonttests import profile
 
-    def define_os2_table(self):
-        try:
-            os2_table_dict = self.font_object['OS/2'].__dict__
-            self.capheight = os2_table_dict['sCapHeight']
-            self.xheight = os2_table_dict['sxHeight']
-            self.typoAscender = os2_table_dict['sTypoAscender']
-            self.typoDescender = os2_table_dict['sTypoDescender']
-            self.typoLineGap = os2_table_dict['sTypoLineGap']
-            self.winAscent = os2_table_dict['usWinAscent']
-            self.winDescent = os2_table_dict['usWinDescent']
-            self.strikeoutPosition = os2_table_dict['yStrikeoutPosition']
-            self.strikeoutSize = os2_table_dict['yStrikeoutSize']
-            self.averageWidth = os2_table_dict['xAvgCharWidth']
-            self.superscriptXSize = os2_table_dict['ySuperscriptXSize']
-            self.superscriptXOffset = os2_table_dict['ySuperscriptXOffset']
-            self.superscriptYSize = os2_table_dict['ySuperscriptYSize']
-            self.superscriptYOffset = os2_table_dict['ySuperscriptYOffset']
-            self.subscriptXSize = os2_table_dict['ySubscriptXSize']
-            self.subscriptXOffset = os2_table_dict['ySubscriptXOffset']
-            self.subscriptYSize = os2_table_dict['ySubscriptYSize']
-            self.subscriptYOffset = os2_table_dict['ySubscriptYOffset']
-        except Exception as e:
-            sys.stderr.write("Error: " + str(e))
-
-    def define_post_table(self):
-        try:
-            post_table_dict = self.font_object['post'].__dict__
-            self.underlinePosition = post_table_dict['underlinePosition']
-            self.underlineThickness = post_table_dict['underlineThickness']
-            self.italicAngle = post_table_dict['italicAngle']
-        except Exception as e:
-            sys.stderr.write("Error: " + str(e))
+from fonttests.baseline import write_baselines
+from fonttests.checks import METRICS_TESTS, compile_metrics_plan
+from fonttests.expected import load_expected_metrics
+from fonttests.fontfile import font_faces
+from fonttests.report import report_options
+from fonttests.resultcache import add_cache_arguments
+from fonttests.runner import Expectations, default_jobs, find_fonts, run
+from fonttests.shard import shard_options
 
 
-def main(maps):
+def main(maps, jobs, cachepath, shard, report):
     """Performs metrics tests on fonts vs. expected values in a YAML settings file"""
 
     # Begin report
-    print("\nBegin test-metrics.py font metrics tests\n")
+    report.out("\nBegin test-metrics.py font metrics tests\n\n")
 
+    ERROR_OCCURRED = False
+    font_expectations = []
     for map in maps:
-        if ":" in map:
-            map_list = map.split(':')
-            if len(map_list) == 2:
-                fontpath = map_list[0]
-                expectedpath = map_list[1]
-                if os.path.isfile(fontpath):
-                    if os.path.isfile(expectedpath):
-                        try:
-                            ERROR_OCCURRED = False
-                            # parse the expected font metrics
-                            expected_stream = open(expectedpath, "r")
-                            expected_metrics = load(expected_stream, Loader=Loader)
-
-                            # create the observed font metrics object
-                            observed_metrics = MetricsObject(fontpath)
-
-                            # font report header
-                            print("Font Metrics Tests for '" + fontpath + "'")
-
-                            # Units per Em Test
-                            if not observed_metrics.unitsPerEm == expected_metrics['unitsPerEm']:
-                                sys.stderr.write("  X [head] ERROR: unitsPerEm values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [head] Units per Em")
-
-                            # hhea Ascent Test
-                            if not observed_metrics.ascent == expected_metrics['ascent']:
-                                sys.stderr.write("  X [hhea] ERROR: hhea table Ascent values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [hhea] Ascent")
-
-                            # hhea Descent Test
-                            if not observed_metrics.descent == expected_metrics['descent']:
-                                sys.stderr.write("  X [hhea] ERROR: hhea table Descent values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [hhea] Descent")
-
-                            # hhea Linegap test
-                            if not observed_metrics.lineGap == expected_metrics['lineGap']:
-                                sys.stderr.write("  X [hhea] ERROR: hhea table lineGap values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [hhea] Linegap")
-
-                            # Cap Height Test
-                            if not observed_metrics.capheight == expected_metrics['capHeight']:
-                                sys.stderr.write("  X [OS/2] ERROR: Cap Height values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] Cap Height")
-
-                            # X Height Test
-                            if not observed_metrics.xheight == expected_metrics['xHeight']:
-                                sys.stderr.write("  X [OS/2] ERROR: X Height values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] X Height")
-
-                            # Typo Ascender Test
-                            if not observed_metrics.typoAscender == expected_metrics['typoAscender']:
-                                sys.stderr.write("  X [OS/2] ERROR: Typo Ascender values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] Typo Ascender")
-
-                            # Typo Descender Test
-                            if not observed_metrics.typoDescender == expected_metrics['typoDescender']:
-                                sys.stderr.write("  X [OS/2] ERROR: Typo Descender values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] Typo Descender")
-
-                            # Typo Linegap Test
-                            if not observed_metrics.typoLineGap == expected_metrics['typoLineGap']:
-                                sys.stderr.write("  X [OS/2] ERROR: Typo Linegap values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] Typo Linegap")
-
-                            # winAscent Test
-                            if not observed_metrics.winAscent == expected_metrics['winAscent']:
-                                sys.stderr.write("  X [OS/2] ERROR: winAscent values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] winAscent")
-
-                            # winDescent Test
-                            if not observed_metrics.winDescent == expected_metrics['winDescent']:
-                                sys.stderr.write("  X [OS/2] ERROR: winDescent values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] winDescent")
-
-                            # Strikeout Position Test
-                            if not observed_metrics.strikeoutPosition == expected_metrics['strikeoutPosition']:
-                                sys.stderr.write("  X [OS/2] ERROR: Strikeout Position values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] Strikeout Position")
-
-                            # Strikeout Size test
-                            if not observed_metrics.strikeoutSize == expected_metrics['strikeoutSize']:
-                                sys.stderr.write("  X [OS/2] ERROR: Strikeout Size values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] Strikeout Size")
-
-                            # Average Character Width Test
-                            if not observed_metrics.averageWidth == expected_metrics['averageWidth']:
-                                sys.stderr.write("  X [OS/2] ERROR: Average Character Width values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] Average Character Width")
-
-                            # Superscript X Size Test
-                            if not observed_metrics.superscriptXSize == expected_metrics['superscriptXSize']:
-                                sys.stderr.write("  X [OS/2] ERROR: Superscript X Size values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] Superscript X Size")
-
-                            # Superscript X Offset Test
-                            if not observed_metrics.superscriptXOffset == expected_metrics['superscriptXOffset']:
-                                sys.stderr.write("  X [OS/2] ERROR: Superscript X Offset values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] Superscript X Offset")
-
-                            # Superscript Y Size Test
-                            if not observed_metrics.superscriptYSize == expected_metrics['superscriptYSize']:
-                                sys.stderr.write("  X [OS/2] ERROR: Superscript Y Size values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] Superscript Y Size")
-
-                            # Superscript Y Offset Test
-                            if not observed_metrics.superscriptYOffset == expected_metrics['superscriptYOffset']:
-                                sys.stderr.write("  X [OS/2] ERROR: Superscript Y Offset values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] Superscript Y Offset")
-
-                            # Subscript X Size Test
-                            if not observed_metrics.subscriptXSize == expected_metrics['subscriptXSize']:
-                                sys.stderr.write("  X [OS/2] ERROR: Subscript X Size values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] Subscript X Size")
-
-                            # Subscript X Offset Test
-                            if not observed_metrics.subscriptXOffset == expected_metrics['subscriptXOffset']:
-                                sys.stderr.write("  X [OS/2] ERROR: Subscript X Offset values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] Subscript X Offset")
-
-                            # Subscript Y Size Test
-                            if not observed_metrics.subscriptYSize == expected_metrics['subscriptYSize']:
-                                sys.stderr.write("  X [OS/2] ERROR: Subscript Y Size values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] Subscript Y Size")
-
-                            # Subscript X Offset Test
-                            if not observed_metrics.subscriptYOffset == expected_metrics['subscriptYOffset']:
-                                sys.stderr.write("  X [OS/2] ERROR: Subscript Y Offset values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [OS/2] Subscript Y Offset")
-
-                            # Underline Posiiton Test
-                            if not observed_metrics.underlinePosition == expected_metrics['underlinePosition']:
-                                sys.stderr.write("  X [post] ERROR: Underline Position values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [post] Underline Position")
-
-                            # Underline Posiiton Test
-                            if not observed_metrics.underlineThickness == expected_metrics['underlineThickness']:
-                                sys.stderr.write("  X [post] ERROR: Underline Thickness values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [post] Underline Thickness")
-
-                            # Italic Angle Test
-                            if not observed_metrics.italicAngle == expected_metrics['italicAngle']:
-                                sys.stderr.write("  X [post] ERROR: Italic Angle values do not match\n")
-                                ERROR_OCCURRED = True
-                            else:
-                                print("  ✓ [post] Italic Angle")
-
-                            # Raise appropriate exit code based upon success of all tests
-                            if ERROR_OCCURRED == True:
-                                sys.exit(1)
-                            else:
-                                sys.exit(0)
-
-                        except Exception as e:
-                            sys.stderr.write("ERROR: " + str(e))
-                            sys.exit(1)
-                    else:
-                        sys.stderr.write("ERROR: The requested path to the expected metrics YAML file does not appear to be a file")
-                        sys.exit(1)
+        if not ":" in map:
+            report.error("ERROR: incorrect syntax for the command line definition of the font and expected metrics YAML file paths '" + map + "'\n")
+            ERROR_OCCURRED = True
+            continue
+        map_list = map.split(':')
+        if not len(map_list) == 2:
+            report.error("ERROR: Please define the paths to the font file and the expected metrics YAML file in the argument '" + map + "'\n")
+            ERROR_OCCURRED = True
+            continue
+        fontpath = map_list[0]
+        expectedpath = map_list[1]
+        if not os.path.isfile(fontpath):
+            report.error("ERROR: The requested path to the font '" + fontpath + "' does not appear to be a file\n")
+            ERROR_OCCURRED = True
+            continue
+        if not os.path.isfile(expectedpath):
+            report.error("ERROR: The requested path to the expected metrics YAML file '" + expectedpath + "' does not appear to be a file\n")
+            ERROR_OCCURRED = True
+            continue
+        try:
+            # parse the expected font metrics
+            expected_metrics = load_expected_metrics(expectedpath)
+        except Exception as e:
+            report.error("ERROR: " + str(e) + "\n")
+            ERROR_OCCURRED = True
+            continue
+        metrics_plan = compile_metrics_plan(expected_metrics)
+        for facepath in font_faces(fontpath):
+            font_expectations.append((facepath, Expectations(metrics_plan, None, None, None, None, None)))
+
+    selected_fontpaths = set(shard.select(fontpath for fontpath, expectations in font_expectations))
+    font_expectations = [font_expectation for font_expectation in font_expectations
+                         if font_expectation[0] in selected_fontpaths]
+
+    # test the fonts in parallel worker processes and report the results in argument order
+    for fontpath, results in run(font_expectations, jobs=jobs, cachepath=cachepath):
+        shard.record(fontpath, results)
+        with profile.stage("report"):
+            # font report header
+            report.out("Font Metrics Tests for '" + fontpath + "'\n")
+            for result in results:
+                if result.passed:
+                    report.out("  ✓ " + result.message + "\n")
                 else:
-                    sys.stderr.write("ERROR: The requested path to the font does not appear to be a file")
-                    sys.exit(1)
-            else:
-                sys.stderr.write("ERROR: Please define the paths to the font file and the expected metrics YAML file in the argument")
-                sys.exit(1)
-        else:
-            sys.stderr.write("ERROR: incorrect syntax for the command line definition of the font and expected metrics YAML file paths")
-            sys.exit(1)
+                    report.err("  X " + result.message + "\n")
+                    ERROR_OCCURRED = True
+            report.results(fontpath, results)
+
+    # Raise appropriate exit code based upon success of all tests
+    if ERROR_OCCURRED == True:
+        sys.exit(1)
+    else:
+        sys.exit(0)
+
+
+def parse_options(arguments, command=None):
+    """Parses the paths and the '--jobs N', '--cache PATH' and '--no-cache' options of a command.
+
+    Returns the argparse namespace, with the result cache path in cachepath.
+    """
+    prog = "test-metrics.py" if command is None else "test-metrics.py " + command
+    parser = argparse.ArgumentParser(prog=prog)
+    parser.add_argument("paths", nargs="*", metavar="PATH",
+                        help="fontpath:expected.yaml map" if command is None else "font file path or directory")
+    parser.add_argument("-j", "--jobs", type=int, default=default_jobs(),
+                        help="number of fonts to test in parallel (default: CPU count)")
+    add_cache_arguments(parser)
+    if command == "family":
+        parser.add_argument("--fields", metavar="KEY,KEY...",
+                            help="metrics fields to compare, or 'all' (default: the vertical metrics)")
+    args = parser.parse_intermixed_args(arguments)
+    args.cachepath = None if args.no_cache else args.cache
+    return args
 
 # YAML stub file text
 yaml_stub = """
@@ -381,9 +156,206 @@ def write_stubfile():
         sys.exit(1)
 
 
-if __name__ == '__main__':
-    if len(sys.argv) > 0:
-        if sys.argv[1].lower() == "stub":
-            write_stubfile()
+def write_baseline_files(arguments):
+    """Writes a fully populated expected metrics YAML file for every font in a set of fonts and font directories"""
+    args = parse_options(arguments, "baseline")
+    paths, jobs = args.paths, args.jobs
+    if len(paths) < 2:
+        sys.stderr.write("[test-metrics.py] ERROR: Please define the font paths or directories and the output directory for the baseline files\n")
+        sys.exit(1)
+    fontpaths = find_fonts(paths[0:-1])
+    outdir = paths[-1]
+    try:
+        if not os.path.isdir(outdir):
+            os.makedirs(outdir)
+    except Exception as e:
+        sys.stderr.write("[test-metrics.py] ERROR: Unable to create the baseline directory. " + str(e) + "\n")
+        sys.exit(1)
+
+    ERROR_OCCURRED = False
+    for fontpath, baselinepath, status in write_baselines(fontpaths, outdir, jobs=jobs):
+        if status == "written":
+            print("[test-metrics.py] Baseline for '" + fontpath + "' was written to '" + baselinepath + "'")
+        elif status == "current":
+            print("[test-metrics.py] Baseline '" + baselinepath + "' is current")
         else:
-            main(sys.argv[1:])
+            sys.stderr.write("[test-metrics.py] " + status + " (" + fontpath + ")\n")
+            ERROR_OCCURRED = True
+
+    if ERROR_OCCURRED == True:
+        sys.exit(1)
+    else:
+        sys.exit(0)
+
+
+def test_family(arguments, report):
+    """Tests that every font in a set of fonts and font directories shares the family value of each metrics field"""
+    from fonttests.family import FAMILY_KEYS, check_family
+    args = parse_options(arguments, "family")
+    jobs = args.jobs
+    keys = FAMILY_KEYS
+    if args.fields is not None:
+        keys = [test[1] for test in METRICS_TESTS] if args.fields == "all" else args.fields.split(",")
+    fontpaths = find_fonts(args.paths)
+    if len(fontpaths) < 2:
+        sys.stderr.write("[test-metrics.py] ERROR: Please define at least two fonts or a directory of fonts for the family test\n")
+        sys.exit(1)
+
+    # Begin report
+    report.out("\nBegin test-metrics.py font family metrics tests (" + str(len(fontpaths)) + " fonts)\n\n")
+
+    try:
+        results = check_family(fontpaths, keys, jobs)
+    except Exception as e:
+        report.error("[test-metrics.py] ERROR: " + str(e) + "\n")
+        sys.exit(1)
+
+    ERROR_OCCURRED = False
+    deviating_fields = {}
+    with profile.stage("report"):
+        for result in results:
+            if result.passed:
+                report.out("  ✓ " + result.message + "\n")
+            else:
+                report.err("  X " + result.message + "\n")
+                # the observed values of a font that cannot be read are not defined
+                for fontpath in (result.observed or {}).keys():
+                    report.err("      " + fontpath + " : " + str(result.observed[fontpath]) + "\n")
+                    deviating_fields.setdefault(fontpath, []).append(result.field)
+                ERROR_OCCURRED = True
+
+        # summary of the fonts that deviate from the family, in font order
+        for fontpath in fontpaths:
+            if fontpath in deviating_fields:
+                report.err("[test-metrics.py] '" + fontpath + "' deviates from the family in: " + ", ".join(deviating_fields[fontpath]) + "\n")
+        # the family results compare the fonts, their observed values are keyed by font path
+        report.results("family", results)
+
+    if ERROR_OCCURRED == True:
+        sys.exit(1)
+    else:
+        sys.exit(0)
+
+
+# command : (Expectations, report title, report header) of the tests that need no expected values
+FONT_TESTS = {
+    "clipping": (Expectations(None, None, None, None, True, None), "glyph clipping", "Glyph Clipping"),
+    "derived": (Expectations(None, None, None, None, None, True), "derived OS/2 value", "Derived OS/2 Value"),
+}
+
+
+def test_fonts(command, arguments, shard, report):
+    """Runs the clipping or derived tests, which need no expected values, on a set of fonts and font directories.
+
+    clipping tests that the glyph bounding boxes fit within the vertical metrics
+    and derived tests the [OS/2] values that are recomputed from the glyphs.
+    """
+    args = parse_options(arguments, command)
+    expectations, title, header = FONT_TESTS[command]
+    jobs, cachepath = args.jobs, args.cachepath
+    fontpaths = find_fonts(args.paths)
+    if len(fontpaths) == 0:
+        sys.stderr.write("[test-metrics.py] ERROR: Please define the font paths or directories for the " + command + " test\n")
+        sys.exit(1)
+
+    # Begin report
+    report.out("\nBegin test-metrics.py " + title + " tests\n\n")
+
+    ERROR_OCCURRED = False
+    font_expectations = [(fontpath, expectations) for fontpath in shard.select(fontpaths)]
+    for fontpath, results in run(font_expectations, jobs=jobs, cachepath=cachepath):
+        shard.record(fontpath, results)
+        with profile.stage("report"):
+            report.out(header + " Tests for '" + fontpath + "'\n")
+            for result in results:
+                if result.passed:
+                    report.out("  ✓ " + result.message + "\n")
+                else:
+                    report.err("  X " + result.message + "\n")
+                    if isinstance(result.observed, dict):
+                        for glyph in result.observed.keys():
+                            report.err("      " + glyph + " : " + str(result.observed[glyph]) + "\n")
+                    ERROR_OCCURRED = True
+            report.results(fontpath, results)
+
+    if ERROR_OCCURRED == True:
+        sys.exit(1)
+    else:
+        sys.exit(0)
+
+
+def diff_glyph_metrics(arguments):
+    """Reports the glyphs whose advance width, left side bearing or bounding box changed between two builds of a font"""
+    from fonttests.diff import diff_fonts
+    if len(arguments) != 2:
+        sys.stderr.write("[test-metrics.py] ERROR: Please define the paths to the old and the new font files\n")
+        sys.exit(1)
+    old_fontpath, new_fontpath = arguments
+
+    # Begin report
+    print("\nBegin test-metrics.py glyph metrics diff\n")
+    print(">>> Comparing '" + old_fontpath + "' to '" + new_fontpath + "'")
+
+    try:
+        font_diff = diff_fonts(old_fontpath, new_fontpath)
+    except Exception as e:
+        sys.stderr.write("[test-metrics.py] ERROR: " + str(e) + "\n")
+        sys.exit(1)
+
+    with profile.stage("report"):
+        for change in font_diff.changed:
+            deltas = [field + " " + str(change.old[field]) + " -> " + str(change.new[field]) +
+                      " (" + "%+d" % (change.new[field] - change.old[field]) + ")" for field in change.old.keys()]
+            sys.stderr.write("  X " + change.glyph + " : " + ", ".join(deltas) + "\n")
+        if font_diff.added:
+            sys.stderr.write("  + added glyphs: " + " ".join(font_diff.added) + "\n")
+        if font_diff.removed:
+            sys.stderr.write("  - removed glyphs: " + " ".join(font_diff.removed) + "\n")
+        print("[test-metrics.py] " + str(len(font_diff.changed)) + " glyph(s) changed, " + str(len(font_diff.added)) +
+              " added, " + str(len(font_diff.removed)) + " removed.")
+
+    if font_diff.changed or font_diff.added or font_diff.removed:
+        sys.exit(1)
+    else:
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    # call with python test-metrics.py [--jobs N] [--cache PATH] [--no-cache] [--report console|jsonl|junit[:PATH]]... [--shard i/N] [--shard-balance] [--shard-results JSON] [--profile] [--profile-trace JSON] [fontpath 1:expected 1.yaml] <fontpath n:expected n.yaml...>
+    arguments, profiler = profile.profile_options(sys.argv[1:], "test-metrics.py")
+    try:
+        arguments, report = report_options(arguments, "test-metrics.py")
+    except (ValueError, IOError, OSError) as e:
+        sys.stderr.write("[test-metrics.py] ERROR: " + str(e) + "\n")
+        sys.exit(1)
+    try:
+        arguments, shard = shard_options(arguments, "test-metrics.py")
+    except ValueError as e:
+        with report:
+            report.error("[test-metrics.py] ERROR: " + str(e) + "\n")
+            sys.exit(1)
+    if len(arguments) > 0:
+        if shard.resultpath is not None and arguments[0].lower() in ("stub", "baseline", "diff", "family"):
+            sys.stderr.write("[test-metrics.py] ERROR: The --shard options only apply to the metrics, clipping and derived tests\n")
+            sys.exit(1)
+        if report.writers and arguments[0].lower() in ("stub", "baseline", "diff"):
+            sys.stderr.write("[test-metrics.py] ERROR: The --report option only applies to the metrics, clipping, derived and family tests\n")
+            sys.exit(1)
+        with profiler, shard, report:
+            if arguments[0].lower() == "stub":
+                write_stubfile()
+            elif arguments[0].lower() == "baseline":
+                # python test-metrics.py baseline [--jobs N] [--profile] [fontpath | directory]... [output directory]
+                write_baseline_files(arguments[1:])
+            elif arguments[0].lower() == "diff":
+                # python test-metrics.py diff [old fontpath] [new fontpath]
+                diff_glyph_metrics(arguments[1:])
+            elif arguments[0].lower() in FONT_TESTS:
+                # python test-metrics.py clipping|derived [--jobs N] [--cache PATH] [--no-cache] [--shard i/N] [fontpath | directory]...
+                test_fonts(arguments[0].lower(), arguments[1:], shard, report)
+            elif arguments[0].lower() == "family":
+                # python test-metrics.py family [--jobs N] [--fields=key,key... | --fields=all] [fontpath | directory]...
+                test_family(arguments[1:], report)
+            else:
+                args = parse_options(arguments)
+                main(args.paths, args.jobs, args.cachepath, shard, report)
@@ -10,59 +10,107 @@
 import sys
 import os
 import os.path
-from fontTools import ttLib
+import argparse
 
-def main(filepaths):
+from fonttests import profile
+from fonttests.checks import check_monospace, compile_width_policy
+from fonttests.expected import load_width_policy
+from fonttests.fontfile import font_faces, open_font
+from fonttests.report import report_options
+from fonttests.resultcache import add_cache_arguments
+from fonttests.runner import open_result_cache, run_check
+from fonttests.shard import shard_options
+
+def main(filepaths, cachepath, shard, report):
     ERROR_OCCURRED = False
 
     # Begin report
-    print("\nBegin test-monospace.py fixed width tests...\n")
+    report.out("\nBegin test-monospace.py fixed width tests...\n\n")
 
-    try:
-        expected_advance_width = int(sys.argv[-1])
-    except Exception as e:
-        sys.stderr.write("[test-monospace.py] ERROR: The last positional argument in the command is not the expected advance width integer value\n")
+    if len(filepaths) == 0:
+        report.error("[test-monospace.py] ERROR: Please define the font paths and the expected advance width integer value or width policy YAML file\n")
+        sys.exit(1)
+
+    if filepaths[-1].lower().endswith((".yaml", ".yml", ".json")):
+        # advance widths per glyph class and Unicode range
+        try:
+            expected_advance_width = compile_width_policy(load_width_policy(filepaths[-1]))
+        except Exception as e:
+            report.error("[test-monospace.py] ERROR: Unable to read the advance width policy file. " + str(e) + "\n")
+            sys.exit(1)
+    else:
+        try:
+            expected_advance_width = int(filepaths[-1])
+        except Exception as e:
+            report.error("[test-monospace.py] ERROR: The last positional argument in the command is not the expected advance width integer value or width policy YAML file\n")
+            sys.exit(1)
 
     filepaths_parsed = filepaths[0:-1]
-    for fontpath in filepaths_parsed:
+    cache = open_result_cache(cachepath) if cachepath else None
+    for fontpath in shard.select(filepaths_parsed):
         if os.path.isfile(fontpath):
-            print("\n>>> Testing '" + fontpath + "'\n")
-            tt = ttLib.TTFont(fontpath)
-
-            # test for [post] table fixed pitch setting
-            post_table_correct = tt['post'].__dict__['isFixedPitch']
-            if post_table_correct == 0:
-                sys.stderr.write("[test-monospace.py] ERROR: [post] table isFixedPitch setting is not defined as 1.\n")
-                ERROR_OCCURRED = True
-
-            # test for advance width settings in [hmtx] table
-            hmtx_table = tt['hmtx'].__dict__['metrics']
-            incorrect_width_dict = {}
-            for glyph in hmtx_table:
-                if hmtx_table[glyph][0] == expected_advance_width:
-                    sys.stdout.write(".")
-                    sys.stdout.flush()
-                else:
-                    incorrect_width_dict[glyph] = str(hmtx_table[glyph][0])
-                    sys.stdout.write("X")
-                    sys.stdout.flush()
-                    ERROR_OCCURRED = True
+            report.out("\n>>> Testing '" + fontpath + "'\n\n")
+            table_cache = {}
+            for facepath in font_faces(fontpath):
+                with profile.font(facepath), open_font(facepath, table_cache) as font:
+                    results = run_check(font, "monospace", check_monospace, expected_advance_width, cache)
+                if cache is not None:
+                    cache.flush()
+                shard.record(facepath, results)
+                with profile.stage("report"):
+                    for result in results:
+                        if result.passed:
+                            report.out("[test-monospace.py] " + result.message + "\n")
+                            continue
+                        ERROR_OCCURRED = True
+                        if result.table == "hmtx":
+                            # report the glyphs with an incorrect advance width in the [hmtx] table
+                            incorrect_width_dict = result.observed
+                            report.err("\n[test-monospace.py] " + result.message + "\n")
+                            for x in incorrect_width_dict.keys():
+                                report.err("  " + x + " : " + str(incorrect_width_dict[x]) + "\n")
+                        else:
+                            report.err("[test-monospace.py] " + result.message + "\n")
+                    report.results(facepath, results)
         else:
-            sys.stderr.write("[test-monospace.py] ERROR: The path '" + fontpath + "' does not appear to exist.\n")
+            report.error("[test-monospace.py] ERROR: The path '" + fontpath + "' does not appear to exist.\n")
             ERROR_OCCURRED = True
 
-        if len(incorrect_width_dict) > 0:
-            sys.stderr.write("\n\n[test-monospace.py] ERROR: The following glyphs in the font '" + fontpath + "' have an advance width that failed to match your expected metric of " + str(expected_advance_width) + " units:\n")
-            for x in incorrect_width_dict.keys():
-                sys.stderr.write("  " + x + " : " + str(incorrect_width_dict[x]) + "\n")
-
     if ERROR_OCCURRED == True:
         sys.exit(1)  # exit with status code 1
     else:
-        print("[test-monospace.py] Tests complete. All tests passed.\n")
+        report.out("[test-monospace.py] Tests complete. All tests passed.\n\n")
         sys.exit(0)  # exit with status code 0
 
 
+def parse_options(arguments):
+    """Parses the paths, expected advance width and the '--cache PATH' and '--no-cache' options.
+
+    Returns the argparse namespace, with the result cache path in cachepath.
+    """
+    parser = argparse.ArgumentParser(prog="test-monospace.py")
+    parser.add_argument("arguments", nargs="*", metavar="PATH",
+                        help="font file paths, followed by the expected advance width or width policy YAML file")
+    add_cache_arguments(parser)
+    args = parser.parse_intermixed_args(arguments)
+    args.cachepath = None if args.no_cache else args.cache
+    return args
+
+
 if __name__ == '__main__':
-    # call with python test-monospace.py [fontpath 1] <fontpath n...> [expected advance width]
-    main(sys.argv[1:])
+    # call with python test-monospace.py [--cache PATH] [--no-cache] [--report console|jsonl|junit[:PATH]]... [--shard i/N] [--shard-balance] [--shard-results JSON] [--profile] [--profile-trace JSON] [fontpath 1] <fontpath n...> [expected advance width | width policy YAML]
+    arguments, profiler = profile.profile_options(sys.argv[1:], "test-monospace.py")
+    try:
+        arguments, report = report_options(arguments, "test-monospace.py")
+    except (ValueError, IOError, OSError) as e:
+        sys.stderr.write("[test-monospace.py] ERROR: " + str(e) + "\n")
+        sys.exit(1)
+    try:
+        arguments, shard = shard_options(arguments, "test-monospace.py")
+    except ValueError as e:
+        with report:
+            report.error("[test-monospace.py] ERROR: " + str(e) + "\n")
+            sys.exit(1)
+    with profiler, shard, report:
+        args = parse_options(arguments)
+        main(args.arguments, args.cachepath, shard, report)
@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  test-runner.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from fonttests import profile
+
+from fonttests.checks import compile_metrics_plan, compile_width_policy
+from fonttests.expected import load_expected_metrics, load_width_policy
+from fonttests.fontfile import split_font_number
+from fonttests.manifest import Manifest
+from fonttests.report import REPORT_FORMATS, Report, parse_report
+from fonttests.resultcache import DEFAULT_MAX_SIZE, default_cache_path
+from fonttests.runner import DEFAULT_PREFETCH, Expectations, check_costs, default_jobs, find_fonts, run
+from fonttests.shard import Shard, default_result_path, merge_results, parse_shard
+from fonttests.watch import wait_for_changes
+
+
+def load_metrics(expectedpath, metrics_cache):
+    """Parses and compiles an expected metrics YAML file once and reuses it for every font that maps to it"""
+    if expectedpath not in metrics_cache:
+        metrics_cache[expectedpath] = compile_metrics_plan(load_expected_metrics(expectedpath))
+    return metrics_cache[expectedpath]
+
+
+def load_manifest(args):
+    """Parses the --manifest file, if defined"""
+    if args.manifest is None:
+        return None
+    try:
+        return Manifest(args.manifest)
+    except Exception as e:
+        sys.stderr.write("[test-runner.py] ERROR: Unable to read the manifest file. " + str(e) + "\n")
+        sys.exit(1)
+
+
+def parse_arguments(arguments, command=None):
+    prog = "test-runner.py" if command is None else "test-runner.py " + command
+    parser = argparse.ArgumentParser(prog=prog,
+                                     description="Runs all font tests against a font set, opening each font once")
+    parser.add_argument("fonts", nargs="*", metavar="FONT",
+                        help="font file path, directory of fonts, or fontpath:expected.yaml metrics map "
+                             "(default: the fonts matched by the manifest)")
+    parser.add_argument("--manifest", metavar="PATH",
+                        help="YAML or JSON manifest of font glob patterns mapped to expected values")
+    parser.add_argument("--metrics", metavar="YAML", help="expected metrics YAML file for fonts without a map")
+    parser.add_argument("--width", type=int, help="expected advance width of every glyph")
+    parser.add_argument("--width-policy", metavar="YAML",
+                        help="advance widths per glyph class and Unicode range, for CJK and combining mark glyphs "
+                             "(--width is the default width)")
+    parser.add_argument("--glyphs", type=int, help="expected number of glyphs")
+    parser.add_argument("--version", help="expected version in X.XXX format")
+    parser.add_argument("--clipping", action="store_true",
+                        help="test that every glyph fits within the winAscent/winDescent and hhea ascent/descent")
+    parser.add_argument("--derived", action="store_true",
+                        help="test the OS/2 xAvgCharWidth, sxHeight and sCapHeight values against the values "
+                             "recomputed from the glyphs")
+    parser.add_argument("--fail-fast", action="store_const", const="run", dest="fail_fast",
+                        help="stop at the first failed check, without testing the remaining checks and fonts")
+    parser.add_argument("--font-fail-fast", action="store_const", const="font", dest="fail_fast",
+                        help="skip the remaining checks of a font after its first failed check")
+    parser.add_argument("--check-costs", metavar="JSON",
+                        help="profile trace file (see --profile-trace) whose median check times set the order in "
+                             "which the checks of a font run (default: built-in estimates, cheapest first)")
+    parser.add_argument("-j", "--jobs", type=int, default=default_jobs(),
+                        help="number of fonts to test in parallel (default: CPU count)")
+    parser.add_argument("--prefetch", type=int, metavar="N", default=DEFAULT_PREFETCH,
+                        help="number of font files read ahead of the checks with --jobs 1, 0 to read each font "
+                             "when it is checked (default: %(default)s)")
+    parser.add_argument("--cache", metavar="PATH", default=default_cache_path(),
+                        help="result cache file path (default: %(default)s)")
+    parser.add_argument("--cache-size", type=int, metavar="MB", default=DEFAULT_MAX_SIZE // (1024 * 1024),
+                        help="maximum size of the cached results in megabytes (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="re-run every check and do not use the result cache")
+    parser.add_argument("--profile", action="store_true",
+                        help="write the wall time of each stage and table decompile and the peak memory of each font "
+                             "to stderr (the fonts are tested in a single process)")
+    parser.add_argument("--profile-trace", metavar="JSON", default="test-runner-profile.json",
+                        help="profile trace file path, used with --profile (default: %(default)s)")
+    if command == "watch":
+        parser.add_argument("--interval", type=float, default=1.0,
+                            help="seconds between polls for changed files (default: %(default)s)")
+    else:
+        add_report_argument(parser)
+        parser.add_argument("--shard", metavar="i/N",
+                            help="test only shard i of N of the fonts, partitioned by a stable hash of the font paths")
+        parser.add_argument("--shard-balance", action="store_true",
+                            help="partition the --shard fonts by file size instead of the path hash")
+        parser.add_argument("--shard-results", metavar="JSON",
+                            help="shard results file path, for the merge command "
+                                 "(default with --shard: test-runner-shard-<i>-of-<N>.json)")
+    args = parser.parse_args(arguments)
+    if not args.fonts and args.manifest is None:
+        parser.error("define the fonts to test or a --manifest")
+    if args.width_policy is not None:
+        try:
+            policy = load_width_policy(args.width_policy)
+        except (IOError, OSError, ValueError) as e:
+            parser.error("unable to read the --width-policy file. " + str(e))
+        if args.width is not None:
+            policy = dict([("default", args.width)] + list(policy.items()))
+        try:
+            args.width = compile_width_policy(policy)
+        except ValueError as e:
+            parser.error(str(e))
+    try:
+        args.costs = check_costs(args.check_costs)
+    except (IOError, OSError, ValueError, KeyError) as e:
+        parser.error("unable to read the --check-costs trace file. " + str(e))
+    if command is None:
+        try:
+            args.shard_index, args.shard_count = parse_shard(args.shard) if args.shard else (1, 1)
+        except ValueError as e:
+            parser.error(str(e))
+        args.report = open_report(parser, args.report)
+    else:
+        args.report = Report("test-runner.py")
+    return args
+
+
+def add_report_argument(parser):
+    parser.add_argument("--report", action="append", metavar="FORMAT[:PATH]",
+                        help="write the results as " + ", ".join(REPORT_FORMATS) + " to PATH or to the standard "
+                             "output, can be repeated (default: console)")
+
+
+def open_report(parser, report_values):
+    """Returns the Report of the --report values, or exits with a usage error if they are invalid"""
+    try:
+        return Report("test-runner.py", [parse_report(value) for value in report_values or ["console"]])
+    except (ValueError, IOError, OSError) as e:
+        parser.error(str(e))
+
+
+def parse_font_maps(args, manifest=None):
+    """Returns a list of (fontpath, expectedpath) pairs for the font set, expanding directories"""
+    if not args.fonts:
+        return [(fontpath, args.metrics) for fontpath in find_fonts(manifest.fontpaths())]
+    font_maps = []
+    for fontmap in args.fonts:
+        expectedpath = args.metrics
+        if ":" in fontmap:
+            map_list = fontmap.split(':')
+            if len(map_list) != 2:
+                sys.stderr.write("[test-runner.py] ERROR: incorrect syntax for the font and expected metrics YAML file paths in '" + fontmap + "'\n")
+                sys.exit(1)
+            fontmap, expectedpath = map_list
+        for fontpath in find_fonts([fontmap]):
+            font_maps.append((fontpath, expectedpath))
+    return font_maps
+
+
+def build_expectations(args, font_maps, metrics_cache, manifest=None, metrics_only=()):
+    """Returns the (fontpath, Expectations) pairs for the font maps.
+
+    Manifest values override the expected values defined on the command line.
+    Fonts in metrics_only are only given the metrics expectation, for when only
+    their expected metrics YAML file changed.
+    """
+    font_expectations = []
+    try:
+        for fontpath, expectedpath in font_maps:
+            metrics = load_metrics(expectedpath, metrics_cache) if expectedpath else None
+            expectations = Expectations(metrics, args.width, args.glyphs, args.version, args.clipping or None,
+                                        args.derived or None)
+            if manifest is not None:
+                expectations = manifest.expectations(fontpath, expectations)
+            if fontpath in metrics_only:
+                expectations = Expectations(expectations.metrics, None, None, None, None, None)
+            font_expectations.append((fontpath, expectations))
+    except (IOError, OSError) as e:
+        sys.stderr.write("[test-runner.py] ERROR: Unable to read the expected metrics YAML file. " + str(e) + "\n")
+        sys.exit(1)
+    return font_expectations
+
+
+def report_font(report, fontpath, results, script=None):
+    """Writes the results of a single font and returns its number of failures"""
+    failure_count = 0
+    report.out(">>> Testing '" + fontpath + "'\n")
+    for result in results:
+        if result.passed:
+            report.out("  ✓ [" + result.check + "] " + result.message + "\n")
+        else:
+            report.err("  X [" + result.check + "] " + result.message + "\n")
+            if isinstance(result.observed, dict) and ((result.check == "monospace" and result.table == "hmtx") or
+                                                      result.check == "clipping"):
+                for glyph in result.observed.keys():
+                    report.err("      " + glyph + " : " + str(result.observed[glyph]) + "\n")
+            failure_count += 1
+    report.out("\n")
+    report.results(fontpath, results, script)
+    return failure_count
+
+
+def run_report(args, font_expectations, shard=None, executor=None):
+    """Runs the checks, writes the results of each font as soon as it is available and returns the number of failures.
+
+    executor is a process pool that is reused by every run, see fonttests.runner.run().
+    """
+    font_count = 0
+    failure_count = 0
+    cachepath = None if args.no_cache else args.cache
+    for fontpath, results in run(font_expectations, jobs=args.jobs, cachepath=cachepath,
+                                 cache_size=args.cache_size * 1024 * 1024, prefetch=args.prefetch,
+                                 fail_fast=args.fail_fast, costs=args.costs, executor=executor):
+        font_count += 1
+        if shard is not None:
+            shard.record(fontpath, results)
+        with profile.stage("report"):
+            failure_count += report_font(args.report, fontpath, results)
+
+    args.report.out("[test-runner.py] " + str(font_count) + " font(s) tested, " + str(failure_count) +
+                    " check(s) failed.\n")
+    if font_count < len(font_expectations):
+        args.report.out("[test-runner.py] --fail-fast stopped the run at the first failure, " +
+                        str(len(font_expectations) - font_count) + " font(s) were not tested.\n")
+    return failure_count
+
+
+def main(arguments):
+    args = parse_arguments(arguments)
+    resultpath = args.shard_results
+    if resultpath is None and args.shard:
+        resultpath = default_result_path("test-runner.py", args.shard_index, args.shard_count)
+    shard = Shard("test-runner.py", args.shard_index, args.shard_count, args.shard_balance, resultpath)
+
+    # Begin report
+    args.report.out("\nBegin test-runner.py font tests\n\n")
+
+    with profile.Profiler("test-runner.py", args.profile_trace, args.profile), shard, args.report:
+        manifest = load_manifest(args)
+        font_expectations = build_expectations(args, parse_font_maps(args, manifest), {}, manifest)
+        selected_fontpaths = set(shard.select(fontpath for fontpath, expectations in font_expectations))
+        font_expectations = [font_expectation for font_expectation in font_expectations
+                             if font_expectation[0] in selected_fontpaths]
+        failure_count = run_report(args, font_expectations, shard)
+        if failure_count > 0:
+            sys.exit(1)
+        else:
+            sys.exit(0)
+
+
+def merge(arguments):
+    """Writes a single report of the shard results files of test-runner.py and the test-*.py scripts"""
+    parser = argparse.ArgumentParser(prog="test-runner.py merge",
+                                     description="Combines the --shard results files into one report and exit code")
+    parser.add_argument("results", nargs="+", metavar="JSON", help="shard results file path")
+    add_report_argument(parser)
+    args = parser.parse_args(arguments)
+    report = open_report(parser, args.report)
+
+    with report:
+        report.out("\nBegin test-runner.py merge of " + str(len(args.results)) + " shard results file(s)\n\n")
+
+        fonts, errors, exit_code = merge_results(args.results)
+        failure_count = 0
+        for script, fontpath, results in fonts:
+            failure_count += report_font(report, fontpath, results, script)
+        for error in errors:
+            report.error("[test-runner.py] ERROR: " + error + "\n")
+
+        report.out("[test-runner.py] " + str(len(fonts)) + " font(s) tested, " + str(failure_count) +
+                   " check(s) failed.\n")
+        if failure_count > 0:
+            exit_code = max(exit_code, 1)
+        sys.exit(exit_code)
+
+
+def watch(arguments):
+    """Re-runs the checks affected by changed fonts and expected metrics YAML files until interrupted"""
+    args = parse_arguments(arguments, "watch")
+
+    print("\nBegin test-runner.py watch mode, press Ctrl-C to stop\n")
+
+    manifest = load_manifest(args)
+
+    def list_paths():
+        font_maps = parse_font_maps(args, manifest)
+        paths = set(split_font_number(fontpath)[0] for fontpath, expectedpath in font_maps)
+        paths.update(expectedpath for fontpath, expectedpath in font_maps if expectedpath)
+        if args.manifest is not None:
+            paths.add(args.manifest)
+        return paths
+
+    metrics_cache = {}
+    file_states = {}
+    # the worker processes are started once and keep fontTools imported between the runs
+    executor = ProcessPoolExecutor(max_workers=args.jobs) if args.jobs > 1 and not args.profile else None
+    try:
+        while True:
+            changed, file_states = wait_for_changes(list_paths, file_states, args.interval)
+            for path in changed:
+                metrics_cache.pop(path, None)
+
+            # a changed manifest or font re-runs all checks, a changed YAML file only re-runs the metrics check of its fonts
+            if args.manifest in changed:
+                manifest = load_manifest(args)
+                font_maps = parse_font_maps(args, manifest)
+                metrics_only = set()
+            else:
+                font_maps = [(fontpath, expectedpath) for fontpath, expectedpath in parse_font_maps(args, manifest)
+                             if split_font_number(fontpath)[0] in changed or expectedpath in changed]
+                metrics_only = set(fontpath for fontpath, expectedpath in font_maps
+                                   if split_font_number(fontpath)[0] not in changed)
+            print("[test-runner.py] " + str(len(changed)) + " changed file(s) detected, testing " + str(len(font_maps)) + " font(s)\n")
+            with profile.Profiler("test-runner.py", args.profile_trace, args.profile), args.report:
+                font_expectations = build_expectations(args, font_maps, metrics_cache, manifest, metrics_only)
+                run_report(args, font_expectations, executor=executor)
+            print("")
+    except KeyboardInterrupt:
+        sys.exit(0)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+if __name__ == '__main__':
+    # call with python test-runner.py [watch] [--jobs N] [--prefetch N] [--no-cache] [--fail-fast | --font-fail-fast] [--check-costs JSON] [--report console|jsonl|junit[:PATH]]... [--shard i/N] [--shard-balance] [--shard-results JSON] [--profile] [--profile-trace JSON] [--manifest PATH] [--metrics YAML] [--width N] [--width-policy YAML] [--glyphs N] [--version X.XXX] [--clipping] [--derived] [fontpath[:expected.yaml] | directory]...
+    #        or python test-runner.py merge [--report console|jsonl|junit[:PATH]]... [shard results JSON]...
+    if len(sys.argv) > 1 and sys.argv[1].lower() == "watch":
+        watch(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1].lower() == "merge":
+        merge(sys.argv[2:])
+    else:
+        main(sys.argv[1:])
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  test-server.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+import sys
+
+# only the standard library client is imported here, the server imports fontTools on start
+from fonttests.client import default_socket_path, request, run_script, write_output
+
+
+def parse_options(arguments):
+    """Removes the '--socket PATH' and '--max-fonts N' options from the front of the argument list.
+
+    Returns the remaining arguments, the socket path and the maximum number of cached fonts.
+    """
+    socketpath = default_socket_path()
+    max_fonts = None
+    while len(arguments) > 0 and arguments[0] in ("--socket", "--max-fonts"):
+        if len(arguments) < 2:
+            sys.stderr.write("[test-server.py] ERROR: The " + arguments[0] + " option requires a value\n")
+            sys.exit(2)
+        if arguments[0] == "--socket":
+            socketpath = arguments[1]
+        else:
+            try:
+                max_fonts = int(arguments[1])
+            except ValueError:
+                sys.stderr.write("[test-server.py] ERROR: The --max-fonts option requires an integer value\n")
+                sys.exit(2)
+        arguments = arguments[2:]
+    return arguments, socketpath, max_fonts
+
+
+def start(socketpath, max_fonts):
+    """Serves check requests in the foreground until a stop request or Ctrl-C"""
+    from fonttests.server import DEFAULT_MAX_FONTS, serve
+    print("[test-server.py] Serving font checks on '" + socketpath + "', press Ctrl-C to stop")
+    sys.stdout.flush()
+    serve(socketpath, max_fonts or DEFAULT_MAX_FONTS)
+
+
+def main(arguments):
+    command_arguments, socketpath, max_fonts = parse_options(arguments[1:])
+    command = arguments[0].lower()
+    if command == "start":
+        start(socketpath, max_fonts)
+        sys.exit(0)
+
+    try:
+        if command == "run":
+            if len(command_arguments) == 0:
+                sys.stderr.write("[test-server.py] ERROR: Please define the test-*.py script to run\n")
+                sys.exit(2)
+            output, exit_code = run_script(command_arguments[0], command_arguments[1:], socketpath)
+        elif command in ("stop", "status"):
+            response = request({"command": command}, socketpath)
+            output, exit_code = response["output"], response["exit"]
+        else:
+            sys.stderr.write("[test-server.py] ERROR: Unknown command '" + arguments[0] + "'\n")
+            sys.exit(2)
+    except (OSError, ValueError) as e:
+        sys.stderr.write("[test-server.py] ERROR: Unable to reach the server on '" + socketpath + "'. " + str(e) + "\n")
+        sys.exit(2)
+
+    write_output(output)
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    # call with python test-server.py start [--socket PATH] [--max-fonts N]
+    #        or python test-server.py run [--socket PATH] [test-*.py script] [script arguments...]
+    #        or python test-server.py stop|status [--socket PATH]
+    if len(sys.argv) < 2:
+        sys.stderr.write("[test-server.py] ERROR: Please define the start, run, stop or status command\n")
+        sys.exit(2)
+    main(sys.argv[1:])
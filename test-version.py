@@ -10,72 +10,49 @@
 import sys
 import os
 import os.path
-import re
-import codecs
-from fontTools import ttLib
+import argparse
 
-def main(arguments):
+from fonttests import profile
+from fonttests.report import report_options
+from fonttests.resultcache import add_cache_arguments
+from fonttests.runner import Expectations, default_jobs, find_fonts, run
+from fonttests.shard import shard_options
+
+def main(arguments, jobs, cachepath, shard, report):
     # Begin report
-    print("\nBegin test-version.py font version tests...\n")
+    report.out("\nBegin test-version.py font version tests...\n\n")
 
     ERROR_OCCURRED = False
+
+    if len(arguments) < 2:
+        report.error("[test-version.py] ERROR: Please define the font paths and the expected version in X.XXX format\n")
+        sys.exit(1)
     expected_version = arguments[-1]
 
     filepaths = arguments[0:-1]
 
-    # regular expression match pattern for version string in fonts
-    pattern = re.compile(r"Version\s(?P<version>\d\.\d{3})")
-
+    # font files, TTC/OTC faces and the fonts in directories are checked as one batch
+    fontpaths = []
     for fontpath in filepaths:
-        if os.path.isfile(fontpath):
-            print("\n>>> Testing '" + fontpath + "'\n")
-            tt = ttLib.TTFont(fontpath)
-
-            version_string_raw = ""
-            name_tables = tt['name'].__dict__['names']
-            for name_table in name_tables:
-                if name_table.__dict__['nameID'] == 5 and name_table.__dict__['platformID'] == 1:
-                    osx_version_string_raw = name_table.__dict__['string']
-                elif name_table.__dict__['nameID'] == 5 and name_table.__dict__['platformID'] == 3:
-                    win_version_string_raw = name_table.__dict__['string']
+        if os.path.isfile(fontpath) or os.path.isdir(fontpath):
+            fontpaths.extend(find_fonts([fontpath]))
+        else:
+            report.error("[test-version.py] ERROR: The path '" + fontpath + "' is not a path to a font file or directory.\n")
+            ERROR_OCCURRED = True
 
-            # nameID = 5, platformID = 1 (OS X)
-            if len(osx_version_string_raw) > 0:
-                if type(osx_version_string_raw) == bytes:
-                    osx_version_string_raw = bytes.decode(osx_version_string_raw, "utf-8")
-                if osx_version_string_raw.startswith("Version"):
-                    m = pattern.search(osx_version_string_raw)
-                    osx_observed_version = m.group('version')
-                    if osx_observed_version == expected_version:
-                        print("[test-version.py] Expected version string '" + expected_version + "' was detected in the name tables for nameID=5, platformID=1.\n\n")
-                    else:
-                        sys.stderr.write("[test-version.py] ERROR: Expected version '" + expected_version + "' does not equal observed version '" + osx_observed_version + "' for nameID=5, platformID=1\n\n")
-                        ERROR_OCCURRED = True
+    font_expectations = [(fontpath, Expectations(None, None, None, expected_version, None, None))
+                         for fontpath in shard.select(fontpaths)]
+    for fontpath, results in run(font_expectations, jobs=jobs, cachepath=cachepath):
+        shard.record(fontpath, results)
+        with profile.stage("report"):
+            report.out("\n>>> Testing '" + fontpath + "'\n\n")
+            for result in results:
+                if result.passed:
+                    report.out("[test-version.py] " + result.message + "\n\n\n")
                 else:
-                    sys.stderr.write("[test-version.py] ERROR: Did not detect 'Version X.XXX' syntax at the beginning of the version string in nameID=5, platformID=1 name table.\n\n")
+                    report.err("[test-version.py] " + result.message + "\n\n")
                     ERROR_OCCURRED = True
-            else:
-                sys.stderr.write("[test-version.py] ERROR: unable to parse the version string from the nameID = 5, platformID=1 table for '" + fontpath + "'.\n\n")
-                ERROR_OCCURRED = True
-
-            # nameID = 5, platformID = 3 (Windows)
-            if len(win_version_string_raw) > 0:
-                # UTF-16 big endian encoded table string in Windows name tables, need to convert
-                win_version_string_decoded = bytes.decode(win_version_string_raw, "utf-16-be")
-                if win_version_string_decoded.startswith("Version"):
-                    m = pattern.search(win_version_string_decoded)
-                    win_observed_version = m.group('version')
-                    if win_observed_version == expected_version:
-                        print("[test-version.py] Expected version string '" + expected_version + "' was detected in the name tables for nameID=5, platformID=3.\n\n")
-                    else:
-                        sys.stderr.write("[test-version.py] ERROR: Expected version '" + expected_version + "' does not equal observed version '" + win_observed_version + "' for nameID=5, platformID=3\n\n")
-                        ERROR_OCCURRED = True
-                else:
-                    sys.stderr.write("[test-version.py] ERROR: Did not detect 'Version X.XXX' syntax at the beginning of the version string in nameID=5, platformID=3 name table.\n\n")
-                    ERROR_OCCURRED = True
-            else:
-                sys.stderr.write("[test-version.py] ERROR: unable to parse the version string from the nameID = 5, platformID=3 table for '" + fontpath + "'.\n\n")
-                ERROR_OCCURRED = True
+            report.results(fontpath, results)
 
     if ERROR_OCCURRED is True:
         sys.exit(1)
@@ -83,7 +60,36 @@ def main(arguments):
         sys.exit(0)
 
 
+def parse_options(arguments):
+    """Parses the paths, expected version and the '--jobs N', '--cache PATH' and '--no-cache' options.
+
+    Returns the argparse namespace, with the result cache path in cachepath.
+    """
+    parser = argparse.ArgumentParser(prog="test-version.py")
+    parser.add_argument("arguments", nargs="*", metavar="PATH",
+                        help="font file paths and directories, followed by the expected version in X.XXX format")
+    parser.add_argument("-j", "--jobs", type=int, default=default_jobs(),
+                        help="number of fonts to test in parallel (default: CPU count)")
+    add_cache_arguments(parser)
+    args = parser.parse_intermixed_args(arguments)
+    args.cachepath = None if args.no_cache else args.cache
+    return args
+
 
 if __name__ == '__main__':
-    # call with python test-version.py [fontpath 1] <fontpath n...> [expected version in X.XXX format]
-    main(sys.argv[1:])
+    # call with python test-version.py [--jobs N] [--cache PATH] [--no-cache] [--report console|jsonl|junit[:PATH]]... [--shard i/N] [--shard-balance] [--shard-results JSON] [--profile] [--profile-trace JSON] [fontpath 1 | directory 1] <fontpath n | directory n...> [expected version in X.XXX format]
+    arguments, profiler = profile.profile_options(sys.argv[1:], "test-version.py")
+    try:
+        arguments, report = report_options(arguments, "test-version.py")
+    except (ValueError, IOError, OSError) as e:
+        sys.stderr.write("[test-version.py] ERROR: " + str(e) + "\n")
+        sys.exit(1)
+    try:
+        arguments, shard = shard_options(arguments, "test-version.py")
+    except ValueError as e:
+        with report:
+            report.error("[test-version.py] ERROR: " + str(e) + "\n")
+            sys.exit(1)
+    with profiler, shard, report:
+        args = parse_options(arguments)
+        main(args.arguments, args.jobs, args.cachepath, shard, report)
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  tests/conftest.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+import os.path
+import sys
+
+import pytest
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FONT_DIR = os.path.join(REPOSITORY_DIR, "tests", "fonts")
+
+# the fonttests package is imported from the repository, wherever pytest is started
+sys.path.insert(0, REPOSITORY_DIR)
+
+
+@pytest.fixture
+def regular_path():
+    return os.path.join(FONT_DIR, "Hack-Regular.ttf")
+
+
+@pytest.fixture
+def hack_paths():
+    return sorted(os.path.join(FONT_DIR, filename) for filename in os.listdir(FONT_DIR) if filename.endswith(".ttf"))
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  tests/test_checks.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+import numpy
+import pytest
+
+from fonttests.checks import check_monospace, compile_width_policy, describe_width_policy, width_policy_rules
+from fonttests.fontfile import open_font
+
+
+def test_compile_width_policy():
+    assert compile_width_policy(1233) == 1233
+    rules = compile_width_policy({"default": 1233, "mark": 0, "u+0041-u+005a": [1233, 2466], "unmapped": "any"})
+    assert rules == (("default", "default", (1233,)), ("mark", "mark", (0,)),
+                     ("U+0041-U+005A", (0x41, 0x5A), (1233, 2466)), ("unmapped", "unmapped", None))
+    assert describe_width_policy(rules) == "default 1233, mark 0, U+0041-U+005A 1233 or 2466, unmapped any"
+
+
+@pytest.mark.parametrize("policy", [
+    {"narrow": 1233},
+    {"U+005A-U+0041": 1233},
+    {"default": "wide"},
+])
+def test_compile_width_policy_errors(policy):
+    with pytest.raises(ValueError):
+        compile_width_policy(policy)
+
+
+def test_width_policy_rules(regular_path):
+    rules = compile_width_policy({"default": 1233, "U+0041-U+005A": 1233, "mark": 0, "U+0300": 1233})
+    with open_font(regular_path) as font:
+        rule_indexes = width_policy_rules(font, rules)
+        uppercase_glyph_ids = font.glyph_ids(range(ord("A"), ord("Z") + 1))
+        mark_glyph_ids = font.glyph_ids([0x301, 0x303, 0x309, 0x323])
+        grave_glyph_id = font.glyph_ids([0x300])[0]
+        assert len(rule_indexes) == len(font.advance_widths())
+    assert numpy.all(rule_indexes[uppercase_glyph_ids] == 1)
+    assert numpy.all(rule_indexes[mark_glyph_ids] == 2)
+    # a later rule overrides the earlier rules for the glyphs they share
+    assert rule_indexes[grave_glyph_id] == 3
+    selected = numpy.zeros(len(rule_indexes), dtype=bool)
+    selected[uppercase_glyph_ids] = True
+    selected[mark_glyph_ids] = True
+    selected[grave_glyph_id] = True
+    assert numpy.all(rule_indexes[~selected] == 0)
+
+
+def test_width_policy_rules_without_default(regular_path):
+    rules = compile_width_policy({"U+0041": 1233})
+    with open_font(regular_path) as font:
+        rule_indexes = width_policy_rules(font, rules)
+        glyph_id = font.glyph_ids([ord("A")])[0]
+    assert rule_indexes[glyph_id] == 0
+    assert numpy.count_nonzero(rule_indexes == -1) == len(rule_indexes) - 1
+
+
+def test_check_monospace_with_a_width_policy(regular_path):
+    with open_font(regular_path) as font:
+        fixed_width_results = check_monospace(font, 1233)
+        policy = compile_width_policy({"default": 1233, "mark": 0, "unmapped": "any", "U+0000": 0})
+        policy_results = check_monospace(font, policy)
+    assert not fixed_width_results[-1].passed
+    assert "acutecomb" in fixed_width_results[-1].observed
+    assert all(result.passed for result in policy_results)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  tests/test_manifest.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+import json
+import os.path
+import shutil
+
+import pytest
+
+from fonttests.manifest import Manifest
+from fonttests.runner import Expectations
+
+DEFAULTS = Expectations(None, None, None, None, None, None)
+
+
+@pytest.fixture
+def corpus(tmp_path, hack_paths):
+    """A manifest directory with the Hack fonts in fonts/"""
+    font_dir = tmp_path / "fonts"
+    font_dir.mkdir()
+    for fontpath in hack_paths:
+        shutil.copy(fontpath, str(font_dir))
+    return tmp_path
+
+
+def write_manifest(corpus, text, filename="manifest.yaml"):
+    manifestpath = corpus / filename
+    manifestpath.write_text(text)
+    return str(manifestpath)
+
+
+def test_later_entries_override_earlier_entries(corpus):
+    manifest = Manifest(write_manifest(corpus, '"fonts/Hack-*.ttf":\n'
+                                               '  glyphNumber: 1561\n'
+                                               '  version: "2.018"\n'
+                                               '  advanceWidth: 1233\n'
+                                               '"fonts/Hack-Bold*.ttf":\n'
+                                               '  glyphNumber: 1636\n'))
+    regular = manifest.expectations(str(corpus / "fonts" / "Hack-Regular.ttf"), DEFAULTS)
+    bold = manifest.expectations(str(corpus / "fonts" / "Hack-Bold.ttf"), DEFAULTS)
+    assert (regular.glyph_number, regular.version, regular.advance_width) == (1561, "2.018", 1233)
+    assert (bold.glyph_number, bold.version, bold.advance_width) == (1636, "2.018", 1233)
+    # fonts that match the same entries share one compiled Expectations
+    assert manifest.expectations(str(corpus / "fonts" / "Hack-Italic.ttf"), DEFAULTS) is regular
+
+
+def test_patterns_are_relative_to_the_manifest(corpus, monkeypatch):
+    manifestpath = write_manifest(corpus, json.dumps({"fonts/Hack-Regular.ttf": {"glyphNumber": 1561}}),
+                                  "manifest.json")
+    manifest = Manifest(manifestpath)
+    assert manifest.fontpaths() == [str(corpus / "fonts" / "Hack-Regular.ttf")]
+    monkeypatch.chdir(str(corpus / "fonts"))
+    assert manifest.expectations("Hack-Regular.ttf", DEFAULTS).glyph_number == 1561
+    assert manifest.expectations("Hack-Bold.ttf", DEFAULTS) == DEFAULTS
+
+
+def test_collection_faces_match_the_file_pattern(corpus):
+    manifest = Manifest(write_manifest(corpus, '"fonts/*.ttc":\n  glyphNumber: 1561\n'))
+    facepath = os.path.join(str(corpus), "fonts", "Hack.ttc#1")
+    assert manifest.expectations(facepath, DEFAULTS).glyph_number == 1561
+
+
+def test_manifest_compiles_metrics_and_width_policies(corpus):
+    manifest = Manifest(write_manifest(corpus, '"fonts/*.ttf":\n'
+                                               '  unitsPerEm: 2048\n'
+                                               '  clipping: true\n'
+                                               '  advanceWidth:\n'
+                                               '    default: 1233\n'
+                                               '    mark: 0\n'))
+    expectations = manifest.expectations(str(corpus / "fonts" / "Hack-Regular.ttf"), DEFAULTS)
+    assert expectations.metrics is not None
+    assert expectations.clipping is True
+    assert expectations.advance_width == (("default", "default", (1233,)), ("mark", "mark", (0,)))
+
+
+@pytest.mark.parametrize("text", [
+    '"fonts/*.ttf":\n  glyphs: 1561\n',
+    '"fonts/*.ttf": 1561\n',
+    '- fonts/*.ttf\n',
+    # an unquoted version is read as the number 2.01
+    '"fonts/*.ttf":\n  version: 2.010\n',
+])
+def test_invalid_manifests_are_rejected(corpus, text):
+    with pytest.raises(ValueError):
+        Manifest(write_manifest(corpus, text))
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  tests/test_runner.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+import os.path
+import subprocess
+import sys
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FONT_PATH = os.path.join(REPOSITORY_DIR, "tests", "fonts", "Hack-Regular.ttf")
+
+
+def run_runner(*arguments):
+    return subprocess.run([sys.executable, os.path.join(REPOSITORY_DIR, "test-runner.py"), "--no-cache", "-j1"] +
+                          list(arguments), capture_output=True, text=True)
+
+
+def test_corrupt_fonts_are_reported_as_errors(tmp_path):
+    with open(FONT_PATH, "rb") as font_stream:
+        font_data = font_stream.read()
+    truncated_path = tmp_path / "Truncated.ttf"
+    truncated_path.write_bytes(font_data[:len(font_data) // 3])
+    garbage_path = tmp_path / "Garbage.ttf"
+    garbage_path.write_bytes(b"not a font file" * 64)
+
+    completed = run_runner("--clipping", "--glyphs", "1", str(truncated_path), str(garbage_path))
+    assert completed.returncode == 1
+    assert "Traceback" not in completed.stderr
+    assert "X [clipping] ERROR:" in completed.stderr
+    assert "2 font(s) tested" in completed.stdout
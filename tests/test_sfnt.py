@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  tests/test_sfnt.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+import numpy
+import pytest
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables._c_m_a_p import CmapSubtable
+
+from fonttests.sfnt import HEADER_TABLES, SfntReader
+
+
+def best_cmap_arrays(fontpath):
+    """The (codepoints, glyph IDs) arrays of the fontTools getBestCmap() of a font"""
+    font = TTFont(fontpath)
+    best_cmap = font.getBestCmap()
+    codepoints = sorted(best_cmap)
+    return numpy.array(codepoints), numpy.array([font.getGlyphID(best_cmap[codepoint]) for codepoint in codepoints])
+
+
+def assert_character_map(fontpath):
+    with SfntReader(fontpath) as reader:
+        codepoints, glyph_ids = reader.character_map()
+    expected_codepoints, expected_glyph_ids = best_cmap_arrays(fontpath)
+    assert numpy.array_equal(codepoints, expected_codepoints)
+    assert numpy.array_equal(glyph_ids, expected_glyph_ids)
+
+
+def test_cmap_format_4(regular_path):
+    with SfntReader(regular_path) as reader:
+        assert reader.character_map() is not None
+    assert_character_map(regular_path)
+
+
+def test_cmap_format_4_glyph_id_array(regular_path, tmp_path):
+    # A-Z mapped to the glyphs of Z-A cannot be encoded with an idDelta, so the segment reads the glyphIdArray
+    font = TTFont(regular_path)
+    character_map = dict(font.getBestCmap())
+    letters = [chr(codepoint) for codepoint in range(ord("A"), ord("Z") + 1)]
+    for letter, reversed_letter in zip(letters, reversed(letters)):
+        character_map[ord(letter)] = font.getBestCmap()[ord(reversed_letter)]
+    subtable = CmapSubtable.newSubtable(4)
+    subtable.platformID, subtable.platEncID, subtable.language = 3, 1, 0
+    subtable.cmap = character_map
+    font["cmap"].tables = [subtable]
+    fontpath = str(tmp_path / "Hack-Regular-reversed.ttf")
+    font.save(fontpath)
+
+    assert_character_map(fontpath)
+    with SfntReader(fontpath) as reader:
+        codepoints, glyph_ids = reader.character_map()
+    assert glyph_ids[codepoints == ord("A")] == TTFont(regular_path).getGlyphID("Z")
+
+
+def test_cmap_format_12(regular_path, tmp_path):
+    # a (3, 10) format 12 subtable is preferred over the format 4 subtables
+    font = TTFont(regular_path)
+    character_map = dict(font.getBestCmap())
+    character_map[0x1F600] = character_map[ord("A")]
+    subtable = CmapSubtable.newSubtable(12)
+    subtable.platformID, subtable.platEncID, subtable.language = 3, 10, 0
+    subtable.cmap = character_map
+    font["cmap"].tables.append(subtable)
+    fontpath = str(tmp_path / "Hack-Regular-format12.ttf")
+    font.save(fontpath)
+
+    assert_character_map(fontpath)
+    with SfntReader(fontpath) as reader:
+        codepoints, glyph_ids = reader.character_map()
+    assert glyph_ids[codepoints == 0x1F600] == glyph_ids[codepoints == ord("A")]
+
+
+def test_woff_tables_match_the_sfnt_tables(regular_path, tmp_path):
+    # both flavors are saved from one TTFont, which rewrites the [head] timestamps in the same way
+    font = TTFont(regular_path)
+    sfntpath = str(tmp_path / "Hack-Regular.ttf")
+    font.save(sfntpath)
+    font.flavor = "woff"
+    woffpath = str(tmp_path / "Hack-Regular.woff")
+    font.save(woffpath)
+
+    with SfntReader(sfntpath) as sfnt_reader, SfntReader(woffpath) as woff_reader:
+        assert sorted(woff_reader.tables) == sorted(sfnt_reader.tables)
+        assert any(stored_length < length for offset, stored_length, length in woff_reader.tables.values())
+        for tag in HEADER_TABLES:
+            assert woff_reader.fields(tag) == sfnt_reader.fields(tag)
+        assert woff_reader.table_data("hmtx") == sfnt_reader.table_data("hmtx")
+        assert woff_reader.name_string((3, 1, 0x409, 5)) == sfnt_reader.name_string((3, 1, 0x409, 5))
+    assert_character_map(woffpath)
+
+
+def test_unknown_signature_is_rejected(tmp_path):
+    fontpath = tmp_path / "Garbage.ttf"
+    fontpath.write_bytes(b"not a font file" * 4)
+    with pytest.raises(ValueError):
+        SfntReader(str(fontpath))
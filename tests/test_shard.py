@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+#  ------------------------------------------------------------------------------
+#  tests/test_shard.py
+#  Copyright 2015 Christopher Simpkins
+#  MIT license
+#  ------------------------------------------------------------------------------
+
+import pytest
+
+from fonttests.checks import CheckResult
+from fonttests.shard import Shard, merge_results, parse_shard, partition
+
+
+def test_parse_shard():
+    assert parse_shard("2/3") == (2, 3)
+    for value in ("3/2", "0/2", "1", "a/b"):
+        with pytest.raises(ValueError):
+            parse_shard(value)
+
+
+def test_partition_is_stable():
+    fontpaths = ["fonts/Font-%d.ttf" % i for i in range(40)]
+    shards = partition(fontpaths, 4)
+    assert sorted(shards) == sorted(fontpaths)
+    assert set(shards.values()) == {1, 2, 3, 4}
+    # the shard of a font does not depend on the other fonts or their order
+    assert partition(list(reversed(fontpaths)), 4) == shards
+    assert partition(fontpaths[:5], 4) == dict((fontpath, shards[fontpath]) for fontpath in fontpaths[:5])
+    assert partition(["./fonts/Font-0.ttf"], 4) == {"./fonts/Font-0.ttf": shards["fonts/Font-0.ttf"]}
+
+
+def test_partition_keeps_collection_faces_together():
+    shards = partition(["fonts/Family.ttc#0", "fonts/Family.ttc#1", "fonts/Other.ttf"], 3)
+    assert sorted(shards) == ["fonts/Family.ttc", "fonts/Other.ttf"]
+
+
+def test_partition_balanced_by_file_size(hack_paths):
+    shards = partition(hack_paths, 2, balance=True)
+    assert sorted(shards) == hack_paths
+    assert sorted(set(shards.values())) == [1, 2]
+    assert partition(list(reversed(hack_paths)), 2, balance=True) == shards
+
+
+def write_shards(tmp_path, fontpaths, count, exit_codes):
+    """Writes the results file of every shard of fontpaths and returns their paths"""
+    resultpaths = []
+    for index in range(1, count + 1):
+        resultpath = str(tmp_path / ("shard-%d.json" % index))
+        shard = Shard("test-glyphnumber.py", index, count, resultpath=resultpath)
+        for fontpath in shard.select(fontpaths):
+            shard.record(fontpath, [CheckResult("glyphnumber", "maxp", "numGlyphs", 1561, 1561, True, fontpath)])
+        shard.write(resultpath, exit_codes[index - 1])
+        resultpaths.append(resultpath)
+    return resultpaths
+
+
+def test_merge_results(tmp_path, hack_paths):
+    resultpaths = write_shards(tmp_path, hack_paths, 2, [0, 1])
+    fonts, errors, exit_code = merge_results(reversed(resultpaths))
+    assert errors == []
+    assert exit_code == 1
+    assert [fontpath for script, fontpath, results in fonts] == hack_paths
+    assert all(script == "test-glyphnumber.py" for script, fontpath, results in fonts)
+    assert fonts[0][2][0] == CheckResult("glyphnumber", "maxp", "numGlyphs", 1561, 1561, True, hack_paths[0])
+
+
+def test_merge_results_skips_duplicate_shards(tmp_path, hack_paths):
+    resultpaths = write_shards(tmp_path, hack_paths, 2, [0, 0])
+    fonts, errors, exit_code = merge_results(resultpaths + [resultpaths[0]])
+    assert len(errors) == 1 and "duplicate" in errors[0]
+    assert exit_code == 1
+    assert [fontpath for script, fontpath, results in fonts] == hack_paths
+
+
+def test_merge_results_reports_missing_shards(tmp_path, hack_paths):
+    resultpaths = write_shards(tmp_path, hack_paths, 3, [0, 0, 0])
+    fonts, errors, exit_code = merge_results(resultpaths[1:] + [str(tmp_path / "missing.json")])
+    assert len(errors) == 2
+    assert any("1/3" in error for error in errors)
+    assert exit_code == 1